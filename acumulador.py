@@ -0,0 +1,114 @@
+from array import array
+import numpy as np
+import pandas as pd
+
+BALANCE = 0
+RESULTADOS = 1
+FLUJO_EFECTIVO = 2
+ESTADOS = (BALANCE, RESULTADOS, FLUJO_EFECTIVO)
+
+class AcumuladorLargo:
+    """Acumula las celdas leídas en formato largo: columnas (estado, id de cuenta, año, valor).
+
+    Los nombres de cuenta se internan una sola vez y cada celda ocupa 15 bytes en arreglos
+    contiguos, en lugar de un dict por año con un objeto Python por celda.
+    """
+
+    def __init__(self):
+        self.estados = array('b')
+        self.cuentas = array('i')
+        self.anios = array('h')
+        self.valores = array('d')
+        self.nombres = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.valores)
+
+    def id_cuenta(self, cuenta):
+        """Devuelve el id interno de la cuenta, registrándola si es nueva."""
+        id_ = self._ids.get(cuenta)
+        if id_ is None:
+            id_ = self._ids[cuenta] = len(self.nombres)
+            self.nombres.append(cuenta)
+        return id_
+
+    def agregar(self, estado, cuenta, anio, valor):
+        self.estados.append(estado)
+        self.cuentas.append(self.id_cuenta(cuenta))
+        self.anios.append(anio)
+        self.valores.append(valor)
+
+    def extender(self, otro):
+        """Añade al final las celdas de otro acumulador, re-mapeando sus ids de cuenta."""
+        if not len(otro):
+            return
+        mapa = np.array([self.id_cuenta(n) for n in otro.nombres], dtype=np.int32)
+        self.estados.extend(otro.estados)
+        self.cuentas.frombytes(mapa[np.frombuffer(otro.cuentas, dtype=np.int32)].tobytes())
+        self.anios.extend(otro.anios)
+        self.valores.extend(otro.valores)
+
+    def pivotar(self):
+        """Construye los tres DataFrames anchos (cuenta × año) con un solo pivot vectorizado.
+
+        Reglas de duplicados (misma cuenta y año): en balance y flujo gana el primer valor
+        distinto de cero (o el primero si todos son cero); en resultados gana el último.
+        Las filas quedan en el orden en que se vieron las cuentas recorriendo los años por
+        orden de aparición, igual que con el dict anidado anterior.
+        """
+        vacios = tuple(pd.DataFrame() for _ in ESTADOS)
+        if not len(self):
+            return vacios
+        estados = np.frombuffer(self.estados, dtype=np.int8).astype(np.int64)
+        cuentas = np.frombuffer(self.cuentas, dtype=np.int32).astype(np.int64)
+        anios = np.frombuffer(self.anios, dtype=np.int16).astype(np.int64)
+        valores = np.frombuffer(self.valores, dtype=np.float64)
+        n = len(valores)
+        pos = np.arange(n, dtype=np.int64)
+
+        # Clave de celda (estado, año, cuenta) y elección del registro ganador por celda
+        n_cuentas = len(self.nombres)
+        base_anio = anios.min()
+        n_anios = anios.max() - base_anio + 1
+        clave_anio = estados * n_anios + (anios - base_anio)
+        clave = clave_anio * n_cuentas + cuentas
+        prioridad = np.where(estados == RESULTADOS, -pos, np.where(valores != 0, pos, pos + n))
+        orden = np.lexsort((prioridad, clave))
+        claves_unicas, primeros = np.unique(clave[orden], return_index=True)
+        ganador = orden[primeros]
+
+        # Primera aparición de cada celda y de cada (estado, año)
+        primera_celda = np.full(len(claves_unicas), n, dtype=np.int64)
+        np.minimum.at(primera_celda, np.searchsorted(claves_unicas, clave), pos)
+        anios_unicos, inverso_anio = np.unique(clave_anio, return_inverse=True)
+        primer_anio = np.full(len(anios_unicos), n, dtype=np.int64)
+        np.minimum.at(primer_anio, inverso_anio, pos)
+        celda_anio = np.searchsorted(anios_unicos, claves_unicas // n_cuentas)
+
+        resultado = []
+        for estado in ESTADOS:
+            en_estado = (claves_unicas // n_cuentas) // n_anios == estado
+            if not en_estado.any():
+                resultado.append(pd.DataFrame())
+                continue
+            celdas = np.flatnonzero(en_estado)
+            cuenta_celda = claves_unicas[celdas] % n_cuentas
+            anio_celda = (claves_unicas[celdas] // n_cuentas) % n_anios + base_anio
+            # Orden de filas: por aparición del año y luego por aparición de la celda dentro del año
+            orden_celdas = np.lexsort((primera_celda[celdas], primer_anio[celda_anio[celdas]]))
+            _, idx_primero = np.unique(cuenta_celda[orden_celdas], return_index=True)
+            filas_cuenta = cuenta_celda[orden_celdas][np.sort(idx_primero)]
+            columnas = np.unique(anio_celda)
+            fila_de = np.empty(n_cuentas, dtype=np.int64)
+            fila_de[filas_cuenta] = np.arange(len(filas_cuenta))
+            matriz = np.zeros((len(filas_cuenta), len(columnas)), dtype=np.float64)
+            matriz[fila_de[cuenta_celda], np.searchsorted(columnas, anio_celda)] = valores[ganador[celdas]]
+            matriz[np.isnan(matriz)] = 0.0
+            df = pd.DataFrame(
+                matriz,
+                index=pd.Index([self.nombres[i] for i in filas_cuenta], dtype=object),
+                columns=pd.Index(columnas.astype(np.int64)),
+            )
+            resultado.append(df)
+        return tuple(resultado)
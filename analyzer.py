@@ -1,228 +1,637 @@
+import numpy as np
 import pandas as pd
-from utils import buscar_cuenta_flexible, buscar_cuenta_parcial
-
-def calcular_analisis_vh(df_balance, df_resultados):
-    """Calcula análisis vertical y horizontal para balance y resultados."""
-    df_vertical_balance = pd.DataFrame()
-    df_horizontal_balance = pd.DataFrame()
-    if not df_balance.empty:
-        df_vertical_balance = df_balance.copy()
-        total_activos_row = None
-        for idx in df_vertical_balance.index:
-            if "TOTAL" in idx and ("ACTIVO" in idx) and "CORRIENTE" not in idx and "NO CORRIENTE" not in idx:
-                total_activos_row = idx
+from registro_ratios import (MONTOS_FLUJO, MOTIVO_SIN_ANIO, PLAN_FLUJO, RATIOS_FLUJO, anio_anterior_valido, evaluar,
+                             presencia_nodos)
+from tendencias import VENTANA_POR_DEFECTO, calcular_tendencias_estados
+from utils import IndiceCuentas, buscar_cuenta_flexible, buscar_cuenta_parcial
+
+def _fila_total_activos(cuentas):
+    """Fila del total de activos (ni corriente ni no corriente) o None."""
+    for idx in cuentas:
+        if "TOTAL" in idx and ("ACTIVO" in idx) and "CORRIENTE" not in idx and "NO CORRIENTE" not in idx:
+            return idx
+    return None
+
+def _fila_ventas(cuentas):
+    return buscar_cuenta_flexible(IndiceCuentas(cuentas), [
+        ["INGRESOS", "ACTIVIDADES", "ORDINARIAS"],
+        ["VENTAS", "NETAS"]
+    ])
+
+_CLAVES_FLUJO_OPERACION = [
+    ["FLUJOS DE EFECTIVO", "ACTIVIDADES DE OPERACION"],
+    ["EFECTIVO", "ACTIVIDADES", "OPERACION"]
+]
+
+def _fila_flujo_operacion(cuentas):
+    return buscar_cuenta_flexible(IndiceCuentas(cuentas), _CLAVES_FLUJO_OPERACION)
+
+def _porcentaje_vertical(valores, base):
+    """valores / base * 100 con NaN donde la base es 0; ``base`` se difunde por filas (años) o por celda."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertical = valores / base * 100
+    vertical[np.broadcast_to(base == 0, vertical.shape)] = np.nan
+    return vertical
+
+def _variacion(actual, anterior):
+    """Variación % de actual respecto de anterior, con NaN si anterior es 0."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        horizontal = (actual - anterior) / anterior * 100
+    horizontal[~np.isfinite(horizontal)] = np.nan
+    return horizontal
+
+def _variacion_horizontal(valores):
+    """Variación % de cada año respecto del anterior (último eje)."""
+    return _variacion(valores[..., 1:], valores[..., :-1])
+
+# Búsqueda de la fila base del análisis vertical de cada estado (balance, resultados, flujo)
+_BASES_VERTICAL = (_fila_total_activos, _fila_ventas, _fila_flujo_operacion)
+
+def _analisis_vh(df, pos_base):
+    """Núcleo del análisis V/H de un estado: (vertical %, horizontal %) en float64 redondeados a 2.
+
+    Vertical: cada cuenta sobre la fila base del mismo año (NaN si no hay fila base o vale 0).
+    ``pos_base`` es la posición de la fila base (-1 si no hay), una para todo el DataFrame o
+    una por fila en un panel de varios emisores.
+    Horizontal: columnas "<año anterior>-<año>" con la variación respecto del año anterior.
+    """
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    valores = df.to_numpy(dtype=np.float64)
+    columnas = df.columns.tolist()
+    nombres_variacion = [f"{anterior}-{actual}" for anterior, actual in zip(columnas, columnas[1:])]
+    df_horizontal = pd.DataFrame(np.round(_variacion_horizontal(valores), 2), index=df.index, columns=nombres_variacion)
+    return _analisis_vertical(df, valores, pos_base), df_horizontal
+
+def _analisis_vertical(df, valores, pos_base):
+    pos_base = np.asarray(pos_base)
+    base = np.where((pos_base >= 0)[..., np.newaxis], valores[np.maximum(pos_base, 0)], np.nan)
+    return pd.DataFrame(np.round(_porcentaje_vertical(valores, base), 2), index=df.index, columns=df.columns)
+
+def calcular_analisis_vh(df_balance, df_resultados, df_flujo_efectivo=None):
+    """Calcula análisis vertical y horizontal para balance, resultados y flujo de efectivo.
+
+    Bases del vertical: total de activos, ventas/ingresos ordinarios y flujo de actividades
+    de operación. Los resultados indefinidos quedan como NaN (float64).
+    """
+    if df_flujo_efectivo is None:
+        df_flujo_efectivo = pd.DataFrame()
+    resultado = []
+    for df, buscar_base in zip((df_balance, df_resultados, df_flujo_efectivo), _BASES_VERTICAL):
+        fila_base = buscar_base(df.index) if not df.empty else None
+        resultado.extend(_analisis_vh(df, df.index.get_loc(fila_base) if fila_base is not None else -1))
+    return tuple(resultado)
+
+def _posiciones_base_panel(panel, buscar_base):
+    """Posición de la fila base del emisor de cada fila del panel (-1 si ese emisor no la tiene)."""
+    posiciones = np.full(len(panel), -1, dtype=np.int64)
+    if panel.empty:
+        return posiciones
+    cuentas = panel.index.get_level_values(-1)
+    for filas in panel.groupby(level=0, sort=False).indices.values():
+        fila_base = buscar_base(cuentas[filas])
+        if fila_base is not None:
+            posiciones[filas] = filas[cuentas[filas].get_loc(fila_base)]
+    return posiciones
+
+def _horizontal_panel(panel, valores):
+    """Variación % de cada emisor respecto de su año reportado anterior, como calcular_analisis_vh sobre sus años.
+
+    Las columnas son la unión ordenada de los pares "<año anterior>-<año>" de todos los emisores;
+    un emisor tiene NaN en los pares que no son suyos (p. ej. "2009-2010" si no reportó 2010).
+    """
+    anios = panel.columns.tolist()
+    codigos, emisores = pd.factorize(panel.index.get_level_values(0))
+    reporta = _anios_reportados(panel, list(emisores), anios)
+    previo = anio_anterior_valido(reporta)
+    e_idx, j_idx = np.nonzero(reporta & (previo >= 0))
+    pares = sorted(set(zip(j_idx.tolist(), previo[e_idx, j_idx].tolist())))
+    horizontal = np.full((len(panel), len(pares)), np.nan)
+    for k, (j, p) in enumerate(pares):
+        filas = reporta[codigos, j] & (previo[codigos, j] == p)
+        horizontal[filas, k] = _variacion(valores[filas, j], valores[filas, p])
+    nombres = [f"{anios[p]}-{anios[j]}" for j, p in pares]
+    return pd.DataFrame(np.round(horizontal, 2), index=panel.index, columns=nombres)
+
+def calcular_analisis_vh_panel(panel_balance, panel_resultados, panel_flujo_efectivo=None):
+    """Análisis V/H de muchos emisores en una pasada, sobre paneles con índice (Emisor, Cuenta).
+
+    Cada emisor usa su propia fila base y su variación horizontal se mide contra su año
+    reportado anterior, así que obtiene lo mismo que calcular_analisis_vh sobre sus propios años.
+    """
+    if panel_flujo_efectivo is None:
+        panel_flujo_efectivo = pd.DataFrame()
+    resultado = []
+    for panel, buscar_base in zip((panel_balance, panel_resultados, panel_flujo_efectivo), _BASES_VERTICAL):
+        if panel.empty:
+            resultado.extend((pd.DataFrame(), pd.DataFrame()))
+            continue
+        valores = panel.to_numpy(dtype=np.float64)
+        resultado.extend((_analisis_vertical(panel, valores, _posiciones_base_panel(panel, buscar_base)),
+                          _horizontal_panel(panel, valores)))
+    return tuple(resultado)
+
+def _resolver_cuentas_ratios(cuentas_balance, cuentas_resultados, cuentas_flujo=()):
+    """Resuelve una sola vez las filas de cada cuenta usada por los ratios (mismo orden de búsqueda)."""
+    cuentas = {}
+    indice_balance = IndiceCuentas(cuentas_balance)
+    indice_resultados = IndiceCuentas(cuentas_resultados)
+    indice_flujo = IndiceCuentas(cuentas_flujo)
+    # Activo Corriente
+    cuentas["act_corr"] = buscar_cuenta_flexible(indice_balance, [
+        ["TOTAL", "ACTIVO", "CORRIENTE"],
+        ["TOTAL", "ACTIVOS", "CORRIENTES"]
+    ])
+    # Inventarios
+    inv = buscar_cuenta_flexible(indice_balance, [
+        ["INVENTARIOS"],
+        ["EXISTENCIAS"]
+    ])
+    if not inv:
+        inv = buscar_cuenta_parcial(indice_balance, ["INVENTARIO", "EXISTENCIA"]) if len(cuentas_balance) else None
+    cuentas["inv"] = inv
+    # Pasivo Corriente
+    cuentas["pas_corr"] = buscar_cuenta_flexible(indice_balance, [
+        ["TOTAL", "PASIVO", "CORRIENTE"],
+        ["TOTAL", "PASIVOS", "CORRIENTES"]
+    ])
+    # Cuentas por Cobrar
+    cxc_comerciales = buscar_cuenta_flexible(indice_balance, [
+        ["CUENTAS", "COBRAR", "COMERCIALES"]
+    ])
+    if not cxc_comerciales:
+        cxc_comerciales = buscar_cuenta_parcial(indice_balance, ["CUENTAS", "COBRAR", "COMERCIAL"]) if len(cuentas_balance) else None
+    cxc_vinculadas = buscar_cuenta_flexible(indice_balance, [
+        ["CUENTAS", "COBRAR", "ENTIDADES", "RELACIONADAS"],
+        ["CUENTAS", "COBRAR", "VINCULADAS"]
+    ])
+    if not cxc_vinculadas:
+        cxc_vinculadas = buscar_cuenta_parcial(indice_balance, ["CUENTAS", "COBRAR", "VINCULADA"]) if len(cuentas_balance) else None
+    otras_cxc = buscar_cuenta_flexible(indice_balance, [
+        ["OTRAS", "CUENTAS", "COBRAR"]
+    ])
+    cuentas["cxc_comerciales"] = cxc_comerciales
+    cuentas["cxc_vinculadas"] = cxc_vinculadas
+    cuentas["otras_cxc"] = otras_cxc
+    # Activos Totales
+    cuentas["act_tot"] = buscar_cuenta_flexible(indice_balance, [
+        ["TOTAL", "ACTIVO"],
+        ["TOTAL", "ACTIVOS"]
+    ])
+    # Pasivo Total
+    cuentas["pas_tot"] = buscar_cuenta_flexible(indice_balance, [
+        ["TOTAL", "PASIVO"],
+        ["TOTAL", "PASIVOS"]
+    ])
+    # Patrimonio
+    patr = buscar_cuenta_flexible(indice_balance, [
+        ["TOTAL", "PATRIMONIO"],
+        ["PATRIMONIO", "NETO"],
+        ["TOTAL", "PATRIMONIO", "NETO"]
+    ])
+    if not patr:
+        patr = buscar_cuenta_parcial(indice_balance, ["PATRIMONIO"]) if len(cuentas_balance) else None
+    cuentas["patr"] = patr
+    # Ventas
+    ventas = buscar_cuenta_flexible(indice_resultados, [
+        ["INGRESOS", "ACTIVIDADES", "ORDINARIAS"]
+    ])
+    if not ventas:
+        ventas = buscar_cuenta_parcial(indice_resultados, ["INGRESOS", "ACTIVIDADES"]) if len(cuentas_resultados) else None
+    if not ventas:
+        ventas = buscar_cuenta_parcial(indice_resultados, ["VENTAS", "NETAS"]) if len(cuentas_resultados) else None
+    if not ventas:
+        ventas = buscar_cuenta_parcial(indice_resultados, ["INGRESOS", "OPERACIONALES"]) if len(cuentas_resultados) else None
+    cuentas["ventas"] = ventas
+    # Costo de Ventas
+    costo = buscar_cuenta_flexible(indice_resultados, [
+        ["COSTO", "VENTAS"]
+    ])
+    if not costo:
+        costo = buscar_cuenta_parcial(indice_resultados, ["COSTO", "VENTA"]) if len(cuentas_resultados) else None
+    cuentas["costo"] = costo
+    # Utilidad Neta
+    util = buscar_cuenta_flexible(indice_resultados, [
+        ["GANANCIA", "PERDIDA", "NETA", "EJERCICIO"]
+    ])
+    if not util:
+        util = buscar_cuenta_parcial(indice_resultados, ["GANANCIA", "NETA", "EJERCICIO"]) if len(cuentas_resultados) else None
+    if not util:
+        util = buscar_cuenta_parcial(indice_resultados, ["UTILIDAD", "NETA", "EJERCICIO"]) if len(cuentas_resultados) else None
+    if not util:
+        for idx in cuentas_resultados:
+            if "UTILIDAD" in idx and "EJERCICIO" in idx and "NETA" in idx:
+                util = idx
                 break
-        if total_activos_row:
-            total_activos = df_vertical_balance.loc[total_activos_row]
-            for col in df_vertical_balance.columns:
-                if total_activos[col] != 0:
-                    df_vertical_balance[col] = (df_vertical_balance[col] / total_activos[col]) * 100
-            df_vertical_balance = df_vertical_balance.round(2)
-        df_horizontal_balance = df_balance.copy()
-        columnas = df_horizontal_balance.columns.tolist()
-        nuevas_columnas = []
-        for i in range(len(columnas) - 1):
-            anio_actual = columnas[i + 1]
-            anio_anterior = columnas[i]
-            col_nombre = f"{anio_anterior}-{anio_actual}"
-            with pd.option_context('mode.use_inf_as_na', True):
-                df_horizontal_balance[col_nombre] = ((df_horizontal_balance[anio_actual] - df_horizontal_balance[anio_anterior]) / 
-                                                     df_horizontal_balance[anio_anterior] * 100)
-            nuevas_columnas.append(col_nombre)
-        df_horizontal_balance = df_horizontal_balance[nuevas_columnas].round(2)
-        df_horizontal_balance = df_horizontal_balance.replace([float('inf'), float('-inf')], pd.NA)
-
-    df_vertical_resultados = pd.DataFrame()
-    df_horizontal_resultados = pd.DataFrame()
-    if not df_resultados.empty:
-        df_vertical_resultados = df_resultados.copy()
-        ventas_row = buscar_cuenta_flexible(df_resultados, [
-            ["INGRESOS", "ACTIVIDADES", "ORDINARIAS"],
-            ["VENTAS", "NETAS"]
-        ])
-        if ventas_row:
-            ventas = df_vertical_resultados.loc[ventas_row]
-            for col in df_vertical_resultados.columns:
-                if ventas[col] != 0:
-                    df_vertical_resultados[col] = (df_vertical_resultados[col] / ventas[col]) * 100
-            df_vertical_resultados = df_vertical_resultados.round(2)
-        df_horizontal_resultados = df_resultados.copy()
-        columnas = df_horizontal_resultados.columns.tolist()
-        nuevas_columnas = []
-        for i in range(len(columnas) - 1):
-            anio_actual = columnas[i + 1]
-            anio_anterior = columnas[i]
-            col_nombre = f"{anio_anterior}-{anio_actual}"
-            with pd.option_context('mode.use_inf_as_na', True):
-                df_horizontal_resultados[col_nombre] = ((df_horizontal_resultados[anio_actual] - df_horizontal_resultados[anio_anterior]) / 
-                                                        df_horizontal_resultados[anio_anterior] * 100)
-            nuevas_columnas.append(col_nombre)
-        df_horizontal_resultados = df_horizontal_resultados[nuevas_columnas].round(2)
-        df_horizontal_resultados = df_horizontal_resultados.replace([float('inf'), float('-inf')], pd.NA)
-
-    return df_vertical_balance, df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados
-
-def calcular_ratios(df_balance, df_resultados):
-    """Calcula ratios financieros."""
-    ratios_data = {}
+    cuentas["util"] = util
+    # Utilidad operativa y gastos financieros
+    cuentas["util_oper"] = buscar_cuenta_flexible(indice_resultados, [
+        ["GANANCIA", "OPERATIVA"],
+        ["UTILIDAD", "OPERATIVA"],
+        ["RESULTADO", "OPERACION"]
+    ])
+    cuentas["gastos_fin"] = buscar_cuenta_flexible(indice_resultados, [
+        ["GASTOS", "FINANCIEROS"]
+    ])
+    # Depreciación y amortización (ajuste del flujo de efectivo)
+    cuentas["dya"] = buscar_cuenta_flexible(indice_flujo, [
+        ["DEPRECIACION", "AMORTIZACION"],
+        ["DEPRECIACION"]
+    ])
+    # Flujo operativo y compra de activo fijo (ratios del flujo de efectivo)
+    cuentas["fco"] = buscar_cuenta_flexible(indice_flujo, _CLAVES_FLUJO_OPERACION)
+    cuentas["capex"] = buscar_cuenta_flexible(indice_flujo, [
+        ["COMPRA", "PROPIEDADES", "PLANTA", "EQUIPO"],
+        ["ADQUISICION", "PROPIEDADES", "PLANTA", "EQUIPO"],
+        ["COMPRA", "INMUEBLES", "MAQUINARIA", "EQUIPO"]
+    ])
+    return cuentas
+
+# Cuentas que usan los ratios según el estado donde se buscan (las CxC se suman aparte)
+_CUENTAS_BALANCE = ("act_corr", "inv", "pas_corr", "act_tot", "pas_tot", "patr")
+_CUENTAS_RESULTADOS = ("ventas", "costo", "util", "util_oper", "gastos_fin")
+_CUENTAS_FLUJO = ("dya", "fco", "capex")
+_CUENTAS_CXC = ("cxc_comerciales", "cxc_vinculadas", "otras_cxc")
+
+def _vector_cuenta(df, fila, anios):
+    """Valores de la fila para los años dados como array float64 (ceros si la cuenta o el año no existen)."""
+    if fila in df.index:
+        return df.loc[fila].reindex(anios, fill_value=0.0).to_numpy(dtype=np.float64)
+    return np.zeros(len(anios), dtype=np.float64)
+
+def _anios_comunes(df_balance, df_resultados):
+    return sorted(list(set(df_balance.columns) & set(df_resultados.columns))) if (not df_balance.empty and not df_resultados.empty) else []
+
+def _insumos_ratios(df_balance, df_resultados, df_flujo_efectivo, anios):
+    """Resuelve las cuentas de los ratios y las extrae como vectores alineados por año: (cuentas, v, presentes)."""
+    cuentas = _resolver_cuentas_ratios(df_balance.index, df_resultados.index, df_flujo_efectivo.index)
+    v = {}
+    for df, claves in ((df_balance, _CUENTAS_BALANCE), (df_resultados, _CUENTAS_RESULTADOS), (df_flujo_efectivo, _CUENTAS_FLUJO)):
+        v.update({clave: _vector_cuenta(df, cuentas[clave], anios) for clave in claves})
+    presentes = {clave: cuentas[clave] is not None for clave in _CUENTAS_BALANCE + _CUENTAS_RESULTADOS + _CUENTAS_FLUJO}
+    cxc_filas = [cuentas[clave] for clave in _CUENTAS_CXC if cuentas[clave] and cuentas[clave] in df_balance.index]
+    v["cxc"] = np.zeros(len(anios), dtype=np.float64)
+    for cxc_idx in cxc_filas:
+        v["cxc"] = v["cxc"] + _vector_cuenta(df_balance, cxc_idx, anios)
+    presentes["cxc"] = bool(cxc_filas)
+    return cuentas, v, presentes
+
+def _debug_anio(cuentas, v, nodos, i):
+    """Cuentas usadas y sus valores en la posición de año i (para depurar los ratios)."""
+    cxc_nombres = f"com:{cuentas['cxc_comerciales']}, vinc:{cuentas['cxc_vinculadas']}, otras:{cuentas['otras_cxc']}"
+    return {
+        "activo_corriente": f"{cuentas['act_corr']} = {v['act_corr'][i]}",
+        "inventarios": f"{cuentas['inv']} = {v['inv'][i]}",
+        "pasivo_corriente": f"{cuentas['pas_corr']} = {v['pas_corr'][i]}",
+        "cxc": f"{cxc_nombres} = {v['cxc'][i]}",
+        "activos_totales": f"{cuentas['act_tot']} = {v['act_tot'][i]}",
+        "patrimonio": f"{cuentas['patr']} = {nodos['patrimonio'][i]}",
+        "ventas": f"{cuentas['ventas']} = {v['ventas'][i]}",
+        "costo_ventas": f"{cuentas['costo']} = {v['costo'][i]}",
+        "utilidad_neta": f"{cuentas['util']} = {v['util'][i]}",
+        "utilidad_operativa": f"{cuentas['util_oper']} = {v['util_oper'][i]}",
+        "gastos_financieros": f"{cuentas['gastos_fin']} = {v['gastos_fin'][i]}",
+        "depreciacion_amortizacion": f"{cuentas['dya']} = {v['dya'][i]}",
+    }
+
+def _matrices_resultado(ratios):
+    """Apila {ratio: (valores, motivos)} en dos matrices ratio × año (valores redondeados a 4)."""
+    valores = np.round(np.vstack([valores for valores, _ in ratios.values()]), 4)
+    motivos = np.vstack([motivo for _, motivo in ratios.values()])
+    return valores, motivos
+
+def calcular_ratios(df_balance, df_resultados, df_flujo_efectivo=None):
+    """Calcula ratios financieros según el registro de registro_ratios.
+
+    Devuelve (df_ratios, df_motivos, debug_info, anios_comunes): df_ratios es float64 (NaN donde
+    el ratio no se puede calcular) y df_motivos tiene, celda a celda, el código MOTIVO_* correspondiente.
+    El flujo de efectivo (opcional) aporta la depreciación y amortización del Margen EBITDA.
+    """
+    if df_flujo_efectivo is None:
+        df_flujo_efectivo = pd.DataFrame()
+    anios_comunes = _anios_comunes(df_balance, df_resultados)
+    if not anios_comunes:
+        return pd.DataFrame(), pd.DataFrame(), {}, anios_comunes
+
+    cuentas, v, presentes = _insumos_ratios(df_balance, df_resultados, df_flujo_efectivo, anios_comunes)
+    return _resultado_ratios(cuentas, v, presentes, anios_comunes)
+
+def _resultado_ratios(cuentas, v, presentes, anios):
+    """Tupla de calcular_ratios a partir de los insumos ya resueltos."""
+    ratios, nodos = evaluar(v, presentes)
+    debug_info = {anio: _debug_anio(cuentas, v, nodos, i) for i, anio in enumerate(anios)}
+    valores, motivos = _matrices_resultado(ratios)
+    df_ratios = pd.DataFrame(valores, index=list(ratios), columns=anios)
+    df_motivos = pd.DataFrame(motivos, index=list(ratios), columns=anios)
+    return df_ratios, df_motivos, debug_info, anios
+
+_VACIO_FLUJO = (pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+
+def _resultado_flujo(v, presentes, anios_comunes, df_flujo_efectivo):
+    """Tupla de calcular_ratios_flujo a partir de los insumos de los años comunes de balance y resultados.
+
+    Se quedan los años que también tiene el flujo; los promedios usan el año anterior de esa serie.
+    """
+    if df_flujo_efectivo.empty:
+        return _VACIO_FLUJO
+    columnas_flujo = set(df_flujo_efectivo.columns)
+    posiciones = [j for j, anio in enumerate(anios_comunes) if anio in columnas_flujo]
+    if not posiciones:
+        return _VACIO_FLUJO
+    anios = [anios_comunes[j] for j in posiciones]
+    v = {clave: valores[posiciones] for clave, valores in v.items()}
+    ratios, nodos = evaluar(v, presentes, plan=PLAN_FLUJO, ratios=RATIOS_FLUJO)
+    presencia = presencia_nodos(presentes, PLAN_FLUJO)
+    montos = np.vstack([nodos[nodo] if presencia[nodo] else np.full(len(anios), np.nan)
+                        for nodo in MONTOS_FLUJO.values()])
+    df_montos = pd.DataFrame(montos, index=list(MONTOS_FLUJO), columns=anios)
+    valores, motivos = _matrices_resultado(ratios)
+    df_ratios_flujo = pd.DataFrame(valores, index=list(ratios), columns=anios)
+    df_motivos_flujo = pd.DataFrame(motivos, index=list(ratios), columns=anios)
+    return df_montos, df_ratios_flujo, df_motivos_flujo
+
+def calcular_ratios_flujo(df_balance, df_resultados, df_flujo_efectivo):
+    """Ratios del flujo de efectivo y calidad de utilidades según RATIOS_FLUJO de registro_ratios.
+
+    Usa los años comunes de los tres estados. Devuelve (df_montos, df_ratios_flujo, df_motivos_flujo):
+    df_montos tiene el flujo operativo, el capex, el flujo de caja libre y los devengos (NaN si
+    falta su cuenta); los otros dos siguen el formato de calcular_ratios.
+    """
+    return calcular_ratios_con_flujo(df_balance, df_resultados, df_flujo_efectivo)[1]
+
+def calcular_ratios_con_flujo(df_balance, df_resultados, df_flujo_efectivo=None):
+    """calcular_ratios y calcular_ratios_flujo resolviendo las cuentas una sola vez; devuelve ambas tuplas."""
+    if df_flujo_efectivo is None:
+        df_flujo_efectivo = pd.DataFrame()
+    anios_comunes = _anios_comunes(df_balance, df_resultados)
+    if not anios_comunes:
+        return (pd.DataFrame(), pd.DataFrame(), {}, anios_comunes), _VACIO_FLUJO
+    cuentas, v, presentes = _insumos_ratios(df_balance, df_resultados, df_flujo_efectivo, anios_comunes)
+    return (_resultado_ratios(cuentas, v, presentes, anios_comunes),
+            _resultado_flujo(v, presentes, anios_comunes, df_flujo_efectivo))
+
+def apilar_emisores(estados_por_emisor):
+    """Apila los estados de varios emisores en paneles con índice (Emisor, Cuenta).
+
+    ``estados_por_emisor`` es {emisor: (df_balance, df_resultados, df_flujo_efectivo)}, tal como
+    los devuelve procesar_archivos. Las columnas son la unión ordenada de los años; los años
+    que un emisor no reporta quedan en NaN.
+    """
+    paneles = []
+    for i in range(3):
+        partes = {emisor: estados[i] for emisor, estados in estados_por_emisor.items() if not estados[i].empty}
+        if not partes:
+            paneles.append(pd.DataFrame())
+            continue
+        panel = pd.concat(partes, names=['Emisor', 'Cuenta'])
+        paneles.append(panel.reindex(sorted(panel.columns), axis=1))
+    return tuple(paneles)
+
+def _anios_reportados(panel, emisores, anios):
+    """Matriz emisor × año: True si el emisor tiene algún valor en ese año."""
+    reportados = panel.reindex(columns=anios).notna().groupby(level=0, sort=False).any()
+    return reportados.reindex(emisores, fill_value=False).to_numpy(dtype=bool)
+
+def _matriz_cuenta(valores, posiciones):
+    """Fila de cada emisor según su posición en el panel (ceros si el emisor no tiene la cuenta)."""
+    return np.where((posiciones >= 0)[:, np.newaxis], valores[np.maximum(posiciones, 0)], 0.0)
+
+def calcular_ratios_panel(panel_balance, panel_resultados, panel_flujo_efectivo=None):
+    """Ratios de todos los emisores de un panel (Emisor, Cuenta) × año en una sola pasada vectorizada.
+
+    Devuelve (df_ratios, df_motivos) con índice (Emisor, Ratio) y los años comunes del panel
+    como columnas. Cada emisor obtiene lo mismo que calcular_ratios sobre sus propios años
+    (los promedios usan su año reportado anterior); los años que no reporta quedan NaN con
+    MOTIVO_SIN_ANIO.
+    """
+    if panel_balance.empty or panel_resultados.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    if panel_flujo_efectivo is None:
+        panel_flujo_efectivo = pd.DataFrame()
+    anios = sorted(set(panel_balance.columns) & set(panel_resultados.columns))
+    if not anios:
+        return pd.DataFrame(), pd.DataFrame()
+    emisores = list(dict.fromkeys(list(panel_balance.index.unique(0)) + list(panel_resultados.index.unique(0))))
+    reporta = _anios_reportados(panel_balance, emisores, anios) & _anios_reportados(panel_resultados, emisores, anios)
+
+    # Resolución de cuentas por emisor (solo etiquetas) → posición de cada cuenta en su panel
+    estados = (
+        (panel_balance, _CUENTAS_BALANCE + _CUENTAS_CXC),
+        (panel_resultados, _CUENTAS_RESULTADOS),
+        (panel_flujo_efectivo, _CUENTAS_FLUJO),
+    )
+    posiciones = {clave: np.full(len(emisores), -1, dtype=np.int64)
+                  for _, claves in estados for clave in claves}
+    sin_filas = np.array([], dtype=np.int64)
+    grupos = []
+    for panel, _ in estados:
+        if panel.empty:
+            grupos.append(({}, pd.Index([])))
+        else:
+            grupos.append((panel.groupby(level=0, sort=False).indices, panel.index.get_level_values(-1)))
+    for e, emisor in enumerate(emisores):
+        filas = [indices.get(emisor, sin_filas) for indices, _ in grupos]
+        etiquetas = [nivel[f] for (_, nivel), f in zip(grupos, filas)]
+        cuentas = _resolver_cuentas_ratios(*etiquetas)
+        for (_, claves), filas_estado, etiquetas_estado in zip(estados, filas, etiquetas):
+            for clave in claves:
+                if cuentas[clave]:
+                    posiciones[clave][e] = filas_estado[etiquetas_estado.get_loc(cuentas[clave])]
+
+    v = {"cxc": np.zeros((len(emisores), len(anios)), dtype=np.float64)}
+    for panel, claves in estados:
+        if panel.empty:
+            valores = np.zeros((1, len(anios)), dtype=np.float64)
+        else:
+            valores = panel.reindex(columns=anios).to_numpy(dtype=np.float64)
+            if panel is panel_flujo_efectivo:
+                # Un año sin flujo reportado aporta ceros, como en calcular_ratios
+                valores = np.nan_to_num(valores, nan=0.0)
+        for clave in claves:
+            if clave in _CUENTAS_CXC:
+                v["cxc"] = v["cxc"] + _matriz_cuenta(valores, posiciones[clave])
+            else:
+                v[clave] = _matriz_cuenta(valores, posiciones[clave])
+    presentes = {clave: posiciones[clave] >= 0 for clave in _CUENTAS_BALANCE + _CUENTAS_RESULTADOS + _CUENTAS_FLUJO}
+    presentes["cxc"] = np.logical_or.reduce([posiciones[clave] >= 0 for clave in _CUENTAS_CXC])
+
+    with np.errstate(invalid='ignore'):
+        ratios, _ = evaluar(v, presentes, anio_anterior_valido(reporta))
+
+    nombres = list(ratios)
+    valores = np.stack([valores for valores, _ in ratios.values()], axis=1)
+    motivos = np.stack([motivo for _, motivo in ratios.values()], axis=1)
+    sin_anio = np.broadcast_to(~reporta[:, np.newaxis, :], valores.shape)
+    valores[sin_anio] = np.nan
+    motivos[sin_anio] = MOTIVO_SIN_ANIO
+    indice = pd.MultiIndex.from_product([emisores, nombres], names=['Emisor', 'Ratio'])
+    df_ratios = pd.DataFrame(valores.reshape(-1, len(anios)), index=indice, columns=anios).round(4)
+    df_motivos = pd.DataFrame(motivos.reshape(-1, len(anios)), index=indice, columns=anios)
+    return df_ratios, df_motivos
+
+def estadisticas_sector(df_ratios_panel):
+    """Mediana del sector y percentil (0-1) de cada emisor, por ratio y año, ignorando los NaN."""
+    if df_ratios_panel.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    por_ratio = df_ratios_panel.groupby(level='Ratio', sort=False)
+    return por_ratio.median(), por_ratio.rank(pct=True)
+
+def _combinar_columnas(df_anterior, columnas, posiciones, bloque):
+    """DataFrame con ``columnas``: las de ``posiciones`` salen de ``bloque`` y el resto se copia de df_anterior."""
+    matriz = np.empty((len(df_anterior.index), len(columnas)), dtype=df_anterior.to_numpy().dtype if len(df_anterior.columns) else bloque.dtype)
+    nuevas = set(posiciones)
+    conservar = [j for j in range(len(columnas)) if j not in nuevas]
+    if conservar:
+        matriz[:, conservar] = df_anterior[[columnas[j] for j in conservar]].to_numpy()
+    if posiciones:
+        matriz[:, posiciones] = bloque
+    return pd.DataFrame(matriz, index=df_anterior.index, columns=columnas)
+
+def _columnas_cambiadas(anterior, df):
+    """Columnas de df que no estaban en anterior o cuyos valores cambiaron (mismo índice de filas)."""
+    columnas_anteriores = set(anterior.columns)
+    comunes = [c for c in df.columns if c in columnas_anteriores]
+    cambiadas = {c for c in df.columns if c not in columnas_anteriores}
+    if comunes:
+        nuevo = df[comunes].to_numpy(dtype=np.float64)
+        viejo = anterior[comunes].to_numpy(dtype=np.float64)
+        distintas = ((nuevo != viejo) & ~(np.isnan(nuevo) & np.isnan(viejo))).any(axis=0)
+        cambiadas.update(c for c, distinta in zip(comunes, distintas) if distinta)
+    return cambiadas
+
+def _actualizar_vh(previo, df, buscar_base):
+    """Análisis V/H de un estado reutilizando el de la corrida anterior en las columnas sin cambios."""
+    fila_base = buscar_base(df.index) if not df.empty else None
+    pos_base = df.index.get_loc(fila_base) if fila_base is not None else -1
+    actual = {"df": df, "pos_base": pos_base}
+    if (previo is None or df.empty or previo["df"].empty or pos_base != previo["pos_base"]
+            or not df.index.equals(previo["df"].index)):
+        actual["vertical"], actual["horizontal"] = _analisis_vh(df, pos_base)
+        return actual
+
+    columnas = df.columns.tolist()
+    cambiadas = _columnas_cambiadas(previo["df"], df)
+    valores = df.to_numpy(dtype=np.float64)
+    base = valores[pos_base] if pos_base >= 0 else np.full(len(columnas), np.nan)
+
+    # Vertical: solo las columnas cambiadas
+    sucias = [j for j, c in enumerate(columnas) if c in cambiadas]
+    actual["vertical"] = _combinar_columnas(
+        previo["vertical"], df.columns, sucias,
+        np.round(_porcentaje_vertical(valores[:, sucias], base[sucias]), 2))
+
+    # Horizontal: pares nuevos o que tocan un año cambiado
+    nombres = [f"{anterior}-{anio}" for anterior, anio in zip(columnas, columnas[1:])]
+    pares_previos = set(previo["horizontal"].columns)
+    pares = [j for j in range(1, len(columnas))
+             if columnas[j] in cambiadas or columnas[j - 1] in cambiadas or nombres[j - 1] not in pares_previos]
+    actual["horizontal"] = _combinar_columnas(
+        previo["horizontal"], nombres, [j - 1 for j in pares],
+        np.round(_variacion(valores[:, pares], valores[:, [j - 1 for j in pares]]), 2))
+    return actual
+
+def _actualizar_ratios(previo, df_balance, df_resultados, df_flujo_efectivo):
+    """Ratios reutilizando los de la corrida anterior en los años cuyos insumos no cambiaron."""
+    anios = _anios_comunes(df_balance, df_resultados)
+    if not anios:
+        return {"anios": anios, "cuentas": None, "resultado": (pd.DataFrame(), pd.DataFrame(), {}, anios),
+                "flujo": _VACIO_FLUJO}
+    cuentas, v, presentes = _insumos_ratios(df_balance, df_resultados, df_flujo_efectivo, anios)
+    # Los ratios del flujo son pocos: se recalculan enteros desde los mismos insumos si algo cambió
+    actual = {"anios": anios, "cuentas": cuentas, "v": v,
+              "flujo": _resultado_flujo(v, presentes, anios, df_flujo_efectivo)}
+    if previo is None or previo["cuentas"] != cuentas:
+        actual["resultado"] = _resultado_ratios(cuentas, v, presentes, anios)
+        return actual
+
+    # Años con insumos distintos (o nuevos) y años cuyo promedio usa un año distinto o cambiado
+    anteriores = previo["anios"]
+    pos_anterior = {anio: i for i, anio in enumerate(anteriores)}
+    claves = sorted(v)
+    comunes = [j for j, anio in enumerate(anios) if anio in pos_anterior]
+    nuevo = np.vstack([v[clave] for clave in claves])[:, comunes]
+    viejo = np.vstack([previo["v"][clave] for clave in claves])[:, [pos_anterior[anios[j]] for j in comunes]]
+    distintos = ((nuevo != viejo) & ~(np.isnan(nuevo) & np.isnan(viejo))).any(axis=0)
+    cambiados = {anio for anio in anios if anio not in pos_anterior}
+    cambiados.update(anios[j] for j, distinto in zip(comunes, distintos) if distinto)
+    afectados = []
+    for j, anio in enumerate(anios):
+        anio_previo = anios[j - 1] if j else None
+        i = pos_anterior.get(anio)
+        anio_previo_antes = anteriores[i - 1] if i else None
+        if anio in cambiados or anio_previo in cambiados or anio_previo != anio_previo_antes:
+            afectados.append(j)
+    if not afectados and anios == anteriores:
+        actual["resultado"] = previo["resultado"]
+        return actual
+
+    # Se evalúan solo los años afectados más sus años anteriores (para los promedios)
+    sub = sorted(set(afectados) | {j - 1 for j in afectados if j > 0})
+    en_sub = {j: k for k, j in enumerate(sub)}
+    afectados_set = set(afectados)
+    previo_sub = np.array([en_sub[j - 1] if j in afectados_set and j > 0 else -1 for j in sub], dtype=np.int64)
+    v_sub = {clave: valores[sub] for clave, valores in v.items()}
+    ratios, nodos = evaluar(v_sub, presentes, previo_sub)
+    valores, motivos = _matrices_resultado(ratios)
+    k_afectados = [en_sub[j] for j in afectados]
+    df_ratios_previo, df_motivos_previo, debug_previo, _ = previo["resultado"]
     debug_info = {}
-    anios_comunes = sorted(list(set(df_balance.columns) & set(df_resultados.columns))) if (not df_balance.empty and not df_resultados.empty) else []
-
-    if anios_comunes:
-        for i, anio in enumerate(anios_comunes):
-            ratios_data[anio] = {}
-            debug_info[anio] = {}
-            # Activo Corriente
-            act_corr = buscar_cuenta_flexible(df_balance, [
-                ["TOTAL", "ACTIVO", "CORRIENTE"],
-                ["TOTAL", "ACTIVOS", "CORRIENTES"]
-            ])
-            activo_corriente = df_balance.loc[act_corr, anio] if act_corr in df_balance.index else 0.0
-            debug_info[anio]["activo_corriente"] = f"{act_corr} = {activo_corriente}"
-            # Inventarios
-            inv = buscar_cuenta_flexible(df_balance, [
-                ["INVENTARIOS"],
-                ["EXISTENCIAS"]
-            ])
-            if not inv:
-                inv = buscar_cuenta_parcial(df_balance, ["INVENTARIO", "EXISTENCIA"]) if not df_balance.empty else None
-            inventarios = df_balance.loc[inv, anio] if inv in df_balance.index else 0.0
-            debug_info[anio]["inventarios"] = f"{inv} = {inventarios}"
-            # Pasivo Corriente
-            pas_corr = buscar_cuenta_flexible(df_balance, [
-                ["TOTAL", "PASIVO", "CORRIENTE"],
-                ["TOTAL", "PASIVOS", "CORRIENTES"]
-            ])
-            pasivo_corriente = df_balance.loc[pas_corr, anio] if pas_corr in df_balance.index else 0.0
-            debug_info[anio]["pasivo_corriente"] = f"{pas_corr} = {pasivo_corriente}"
-            # Cuentas por Cobrar
-            cxc_comerciales = buscar_cuenta_flexible(df_balance, [
-                ["CUENTAS", "COBRAR", "COMERCIALES"]
-            ])
-            if not cxc_comerciales:
-                cxc_comerciales = buscar_cuenta_parcial(df_balance, ["CUENTAS", "COBRAR", "COMERCIAL"]) if not df_balance.empty else None
-            cxc_vinculadas = buscar_cuenta_flexible(df_balance, [
-                ["CUENTAS", "COBRAR", "ENTIDADES", "RELACIONADAS"],
-                ["CUENTAS", "COBRAR", "VINCULADAS"]
-            ])
-            if not cxc_vinculadas:
-                cxc_vinculadas = buscar_cuenta_parcial(df_balance, ["CUENTAS", "COBRAR", "VINCULADA"]) if not df_balance.empty else None
-            otras_cxc = buscar_cuenta_flexible(df_balance, [
-                ["OTRAS", "CUENTAS", "COBRAR"]
-            ])
-            cxc_val = 0.0
-            for cxc_idx in [cxc_comerciales, cxc_vinculadas, otras_cxc]:
-                if cxc_idx and cxc_idx in df_balance.index:
-                    cxc_val += df_balance.loc[cxc_idx, anio]
-            debug_info[anio]["cxc"] = f"com:{cxc_comerciales}, vinc:{cxc_vinculadas}, otras:{otras_cxc} = {cxc_val}"
-            # Activos Totales
-            act_tot = buscar_cuenta_flexible(df_balance, [
-                ["TOTAL", "ACTIVO"],
-                ["TOTAL", "ACTIVOS"]
-            ])
-            activos_totales = df_balance.loc[act_tot, anio] if act_tot in df_balance.index else 0.0
-            debug_info[anio]["activos_totales"] = f"{act_tot} = {activos_totales}"
-            # Pasivo Total
-            pas_tot = buscar_cuenta_flexible(df_balance, [
-                ["TOTAL", "PASIVO"],
-                ["TOTAL", "PASIVOS"]
-            ])
-            pasivo_total = df_balance.loc[pas_tot, anio] if pas_tot in df_balance.index else 0.0
-            # Patrimonio
-            patr = buscar_cuenta_flexible(df_balance, [
-                ["TOTAL", "PATRIMONIO"],
-                ["PATRIMONIO", "NETO"],
-                ["TOTAL", "PATRIMONIO", "NETO"]
-            ])
-            if not patr:
-                patr = buscar_cuenta_parcial(df_balance, ["PATRIMONIO"]) if not df_balance.empty else None
-            patrimonio = df_balance.loc[patr, anio] if patr in df_balance.index else 0.0
-            if patrimonio == 0.0 and activos_totales != 0.0:
-                patrimonio = activos_totales - pasivo_total
-            debug_info[anio]["patrimonio"] = f"{patr} = {patrimonio}"
-            # Ventas
-            ventas = buscar_cuenta_flexible(df_resultados, [
-                ["INGRESOS", "ACTIVIDADES", "ORDINARIAS"]
-            ])
-            if not ventas:
-                ventas = buscar_cuenta_parcial(df_resultados, ["INGRESOS", "ACTIVIDADES"]) if not df_resultados.empty else None
-            if not ventas:
-                ventas = buscar_cuenta_parcial(df_resultados, ["VENTAS", "NETAS"]) if not df_resultados.empty else None
-            if not ventas:
-                ventas = buscar_cuenta_parcial(df_resultados, ["INGRESOS", "OPERACIONALES"]) if not df_resultados.empty else None
-            ventas_val = df_resultados.loc[ventas, anio] if ventas in df_resultados.index else 0.0
-            debug_info[anio]["ventas"] = f"{ventas} = {ventas_val}"
-            # Costo de Ventas
-            costo = buscar_cuenta_flexible(df_resultados, [
-                ["COSTO", "VENTAS"]
-            ])
-            if not costo:
-                costo = buscar_cuenta_parcial(df_resultados, ["COSTO", "VENTA"]) if not df_resultados.empty else None
-            costo_ventas = df_resultados.loc[costo, anio] if costo in df_resultados.index else 0.0
-            debug_info[anio]["costo_ventas"] = f"{costo} = {costo_ventas}"
-            # Utilidad Neta
-            util = buscar_cuenta_flexible(df_resultados, [
-                ["GANANCIA", "PERDIDA", "NETA", "EJERCICIO"]
-            ])
-            if not util:
-                util = buscar_cuenta_parcial(df_resultados, ["GANANCIA", "NETA", "EJERCICIO"]) if not df_resultados.empty else None
-            if not util:
-                util = buscar_cuenta_parcial(df_resultados, ["UTILIDAD", "NETA", "EJERCICIO"]) if not df_resultados.empty else None
-            if not util and not df_resultados.empty:
-                for idx in df_resultados.index:
-                    if "UTILIDAD" in idx and "EJERCICIO" in idx and "NETA" in idx:
-                        util = idx
-                        break
-            utilidad_neta = df_resultados.loc[util, anio] if util in df_resultados.index else 0.0
-            debug_info[anio]["utilidad_neta"] = f"{util} = {utilidad_neta}"
-            # Promedios
-            cxc_prom = cxc_val
-            inv_prom = inventarios
-            act_prom = activos_totales
-            patr_prom = patrimonio
-            if i > 0:
-                anio_ant = anios_comunes[i-1]
-                # CxC anterior
-                cxc_ant = 0.0
-                for cxc_idx in [cxc_comerciales, cxc_vinculadas, otras_cxc]:
-                    if cxc_idx and cxc_idx in df_balance.index:
-                        cxc_ant += df_balance.loc[cxc_idx, anio_ant]
-                # Inventarios anteriores
-                inv_ant = df_balance.loc[inv, anio_ant] if inv in df_balance.index else 0.0
-                act_ant = df_balance.loc[act_tot, anio_ant] if act_tot in df_balance.index else 0.0
-                # Patrimonio anterior
-                patr_ant = df_balance.loc[patr, anio_ant] if patr in df_balance.index else 0.0
-                if patr_ant == 0.0 and act_ant != 0.0:
-                    pas_ant = df_balance.loc[pas_tot, anio_ant] if pas_tot in df_balance.index else 0.0
-                    patr_ant = act_ant - pas_ant
-                # Promedios con control
-                cxc_prom = (cxc_val + cxc_ant) / 2 if (cxc_val + cxc_ant) != 0 else "N/A"
-                inv_prom = (inventarios + inv_ant) / 2 if (inventarios + inv_ant) != 0 else "N/A"
-                act_prom = (activos_totales + act_ant) / 2 if (activos_totales + act_ant) != 0 else "N/A"
-                patr_prom = (patrimonio + patr_ant) / 2 if (patrimonio + patr_ant) != 0 else "N/A"
-            # Calcular ratios con "N/A" si no se puede
-            def safe_div(num, den):
-                if isinstance(den, (int, float)) and den != 0:
-                    return num / den
-                return "N/A"
-            ratios_data[anio]["Liquidez Corriente"] = safe_div(activo_corriente, pasivo_corriente)
-            ratios_data[anio]["Prueba Ácida"] = safe_div((activo_corriente - inventarios), pasivo_corriente)
-            ratios_data[anio]["Rotación CxC"] = safe_div(ventas_val, cxc_prom) if not isinstance(cxc_prom, str) else "N/A"
-            ratios_data[anio]["Rotación Inventarios"] = safe_div(abs(costo_ventas), inv_prom) if not isinstance(inv_prom, str) else "N/A"
-            ratios_data[anio]["Rotación Activos Totales"] = safe_div(ventas_val, act_prom) if not isinstance(act_prom, str) else "N/A"
-            ratios_data[anio]["Razón Deuda Total"] = safe_div(pasivo_total, activos_totales)
-            ratios_data[anio]["Razón Deuda/Patrimonio"] = safe_div(pasivo_total, patrimonio)
-            ratios_data[anio]["Margen Neto"] = safe_div(utilidad_neta, ventas_val)
-            ratios_data[anio]["ROA"] = safe_div(utilidad_neta, act_prom) if not isinstance(act_prom, str) else "N/A"
-            ratios_data[anio]["ROE"] = safe_div(utilidad_neta, patr_prom) if not isinstance(patr_prom, str) else "N/A"
-
-    # Crear DataFrame de ratios y redondear sólo celdas numéricas
-    if ratios_data:
-        df_ratios = pd.DataFrame.from_dict(ratios_data, orient='index')
-        def round_if_num(x):
-            return round(x, 4) if isinstance(x, (int, float)) else x
-        df_ratios = df_ratios.applymap(round_if_num).T
-    else:
-        df_ratios = pd.DataFrame()
-
-    return df_ratios, debug_info, anios_comunes
\ No newline at end of file
+    for j, anio in enumerate(anios):
+        debug_info[anio] = _debug_anio(cuentas, v_sub, nodos, en_sub[j]) if j in afectados_set else debug_previo[anio]
+    actual["resultado"] = (
+        _combinar_columnas(df_ratios_previo, anios, afectados, valores[:, k_afectados]),
+        _combinar_columnas(df_motivos_previo, anios, afectados, motivos[:, k_afectados]),
+        debug_info,
+        anios,
+    )
+    return actual
+
+class AnalizadorIncremental:
+    """Versión con estado de calcular_analisis_vh, calcular_ratios y calcular_ratios_flujo para reruns sucesivos.
+
+    Compara los estados con los de la corrida anterior y recalcula solo lo afectado: las
+    columnas del vertical que cambiaron, los pares horizontales que tocan un año cambiado y
+    los años de ratios cuyos insumos o cuyo año anterior (promedios) cambiaron. Si cambian las
+    filas de un estado, su fila base o las cuentas que usan los ratios, ese bloque se recalcula entero.
+    Los ratios del flujo reutilizan las cuentas resueltas para los ratios y se recalculan solo si
+    cambió algún estado.
+    """
+
+    def __init__(self):
+        self._entradas = None
+        self._vh = [None, None, None]
+        self._ratios = None
+        self._resultado = None
+        self._tendencias = None
+
+    def actualizar(self, df_balance, df_resultados, df_flujo_efectivo=None):
+        """Devuelve (análisis V/H, ratios, ratios del flujo) con las mismas tuplas que calcular_analisis_vh,
+        calcular_ratios y calcular_ratios_flujo."""
+        if df_flujo_efectivo is None:
+            df_flujo_efectivo = pd.DataFrame()
+        entradas = (df_balance, df_resultados, df_flujo_efectivo)
+        if self._entradas is not None and all(a is b for a, b in zip(entradas, self._entradas)):
+            return self._resultado
+
+        analisis = []
+        for i, (df, buscar_base) in enumerate(zip(entradas, _BASES_VERTICAL)):
+            self._vh[i] = _actualizar_vh(self._vh[i], df, buscar_base)
+            analisis.extend((self._vh[i]["vertical"], self._vh[i]["horizontal"]))
+        self._ratios = _actualizar_ratios(self._ratios, *entradas)
+        self._entradas = entradas
+        self._resultado = (tuple(analisis), self._ratios["resultado"], self._ratios["flujo"])
+        return self._resultado
+
+    def tendencias(self, ventana=VENTANA_POR_DEFECTO):
+        """calcular_tendencias_estados de los estados y ratios de la última actualización.
+
+        Se reutiliza mientras actualizar devuelva el mismo resultado (mismas entradas) y la misma ventana.
+        """
+        if self._tendencias is None or self._tendencias[0] is not self._resultado or self._tendencias[1] != ventana:
+            df_balance, df_resultados, df_flujo_efectivo = self._entradas
+            _, (df_ratios, _, _, _), (_, df_ratios_flujo, _) = self._resultado
+            self._tendencias = (self._resultado, ventana, calcular_tendencias_estados({
+                "Ratios": df_ratios, "Ratios Flujo": df_ratios_flujo, "Balance": df_balance,
+                "Resultados": df_resultados, "Flujo Efectivo": df_flujo_efectivo,
+            }, ventana))
+        return self._tendencias[2]
@@ -1,10 +1,18 @@
 import streamlit as st
 from styles import apply_custom_styles
-from processor import procesar_archivos
-from analyzer import calcular_analisis_vh, calcular_ratios
-from exporter import exportar_a_excel
+from processor import ProcesadorIncremental
+from cache import CacheParseo
+from analyzer import AnalizadorIncremental
+from registro_ratios import DESCRIPCION_MOTIVOS, MOTIVO_VALIDO
+from exporter import GRAFICAS_IMAGENES, GRAFICAS_NATIVAS, exportar_a_excel
+from exporter_columnar import FORMATOS_COLUMNARES, exportar_columnar, tablas_reporte
+from memo import memo_global
+from tendencias import VENTANA_POR_DEFECTO
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 
 
@@ -19,6 +27,23 @@ st.set_page_config(
 
 apply_custom_styles()
 
+@st.cache_resource
+def _executor_exportacion():
+    """Pool compartido por todas las sesiones para generar los Excel en segundo plano."""
+    return ThreadPoolExecutor(max_workers=2)
+
+_ETIQUETAS_COLUMNARES = {'parquet': "Parquet (.zip)", 'arrow': "Arrow IPC / Feather (.zip)", 'csv': "CSV (.zip)"}
+
+def _excel_bytes(*args, **kwargs):
+    return exportar_a_excel(*args, **kwargs).getvalue()
+
+@st.fragment(run_every=1)
+def _esperar_exportacion(futuro):
+    """Consulta cada segundo la generación en curso y recarga la página cuando termina."""
+    if futuro.done():
+        st.rerun()
+    st.info("⏳ Generando Excel con estilos y gráficas... puedes seguir navegando por las otras pestañas.")
+
 # ================= HEADER CON LOGO =================
 col_logo, col_title = st.columns([1, 5])
 with col_logo:
@@ -55,16 +80,30 @@ elif len(archivos) < 5:
     st.stop()
 
 # ================= PROCESAR ARCHIVOS =================
+if "procesador" not in st.session_state:
+    st.session_state["procesador"] = ProcesadorIncremental(cache=CacheParseo())
 with st.spinner("📦 Procesando archivos..."):
-    df_balance, df_resultados, df_flujo_efectivo = procesar_archivos(archivos)
+    df_balance, df_resultados, df_flujo_efectivo = st.session_state["procesador"].actualizar(archivos)
 
-# ================= ANÁLISIS VERTICAL Y HORIZONTAL =================
-with st.spinner("📈 Calculando análisis vertical y horizontal..."):
-    df_vertical_balance, df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados = calcular_analisis_vh(df_balance, df_resultados)
+# ================= ANÁLISIS VERTICAL Y HORIZONTAL Y RATIOS =================
+# Solo se recalculan los años y cuentas que cambiaron desde el rerun anterior
+if "analizador" not in st.session_state:
+    st.session_state["analizador"] = AnalizadorIncremental()
+with st.spinner("📈 Calculando análisis vertical y horizontal y ratios financieros..."):
+    analisis_vh, analisis_ratios, analisis_flujo = st.session_state["analizador"].actualizar(
+        df_balance, df_resultados, df_flujo_efectivo)
+(df_vertical_balance, df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados,
+ df_vertical_flujo, df_horizontal_flujo) = analisis_vh
+df_ratios, df_motivos, debug_info, anios_comunes = analisis_ratios
+df_montos_flujo, df_ratios_flujo, df_motivos_flujo = analisis_flujo
 
-# ================= CÁLCULO DE RATIOS =================
-with st.spinner("🧮 Calculando ratios financieros..."):
-    df_ratios, debug_info, anios_comunes = calcular_ratios(df_balance, df_resultados)
+# ================= TENDENCIAS =================
+series_tendencias = {
+    "Ratios": df_ratios, "Ratios Flujo": df_ratios_flujo, "Balance": df_balance,
+    "Resultados": df_resultados, "Flujo Efectivo": df_flujo_efectivo,
+}
+# Se recalculan solo cuando el analizador devuelve estados o ratios nuevos (no en clics ni fragmentos)
+df_tendencias, df_media_movil, df_volatilidad, df_drawdown = st.session_state["analizador"].tendencias()
 
 # ================= SIDEBAR STATUS =================
 with st.sidebar:
@@ -75,7 +114,7 @@ with st.sidebar:
     st.metric("Ratios Calculados", len(df_ratios) if not df_ratios.empty else 0)
 
 # ================= TABS =================
-tab1, tab2, tab3, tab4 = st.tabs(["📊 Estados Financieros", "📈 Análisis V/H", "🧮 Ratios y Gráficas", "📥 Descargar"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Estados Financieros", "📈 Análisis V/H", "🧮 Ratios y Gráficas", "📉 Tendencias", "📥 Descargar"])
 
 with tab1:
     st.subheader("💼 Estado de Situación Financiera")
@@ -118,6 +157,17 @@ with tab2:
         st.markdown("**Análisis Horizontal (Variación %)**")
         if not df_horizontal_resultados.empty:
             st.dataframe(df_horizontal_resultados.fillna("N/A"), use_container_width=True)
+    st.markdown("---")
+    st.subheader("📊 Análisis Vertical y Horizontal - Estado de Flujo de Efectivo")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Análisis Vertical (% del flujo de operación)**")
+        if not df_vertical_flujo.empty:
+            st.dataframe(df_vertical_flujo.fillna("N/A"), use_container_width=True)
+    with col2:
+        st.markdown("**Análisis Horizontal (Variación %)**")
+        if not df_horizontal_flujo.empty:
+            st.dataframe(df_horizontal_flujo.fillna("N/A"), use_container_width=True)
 
 with tab3:
     st.subheader("🧮 Ratios Financieros")
@@ -125,39 +175,47 @@ with tab3:
         ultimo_anio = df_ratios.columns[-1]
         penultimo_anio = df_ratios.columns[-2] if len(df_ratios.columns) > 1 else ultimo_anio
         def format_pct(val):
-            return f"{val:.2%}" if isinstance(val, (int, float)) else "N/A"
+            return f"{val:.2%}" if pd.notna(val) else "N/A"
         def format_num(val, dec=2):
-            return f"{val:.{dec}f}" if isinstance(val, (int, float)) else "N/A"
+            return f"{val:.{dec}f}" if pd.notna(val) else "N/A"
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            val_actual = df_ratios.loc['ROE', ultimo_anio] if 'ROE' in df_ratios.index else "N/A"
-            val_anterior = df_ratios.loc['ROE', penultimo_anio] if 'ROE' in df_ratios.index else "N/A"
-            delta = val_actual - val_anterior if isinstance(val_actual,(int,float)) and isinstance(val_anterior,(int,float)) else None
+            val_actual = df_ratios.loc['ROE', ultimo_anio] if 'ROE' in df_ratios.index else np.nan
+            val_anterior = df_ratios.loc['ROE', penultimo_anio] if 'ROE' in df_ratios.index else np.nan
+            delta = val_actual - val_anterior if pd.notna(val_actual) and pd.notna(val_anterior) else None
             st.metric("ROE", format_pct(val_actual), delta=(format_pct(delta) if delta is not None else None))
         with col2:
-            val_actual = df_ratios.loc['ROA', ultimo_anio] if 'ROA' in df_ratios.index else "N/A"
-            val_anterior = df_ratios.loc['ROA', penultimo_anio] if 'ROA' in df_ratios.index else "N/A"
-            delta = val_actual - val_anterior if isinstance(val_actual,(int,float)) and isinstance(val_anterior,(int,float)) else None
+            val_actual = df_ratios.loc['ROA', ultimo_anio] if 'ROA' in df_ratios.index else np.nan
+            val_anterior = df_ratios.loc['ROA', penultimo_anio] if 'ROA' in df_ratios.index else np.nan
+            delta = val_actual - val_anterior if pd.notna(val_actual) and pd.notna(val_anterior) else None
             st.metric("ROA", format_pct(val_actual), delta=(format_pct(delta) if delta is not None else None))
         with col3:
-            val_actual = df_ratios.loc['Liquidez Corriente', ultimo_anio] if 'Liquidez Corriente' in df_ratios.index else "N/A"
-            val_anterior = df_ratios.loc['Liquidez Corriente', penultimo_anio] if 'Liquidez Corriente' in df_ratios.index else "N/A"
-            delta = val_actual - val_anterior if isinstance(val_actual,(int,float)) and isinstance(val_anterior,(int,float)) else None
+            val_actual = df_ratios.loc['Liquidez Corriente', ultimo_anio] if 'Liquidez Corriente' in df_ratios.index else np.nan
+            val_anterior = df_ratios.loc['Liquidez Corriente', penultimo_anio] if 'Liquidez Corriente' in df_ratios.index else np.nan
+            delta = val_actual - val_anterior if pd.notna(val_actual) and pd.notna(val_anterior) else None
             st.metric("Liquidez Corriente", format_num(val_actual,2), delta=(format_num(delta,2) if delta is not None else None))
         with col4:
-            val_actual = df_ratios.loc['Margen Neto', ultimo_anio] if 'Margen Neto' in df_ratios.index else "N/A"
-            val_anterior = df_ratios.loc['Margen Neto', penultimo_anio] if 'Margen Neto' in df_ratios.index else "N/A"
-            delta = val_actual - val_anterior if isinstance(val_actual,(int,float)) and isinstance(val_anterior,(int,float)) else None
+            val_actual = df_ratios.loc['Margen Neto', ultimo_anio] if 'Margen Neto' in df_ratios.index else np.nan
+            val_anterior = df_ratios.loc['Margen Neto', penultimo_anio] if 'Margen Neto' in df_ratios.index else np.nan
+            delta = val_actual - val_anterior if pd.notna(val_actual) and pd.notna(val_anterior) else None
             st.metric("Margen Neto", format_pct(val_actual), delta=(format_pct(delta) if delta is not None else None))
         st.markdown("---")
         st.markdown("### 📋 Tabla de Ratios")
-        st.dataframe(df_ratios, use_container_width=True)
+        st.dataframe(df_ratios.style.format(precision=4, na_rep="N/A"), use_container_width=True)
+        motivos = df_motivos.stack()
+        motivos = motivos[motivos != MOTIVO_VALIDO]
+        if not motivos.empty:
+            with st.expander("ℹ️ ¿Por qué algunos ratios son N/A?"):
+                st.dataframe(
+                    motivos.map(DESCRIPCION_MOTIVOS).rename("Motivo").rename_axis(["Ratio", "Año"]).to_frame(),
+                    use_container_width=True
+                )
         st.markdown("---")
         st.markdown("### 📈 Gráficas Individuales por Ratio")
         col1, col2 = st.columns(2)
         for idx, ratio in enumerate(df_ratios.index):
             fig = go.Figure()
-            yvals = pd.to_numeric(df_ratios.loc[ratio], errors='coerce')
+            yvals = df_ratios.loc[ratio]
             fig.add_trace(go.Scatter(
                 x=df_ratios.columns,
                 y=yvals,
@@ -181,23 +239,129 @@ with tab3:
                     st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("No se pudieron calcular ratios")
+    st.markdown("---")
+    st.markdown("### 💧 Flujo de Efectivo y Calidad de Utilidades")
+    if not df_ratios_flujo.empty:
+        st.dataframe(df_montos_flujo.style.format("{:,.0f}", na_rep="N/A"), use_container_width=True)
+        st.dataframe(df_ratios_flujo.style.format(precision=4, na_rep="N/A"), use_container_width=True)
+        motivos_flujo = df_motivos_flujo.stack()
+        motivos_flujo = motivos_flujo[motivos_flujo != MOTIVO_VALIDO]
+        if not motivos_flujo.empty:
+            with st.expander("ℹ️ ¿Por qué algunos ratios del flujo son N/A?"):
+                st.dataframe(
+                    motivos_flujo.map(DESCRIPCION_MOTIVOS).rename("Motivo").rename_axis(["Ratio", "Año"]).to_frame(),
+                    use_container_width=True
+                )
+    else:
+        st.warning("No hay años comunes entre el flujo de efectivo, el balance y los resultados")
 
 with tab4:
+    st.subheader("📉 Tendencias Multianuales")
+    if not df_tendencias.empty:
+        st.caption(f"CAGR entre el primer y el último año con dato; media y volatilidad móviles de {VENTANA_POR_DEFECTO} años "
+                   "calendario (los años faltantes se tratan como huecos); pendiente por mínimos cuadrados por año.")
+        origen = st.selectbox("Estado", df_tendencias.index.get_level_values('Origen').unique(), key="tendencias_origen")
+        resumen = df_tendencias.xs(origen, level='Origen')
+        st.dataframe(resumen.style.format({
+            'Desde': '{:.0f}', 'Hasta': '{:.0f}', 'CAGR': '{:.2%}', 'Máx. Drawdown': '{:.2%}',
+            'Pendiente': '{:,.4f}', 'Media Móvil': '{:,.4f}', 'Volatilidad': '{:,.4f}'
+        }, na_rep="N/A"), use_container_width=True)
+        cuenta = st.selectbox("Cuenta / Ratio", resumen.index, key="tendencias_cuenta")
+        valores = series_tendencias[origen].loc[cuenta]
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=valores.index, y=valores, mode='lines+markers', name="Valor", line=dict(width=3)))
+        fig.add_trace(go.Scatter(x=valores.index, y=df_media_movil.loc[(origen, cuenta)].reindex(valores.index), mode='lines',
+                                 name=f"Media móvil {VENTANA_POR_DEFECTO} años", line=dict(dash='dash')))
+        fig.update_layout(title=f"{cuenta}", xaxis_title="Año", yaxis_title="Valor", height=400)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.warning("No hay datos suficientes para calcular tendencias")
+
+with tab5:
     st.subheader("📥 Descargar Reporte Consolidado")
     st.markdown(f"**Empresa:** {nombre_empresa}")
     st.markdown(f"**Años analizados:** {', '.join(map(str, anios_comunes)) if anios_comunes else 'N/A'}")
-    with st.spinner("🎨 Generando Excel con estilos y gráficas..."):
-        output_excel = exportar_a_excel(
-            df_balance, df_resultados, df_flujo_efectivo,
-            df_vertical_balance, df_horizontal_balance,
-            df_vertical_resultados, df_horizontal_resultados,
-            df_ratios, nombre_empresa, anios_comunes
+    graficas_como_imagen = st.checkbox("Insertar las gráficas como imágenes (más lento; por defecto son gráficas nativas de Excel)")
+    graficas = GRAFICAS_IMAGENES if graficas_como_imagen else GRAFICAS_NATIVAS
+
+    # El Excel solo se genera cuando se pide, en segundo plano, y queda memorizado por el
+    # contenido de los datos y el nombre de la empresa: los reruns sin cambios no lo regeneran
+    entradas_excel = (df_balance, df_resultados, df_flujo_efectivo, df_vertical_balance, df_horizontal_balance,
+                      df_vertical_resultados, df_horizontal_resultados, df_vertical_flujo, df_horizontal_flujo,
+                      df_ratios, df_montos_flujo, df_ratios_flujo, df_tendencias, nombre_empresa, anios_comunes, graficas)
+    memo = memo_global()
+    clave_excel = memo.clave("exportar_a_excel", entradas_excel)
+    exportaciones = st.session_state.setdefault("exportaciones", {})
+    # Solo se guarda la exportación de los datos y opciones actuales: las anteriores se cancelan
+    # si aún no empezaron (si ya corren, su resultado igual queda en el memo) y se sueltan
+    for clave in [clave for clave in exportaciones if clave != clave_excel]:
+        exportaciones.pop(clave).cancel()
+    output_excel = memo.buscar(clave_excel)
+    futuro = exportaciones.get(clave_excel)
+    if futuro is not None and futuro.done():
+        del exportaciones[clave_excel]
+        try:
+            output_excel = futuro.result()
+        except Exception as e:
+            st.error(f"❌ No se pudo generar el Excel: {e}")
+        futuro = None
+
+    if output_excel is not None:
+        st.download_button(
+            label="📥 Descargar Excel Consolidado (Con Gráficas)",
+            data=output_excel,
+            file_name=f"Analisis_Financiero_{nombre_empresa.replace(' ', '_')}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="download_excel_con_graficas"
         )
-    st.download_button(
-        label="📥 Descargar Excel Consolidado (Con Gráficas)",
-        data=output_excel.getvalue(),
-        file_name=f"Analisis_Financiero_{nombre_empresa.replace(' ', '_')}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        key="download_excel_con_graficas"
+        st.success("✅ ¡Proceso completado! El archivo incluye estados financieros, análisis V/H, ratios, flujo de efectivo, tendencias y gráficas.")
+    elif futuro is not None:
+        _esperar_exportacion(futuro)
+    elif st.button("⚙️ Generar Excel Consolidado", key="generar_excel"):
+        exportaciones[clave_excel] = _executor_exportacion().submit(
+            memo.calcular, "exportar_a_excel", entradas_excel, partial(
+                _excel_bytes,
+                df_balance, df_resultados, df_flujo_efectivo,
+                df_vertical_balance, df_horizontal_balance,
+                df_vertical_resultados, df_horizontal_resultados,
+                df_ratios, nombre_empresa, anios_comunes,
+                df_vertical_flujo=df_vertical_flujo, df_horizontal_flujo=df_horizontal_flujo,
+                df_tendencias=df_tendencias, df_montos_flujo=df_montos_flujo, df_ratios_flujo=df_ratios_flujo,
+                # En un hilo del servidor no se debe hacer fork de un pool de procesos
+                graficas=graficas, graficas_en_paralelo=False
+            ))
+        st.rerun()
+    st.markdown("---")
+    st.markdown("**Datos para otros sistemas:** todas las tablas con columnas tipadas y metadatos (empresa, años), sin estilos.")
+    formato_columnar = st.selectbox(
+        "Formato de datos", [None, *FORMATOS_COLUMNARES],
+        format_func=lambda formato: "—" if formato is None else _ETIQUETAS_COLUMNARES[formato],
+        key="formato_columnar"
     )
-    st.success("✅ ¡Proceso completado! El archivo incluye estados financieros, análisis V/H, ratios y gráficas.")
\ No newline at end of file
+    if formato_columnar is not None:
+        try:
+            # Se escribe directamente desde los DataFrames (sin estilos): es rápido y no necesita segundo plano
+            output_columnar = memo_global().calcular(
+                "exportar_columnar", (df_balance, df_resultados, df_flujo_efectivo, df_vertical_balance,
+                                      df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados,
+                                      df_vertical_flujo, df_horizontal_flujo, df_ratios, df_motivos, df_montos_flujo,
+                                      df_ratios_flujo, df_motivos_flujo, df_tendencias, nombre_empresa,
+                                      anios_comunes, formato_columnar),
+                lambda: exportar_columnar(tablas_reporte(
+                    df_balance, df_resultados, df_flujo_efectivo,
+                    df_vertical_balance, df_horizontal_balance,
+                    df_vertical_resultados, df_horizontal_resultados, df_ratios,
+                    df_vertical_flujo=df_vertical_flujo, df_horizontal_flujo=df_horizontal_flujo,
+                    df_motivos=df_motivos, df_tendencias=df_tendencias, df_montos_flujo=df_montos_flujo,
+                    df_ratios_flujo=df_ratios_flujo, df_motivos_flujo=df_motivos_flujo
+                ), formato_columnar, nombre_empresa, anios_comunes))
+        except ImportError as e:
+            st.error(f"❌ {e}")
+        else:
+            st.download_button(
+                label=f"📦 Descargar {_ETIQUETAS_COLUMNARES[formato_columnar]}",
+                data=output_columnar,
+                file_name=f"Analisis_Financiero_{nombre_empresa.replace(' ', '_')}_{formato_columnar}.zip",
+                mime="application/zip",
+                key="download_columnar"
+            )
@@ -0,0 +1,84 @@
+"""Benchmark de procesar_archivos sobre archivos SMV sintéticos.
+
+Mide, para cada tamaño de lote: tiempo total, throughput (archivos/s), latencia por
+archivo (mediana y p95 del parseo individual) y memoria pico (tracemalloc).
+
+    python -m benchmarks.bench_procesador --tamanios 5 50 500 2000
+"""
+import argparse
+import gc
+import io
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.generador_smv import generar_archivo
+from processor import _parsear_contenido, procesar_archivos
+
+TAMANIOS = (5, 20, 100, 500, 2000)
+
+def generar_lote(n, n_cuentas=None, n_columnas=2, ruido=0.1, relleno_kb=40):
+    """n archivos en memoria; los años recorren 2002-2024 cíclicamente (pre y post 2010)."""
+    return [
+        generar_archivo(2002 + i % 23, n_cuentas=n_cuentas, n_columnas=n_columnas, ruido=ruido,
+                        relleno_kb=relleno_kb, semilla=i)
+        for i in range(n)
+    ]
+
+def medir_lote(contenidos, repeticiones=3, paralelo=False):
+    """Devuelve las métricas de procesar_archivos para un lote de contenidos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        archivos = [io.BytesIO(c) for c in contenidos]
+        gc.collect()
+        inicio = time.perf_counter()
+        procesar_archivos(archivos, paralelo=paralelo)
+        tiempos.append(time.perf_counter() - inicio)
+    total = min(tiempos)
+
+    latencias = []
+    for datos in contenidos[:200]:
+        inicio = time.perf_counter()
+        _parsear_contenido(datos)
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+
+    archivos = [io.BytesIO(c) for c in contenidos]
+    gc.collect()
+    tracemalloc.start()
+    procesar_archivos(archivos)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'archivos': len(contenidos),
+        'mb_entrada': sum(len(c) for c in contenidos) / 1e6,
+        'total_s': total,
+        'archivos_s': len(contenidos) / total if total else float('inf'),
+        'lat_mediana_ms': statistics.median(latencias) * 1e3,
+        'lat_p95_ms': latencias[min(int(len(latencias) * 0.95), len(latencias) - 1)] * 1e3,
+        'pico_mb': pico / 1e6,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de procesar_archivos con archivos SMV sintéticos.")
+    parser.add_argument('--tamanios', type=int, nargs='+', default=list(TAMANIOS))
+    parser.add_argument('--cuentas', type=int, default=None, help="Cuentas por tabla")
+    parser.add_argument('--columnas', type=int, default=2, help="Columnas de años por archivo")
+    parser.add_argument('--ruido', type=float, default=0.1)
+    parser.add_argument('--relleno-kb', type=int, default=40, help="Markup ajeno a las tablas por archivo")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--paralelo', action='store_true')
+    args = parser.parse_args(argv)
+
+    encabezado = f"{'archivos':>8} {'MB':>8} {'total s':>9} {'arch/s':>9} {'lat med ms':>11} {'lat p95 ms':>11} {'pico MB':>9}"
+    print(encabezado)
+    print('-' * len(encabezado))
+    for n in args.tamanios:
+        contenidos = generar_lote(n, args.cuentas, args.columnas, args.ruido, args.relleno_kb)
+        m = medir_lote(contenidos, args.repeticiones, args.paralelo)
+        print(f"{m['archivos']:>8} {m['mb_entrada']:>8.1f} {m['total_s']:>9.3f} {m['archivos_s']:>9.1f} "
+              f"{m['lat_mediana_ms']:>11.2f} {m['lat_p95_ms']:>11.2f} {m['pico_mb']:>9.1f}")
+
+if __name__ == '__main__':
+    main()
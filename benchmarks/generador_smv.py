@@ -0,0 +1,160 @@
+"""Generador de archivos sintéticos con el formato HTML (.xls) que descarga el SMV.
+
+    python -m benchmarks.generador_smv salida/ --emisores 3 --desde 2005 --hasta 2023
+"""
+import argparse
+import os
+import random
+
+CUENTAS_BALANCE = [
+    "Efectivo y Equivalentes al Efectivo", "Otros Activos Financieros",
+    "Cuentas por Cobrar Comerciales (neto)", "Cuentas por Cobrar a Entidades Relacionadas",
+    "Otras Cuentas por Cobrar (neto)", "Anticipos", "Inventarios",
+    "Activos Biológicos", "Activos por Impuestos a las Ganancias", "Otros Activos no Financieros",
+    "Total Activos Corrientes", "Inversiones en Subsidiarias, Negocios Conjuntos y Asociadas",
+    "Propiedades de Inversión", "Propiedades, Planta y Equipo (neto)",
+    "Activos Intangibles Distintos de la Plusvalía", "Activos por Impuestos Diferidos",
+    "Plusvalía", "Total Activos No Corrientes", "TOTAL DE ACTIVOS",
+    "Otros Pasivos Financieros", "Cuentas por Pagar Comerciales",
+    "Cuentas por Pagar a Entidades Relacionadas", "Otras Cuentas por Pagar",
+    "Provisión por Beneficios a los Empleados", "Pasivos por Impuestos a las Ganancias",
+    "Total Pasivos Corrientes", "Pasivos por Impuestos Diferidos", "Total Pasivos No Corrientes",
+    "Total Pasivos", "Capital Emitido", "Primas de Emisión", "Otras Reservas de Capital",
+    "Resultados Acumulados", "Otras Reservas de Patrimonio", "Total Patrimonio",
+    "TOTAL PASIVO Y PATRIMONIO",
+]
+CUENTAS_BALANCE_ANTIGUAS = [
+    "Caja y Bancos", "Valores Negociables", "Cuentas por Cobrar Comerciales",
+    "Cuentas por Cobrar a Vinculadas", "Otras Cuentas por Cobrar", "Existencias",
+    "Gastos Pagados por Anticipado", "Total Activo Corriente", "Inversiones Permanentes",
+    "Inmuebles, Maquinaria y Equipo (neto de depreciación acumulada)", "Activos Intangibles",
+    "Otros Activos", "Total Activo", "Sobregiros y Pagarés Bancarios",
+    "Cuentas por Pagar Comerciales", "Parte Corriente de las Deudas a Largo Plazo",
+    "Total Pasivo Corriente", "Deudas a Largo Plazo", "Ingresos Diferidos", "Total Pasivo",
+    "Capital", "Capital Adicional", "Reservas Legales", "Resultados Acumulados",
+    "Total Patrimonio Neto", "Total Pasivo y Patrimonio Neto",
+]
+CUENTAS_RESULTADOS = [
+    "Ingresos de Actividades Ordinarias", "Costo de Ventas", "Ganancia (Pérdida) Bruta",
+    "Gastos de Ventas y Distribución", "Gastos de Administración", "Otros Ingresos Operativos",
+    "Otros Gastos Operativos", "Ganancia (Pérdida) Operativa", "Ingresos Financieros",
+    "Gastos Financieros", "Diferencias de Cambio neto", "Ganancia (Pérdida) antes de Impuestos",
+    "Ingreso (Gasto) por Impuesto", "Ganancia (Pérdida) Neta de Operaciones Continuadas",
+    "Ganancia (Pérdida) Neta del Ejercicio",
+]
+CUENTAS_RESULTADOS_ANTIGUAS = [
+    "Ventas Netas (ingresos operacionales)", "Otros Ingresos Operacionales",
+    "Total de Ingresos Brutos", "Costo de Ventas", "Utilidad Bruta", "Gastos de Ventas",
+    "Gastos de Administración", "Utilidad Operativa", "Ingresos Financieros",
+    "Gastos Financieros", "Otros Ingresos", "Otros Gastos", "Participaciones",
+    "Impuesto a la Renta", "Utilidad (Pérdida) Neta del Ejercicio",
+]
+CUENTAS_FLUJO = [
+    "Cobranza de Venta de Bienes y Prestación de Servicios", "Pagos a Proveedores de Bienes y Servicios",
+    "Pagos a y por Cuenta de los Empleados", "Intereses Pagados", "Impuestos a las Ganancias Pagados",
+    "Flujos de Efectivo y Equivalente al Efectivo Procedente de (Utilizados en) Actividades de Operación",
+    "Compra de Propiedades, Planta y Equipo", "Compra de Activos Intangibles",
+    "Flujos de Efectivo y Equivalente al Efectivo Procedente de (Utilizados en) Actividades de Inversión",
+    "Obtención de Préstamos", "Amortización o Pago de Préstamos", "Dividendos Pagados",
+    "Flujos de Efectivo y Equivalente al Efectivo Procedente de (Utilizados en) Actividades de Financiación",
+    "Aumento (Disminución) Neto de Efectivo y Equivalentes al Efectivo",
+    "Efectivo y Equivalentes al Efectivo al Inicio del Ejercicio",
+    "Efectivo y Equivalentes al Efectivo al Finalizar el Ejercicio",
+]
+SECCIONES_BALANCE = ["ACTIVOS", "Activos Corrientes", "Activos No Corrientes", "PASIVOS Y PATRIMONIO",
+                     "Pasivos Corrientes", "Pasivos No Corrientes", "Patrimonio"]
+
+def _cuentas(base, n, r):
+    """Devuelve n cuentas: las de la lista base y, si faltan, cuentas adicionales numeradas."""
+    cuentas = list(base[:n])
+    while len(cuentas) < n:
+        cuentas.append(f"{r.choice(base)} - Detalle {len(cuentas) - len(base) + 1}")
+    return cuentas
+
+def _formatear(valor, r, ruido):
+    if r.random() < ruido * 0.3:
+        return ""
+    if valor == 0:
+        return "0"
+    texto = f"{abs(valor):,.0f}"
+    if r.random() < ruido:
+        texto = texto.replace(",", "\xa0")
+    return f"({texto})" if valor < 0 else texto
+
+def _tabla(id_tabla, cuentas, encabezados, r, ruido, secciones=()):
+    partes = [f'<table cellspacing="0" rules="all" border="1" id="{id_tabla}" style="border-collapse:collapse;">',
+              '<tr class="HeaderStyle"><th scope="col">Cuenta</th><th scope="col">Nota</th>'
+              + "".join(f'<th scope="col">{e}</th>' for e in encabezados) + "</tr>"]
+    vacias = '<td>&nbsp;</td>' * len(encabezados)
+    pendientes = list(secciones)
+    for i, cuenta in enumerate(cuentas):
+        if pendientes and i % max(len(cuentas) // (len(secciones) or 1), 1) == 0:
+            partes.append(f'<tr class="RowStyle"><td><b>{pendientes.pop(0)}</b></td><td></td>{vacias}</tr>')
+        nota = f" ({r.randint(1, 35)})" if r.random() < ruido else ""
+        if r.random() < ruido * 0.5:
+            valores = [0] * len(encabezados)
+        else:
+            valores = [int(r.lognormvariate(12, 2)) * (-1 if r.random() < 0.15 else 1) for _ in encabezados]
+        celdas = "".join(f'<td align="right">{_formatear(v, r, ruido)}</td>' for v in valores)
+        partes.append(f'<tr class="RowStyle">\r\n\t<td>\r\n\t\t{cuenta}{nota}\r\n\t</td><td>{r.randint(1, 30) if r.random() < 0.5 else ""}</td>{celdas}</tr>')
+    partes.append("</table>")
+    return "\n".join(partes)
+
+def generar_archivo(anio, n_cuentas=None, n_columnas=2, ruido=0.1, relleno_kb=40, flujo=True, semilla=None):
+    """Genera el contenido (bytes, latin-1) de un archivo SMV con los estados de ``anio``.
+
+    - n_cuentas: cuentas por tabla (por defecto las de la plantilla de cada estado).
+    - n_columnas: columnas de años (anio, anio-1, ...), como en los reportes del SMV.
+    - Años anteriores a 2010 usan la nomenclatura antigua.
+    - ruido: proporción de celdas vacías, notas "(9)", \\xa0 como separador y filas en cero.
+    - relleno_kb: tamaño aproximado del markup y scripts ajenos a las tablas.
+    """
+    r = random.Random(semilla if semilla is not None else anio)
+    antiguo = anio < 2010
+    encabezados = [str(anio - i) if r.random() < 0.5 else f"31/12/{anio - i}" for i in range(n_columnas)]
+    balance = CUENTAS_BALANCE_ANTIGUAS if antiguo else CUENTAS_BALANCE
+    resultados = CUENTAS_RESULTADOS_ANTIGUAS if antiguo else CUENTAS_RESULTADOS
+    relleno = ('<div class="menu"><a href="#">Opción</a><span>Texto de relleno del portal</span></div>\n'
+               * max(relleno_kb * 1024 // 80, 0))
+    html = [
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1">',
+        '<script type="text/javascript">var html = "<table id=\\"gvReporte\\"><tr><td>x</td></tr></table>";</script>',
+        '<style>td { font-size: 8pt; }</style></head><body>',
+        relleno,
+        f'<span id="lblTitulo">Estados Financieros {anio}</span><!-- comentario -->',
+        _tabla("gvReporte", _cuentas(balance, n_cuentas or len(balance), r), encabezados, r, ruido, SECCIONES_BALANCE),
+        _tabla("gvReporte1", _cuentas(resultados, n_cuentas or len(resultados), r), encabezados, r, ruido),
+    ]
+    if flujo:
+        html.append(_tabla("gvReporte3", _cuentas(CUENTAS_FLUJO, n_cuentas or len(CUENTAS_FLUJO), r), encabezados, r, ruido))
+    html.append(relleno[:len(relleno) // 4])
+    html.append('</body></html>')
+    return "\n".join(html).encode('latin-1', errors='replace')
+
+def generar_emisor(desde=2005, hasta=2023, semilla=0, **opciones):
+    """Devuelve [(nombre_archivo, bytes)] con un archivo por año para un emisor."""
+    return [
+        (f"EEFF_{anio}.xls", generar_archivo(anio, semilla=semilla * 10000 + anio, **opciones))
+        for anio in range(desde, hasta + 1)
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera archivos SMV sintéticos (.xls HTML).")
+    parser.add_argument('salida')
+    parser.add_argument('--emisores', type=int, default=1)
+    parser.add_argument('--desde', type=int, default=2005)
+    parser.add_argument('--hasta', type=int, default=2023)
+    parser.add_argument('--cuentas', type=int, default=None, help="Cuentas por tabla")
+    parser.add_argument('--columnas', type=int, default=2, help="Columnas de años por archivo")
+    parser.add_argument('--ruido', type=float, default=0.1)
+    args = parser.parse_args(argv)
+    for i in range(args.emisores):
+        directorio = os.path.join(args.salida, f"EMISOR_{i + 1:03d}")
+        os.makedirs(directorio, exist_ok=True)
+        for nombre, contenido in generar_emisor(args.desde, args.hasta, semilla=i, n_cuentas=args.cuentas,
+                                                n_columnas=args.columnas, ruido=args.ruido):
+            with open(os.path.join(directorio, nombre), 'wb') as f:
+                f.write(contenido)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import os
+import hashlib
+import struct
+import threading
+import zlib
+from acumulador import AcumuladorLargo
+
+# Versión del formato de los datos parseados; cambiarla invalida las entradas anteriores
+VERSION_PARSEO = 3
+MAGIC = b'SMV1'
+DIRECTORIO_CACHE = os.environ.get(
+    'SMV_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'consolidador_smv')
+)
+MAX_BYTES_CACHE = int(os.environ.get('SMV_CACHE_MAX_MB', '256')) * 1024 * 1024
+# Al desalojar se baja hasta esta fracción del límite, para no recorrer el directorio en cada escritura
+FRACCION_DESALOJO = 0.9
+
+class AlmacenDisco:
+    """Almacén clave → bytes en un directorio, con límite de tamaño y desalojo LRU.
+
+    El tamaño total se mide una vez al crear el almacén y luego se lleva en cada escritura y
+    desalojo; el directorio solo se vuelve a recorrer cuando ese total supera max_bytes (lo que
+    además lo corrige si otros procesos escribieron en el mismo directorio).
+    """
+
+    def __init__(self, directorio, max_bytes=MAX_BYTES_CACHE, extension='.bin'):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._candado = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+        _, self.total = self._escanear()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave + self.extension)
+
+    def leer(self, clave):
+        """Devuelve los bytes guardados para la clave o None; marca la entrada como usada."""
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            os.utime(ruta)
+        except OSError:
+            return None
+        return datos
+
+    def escribir(self, clave, datos):
+        """Guarda los bytes de forma atómica y desaloja las entradas menos usadas si se excede el límite."""
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            anterior = os.path.getsize(ruta)
+        except OSError:
+            anterior = 0
+        try:
+            with open(temporal, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return
+        with self._candado:
+            self.total += len(datos) - anterior
+            excedido = self.total > self.max_bytes
+        if excedido:
+            self.desalojar()
+
+    def _escanear(self):
+        """Entradas [(último acceso, tamaño, ruta)] del directorio y su tamaño total."""
+        entradas = []
+        total = 0
+        with os.scandir(self.directorio) as it:
+            for entrada in it:
+                if not entrada.name.endswith(self.extension):
+                    continue
+                try:
+                    st = entrada.stat()
+                except OSError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, entrada.path))
+                total += st.st_size
+        return entradas, total
+
+    def desalojar(self):
+        """Si se excede max_bytes, elimina las entradas más antiguas (por último acceso) hasta
+        bajar a FRACCION_DESALOJO del límite."""
+        with self._candado:
+            entradas, total = self._escanear()
+            if total > self.max_bytes:
+                objetivo = self.max_bytes * FRACCION_DESALOJO
+                entradas.sort()
+                for _, tamanio, ruta in entradas:
+                    if total <= objetivo:
+                        break
+                    try:
+                        os.remove(ruta)
+                        total -= tamanio
+                    except OSError:
+                        continue
+            self.total = total
+
+def huella_bytes(datos):
+    """Hash SHA-256 (hex) del contenido crudo de un archivo."""
+    return hashlib.sha256(datos).hexdigest()
+
+def serializar_parcial(acumulador):
+    """Serializa las celdas de un AcumuladorLargo a un binario compacto.
+
+    Se guarda la tabla de nombres de cuenta y las cuatro columnas (estado, id de cuenta,
+    año, valor) tal cual están en memoria, comprimido con zlib.
+    """
+    nombres = '\x00'.join(acumulador.nombres).encode('utf-8')
+    cuerpo = b''.join([
+        struct.pack('<III', len(acumulador.nombres), len(nombres), len(acumulador)),
+        nombres,
+        acumulador.estados.tobytes(),
+        acumulador.cuentas.tobytes(),
+        acumulador.anios.tobytes(),
+        acumulador.valores.tobytes(),
+    ])
+    return MAGIC + zlib.compress(cuerpo, 6)
+
+def deserializar_parcial(datos):
+    """Reconstruye un AcumuladorLargo a partir del binario."""
+    if datos[:4] != MAGIC:
+        raise ValueError("Formato de cache no reconocido")
+    cuerpo = zlib.decompress(datos[4:])
+    n_cuentas, n_bytes, n = struct.unpack_from('<III', cuerpo, 0)
+    pos = 12
+    acumulador = AcumuladorLargo()
+    if n_cuentas:
+        for nombre in cuerpo[pos:pos + n_bytes].decode('utf-8').split('\x00'):
+            acumulador.id_cuenta(nombre)
+    pos += n_bytes
+    for columna in (acumulador.estados, acumulador.cuentas, acumulador.anios, acumulador.valores):
+        tamanio = columna.itemsize * n
+        columna.frombytes(cuerpo[pos:pos + tamanio])
+        pos += tamanio
+    if len(acumulador.nombres) != n_cuentas or pos != len(cuerpo):
+        raise ValueError("Entrada de cache incompleta")
+    return acumulador
+
+class CacheParseo:
+    """Cache persistente de archivos SMV parseados, indexada por el hash de sus bytes."""
+
+    def __init__(self, directorio=None, max_bytes=MAX_BYTES_CACHE):
+        self.almacen = AlmacenDisco(directorio or os.path.join(DIRECTORIO_CACHE, 'parseo'), max_bytes)
+
+    def clave(self, datos):
+        return f"v{VERSION_PARSEO}_{huella_bytes(datos)}"
+
+    def obtener(self, clave):
+        """Devuelve el AcumuladorLargo guardado o None si no existe o está corrupto."""
+        datos = self.almacen.leer(clave)
+        if datos is None:
+            return None
+        try:
+            return deserializar_parcial(datos)
+        except (ValueError, struct.error, zlib.error, UnicodeDecodeError):
+            return None
+
+    def guardar(self, clave, parcial):
+        self.almacen.escribir(clave, serializar_parcial(parcial))
@@ -0,0 +1,207 @@
+"""Consolidación por lotes (sin Streamlit) de muchos emisores SMV.
+
+Estructura esperada: un subdirectorio por emisor con sus archivos .xls del SMV
+(se buscan recursivamente). Uso:
+
+    python consolidar_lote.py datos/ --salida reportes/ --workers 8
+    python consolidar_lote.py datos/ --formato xlsx --formato parquet
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from analyzer import (apilar_emisores, calcular_analisis_vh, calcular_ratios_con_flujo,
+                      calcular_ratios_panel, estadisticas_sector)
+from cache import CacheParseo
+from exporter import GRAFICAS_IMAGENES, GRAFICAS_NATIVAS, exportar_a_excel
+from exporter_columnar import FORMATOS_COLUMNARES, aplanar, escribir_columnar, tablas_reporte, validar_formato
+from memo import Memo, huella_archivo
+from processor import procesar_archivos
+from registro_ratios import MOTIVO_SIN_ANIO
+from tendencias import calcular_tendencias_estados
+
+logger = logging.getLogger('consolidar_lote')
+
+_MODOS_GRAFICAS = {'nativas': GRAFICAS_NATIVAS, 'imagenes': GRAFICAS_IMAGENES, 'ninguna': None}
+FORMATOS_SALIDA = ('xlsx',) + FORMATOS_COLUMNARES
+
+def buscar_emisores(directorio):
+    """Devuelve {emisor: [rutas .xls ordenadas]} con un emisor por subdirectorio."""
+    emisores = {}
+    for entrada in sorted(os.scandir(directorio), key=lambda e: e.name):
+        if not entrada.is_dir():
+            continue
+        rutas = []
+        for raiz, _, nombres in os.walk(entrada.path):
+            rutas.extend(os.path.join(raiz, n) for n in nombres if n.lower().endswith('.xls'))
+        if rutas:
+            emisores[entrada.name] = sorted(rutas)
+    return emisores
+
+def nombre_reporte(emisor):
+    return f"Analisis_Financiero_{emisor.replace(' ', '_')}.xlsx"
+
+def directorio_columnar(salida, formato, emisor=None):
+    """Directorio de las tablas Parquet/Arrow/CSV de un emisor, o de las consolidadas si emisor es None.
+
+    Los emisores van bajo <formato>/emisores/ para que ninguno pise a <formato>/consolidado.
+    """
+    if emisor is None:
+        return os.path.join(salida, formato, 'consolidado')
+    return os.path.join(salida, formato, 'emisores', emisor.replace(' ', '_'))
+
+def _analizar(estados):
+    df_balance, df_resultados, df_flujo_efectivo = estados
+    analisis_ratios, (df_montos_flujo, df_ratios_flujo, df_motivos_flujo) = calcular_ratios_con_flujo(*estados)
+    df_tendencias, _, _, _ = calcular_tendencias_estados({
+        "Ratios": analisis_ratios[0], "Ratios Flujo": df_ratios_flujo, "Balance": df_balance,
+        "Resultados": df_resultados, "Flujo Efectivo": df_flujo_efectivo,
+    })
+    return (calcular_analisis_vh(*estados), analisis_ratios, (df_montos_flujo, df_ratios_flujo, df_motivos_flujo),
+            df_tendencias)
+
+def _exportar(estados, analisis, emisor, graficas):
+    df_balance, df_resultados, df_flujo_efectivo = estados
+    (df_vertical_balance, df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados,
+     df_vertical_flujo, df_horizontal_flujo), (df_ratios, _, _, anios_comunes), (df_montos_flujo, df_ratios_flujo, _), df_tendencias = analisis
+    return exportar_a_excel(
+        df_balance, df_resultados, df_flujo_efectivo,
+        df_vertical_balance, df_horizontal_balance,
+        df_vertical_resultados, df_horizontal_resultados,
+        df_ratios, emisor, anios_comunes,
+        df_vertical_flujo=df_vertical_flujo, df_horizontal_flujo=df_horizontal_flujo,
+        df_tendencias=df_tendencias, df_montos_flujo=df_montos_flujo, df_ratios_flujo=df_ratios_flujo,
+        graficas=graficas
+    ).getvalue()
+
+def _tablas(estados, analisis):
+    df_balance, df_resultados, df_flujo_efectivo = estados
+    (df_vertical_balance, df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados,
+     df_vertical_flujo, df_horizontal_flujo), (df_ratios, df_motivos, _, anios_comunes), (df_montos_flujo, df_ratios_flujo, df_motivos_flujo), df_tendencias = analisis
+    tablas = tablas_reporte(
+        df_balance, df_resultados, df_flujo_efectivo,
+        df_vertical_balance, df_horizontal_balance,
+        df_vertical_resultados, df_horizontal_resultados, df_ratios,
+        df_vertical_flujo=df_vertical_flujo, df_horizontal_flujo=df_horizontal_flujo, df_motivos=df_motivos,
+        df_tendencias=df_tendencias, df_montos_flujo=df_montos_flujo, df_ratios_flujo=df_ratios_flujo,
+        df_motivos_flujo=df_motivos_flujo
+    )
+    return tablas, anios_comunes
+
+def procesar_emisor(emisor, rutas, salida, usar_cache=True, graficas=GRAFICAS_NATIVAS, formatos=('xlsx',)):
+    """Procesa un emisor completo y escribe sus reportes en cada formato; devuelve (emisor, estados).
+
+    Con la cache activa cada etapa se memoriza en disco por la huella de sus entradas, así
+    que un emisor cuyos archivos no cambiaron entre corridas no se vuelve a parsear ni exportar.
+    Los formatos columnares (parquet, arrow, csv) se escriben directamente desde los DataFrames.
+    """
+    cache = CacheParseo() if usar_cache else None
+    memo = Memo(disco=usar_cache)
+    estados = memo.calcular("procesar_archivos", [huella_archivo(ruta) for ruta in rutas],
+                            lambda: procesar_archivos(rutas, cache=cache))
+    analisis = memo.calcular("analisis", estados, lambda: _analizar(estados))
+    if 'xlsx' in formatos:
+        output_excel = memo.calcular("exportar_a_excel", (estados, analisis, emisor, graficas),
+                                     lambda: _exportar(estados, analisis, emisor, graficas))
+        with open(os.path.join(salida, nombre_reporte(emisor)), 'wb') as f:
+            f.write(output_excel)
+    columnares = [formato for formato in formatos if formato in FORMATOS_COLUMNARES]
+    if columnares:
+        tablas, anios_comunes = _tablas(estados, analisis)
+        for formato in columnares:
+            escribir_columnar(tablas, directorio_columnar(salida, formato, emisor), formato, emisor, anios_comunes)
+    return emisor, estados
+
+def consolidar(directorio, salida, workers=None, usar_cache=True, graficas=GRAFICAS_NATIVAS, formatos=('xlsx',)):
+    """Procesa todos los emisores en un pool acotado y escribe la tabla combinada de ratios con la mediana y el percentil del sector."""
+    for formato in formatos:
+        if formato not in FORMATOS_SALIDA:
+            raise ValueError(f"Formato no soportado: {formato}")
+        if formato in FORMATOS_COLUMNARES:
+            # Antes de lanzar los workers: sin pyarrow fallarían todos los emisores
+            validar_formato(formato)
+    os.makedirs(salida, exist_ok=True)
+    emisores = buscar_emisores(directorio)
+    if not emisores:
+        logger.warning("No se encontraron emisores con archivos .xls en %s", directorio)
+        return pd.DataFrame(), {}
+    logger.info("%d emisores encontrados", len(emisores))
+
+    estados = {}
+    errores = {}
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            executor.submit(procesar_emisor, emisor, rutas, salida, usar_cache, graficas, formatos): emisor
+            for emisor, rutas in emisores.items()
+        }
+        for i, futuro in enumerate(as_completed(futuros), 1):
+            emisor = futuros[futuro]
+            try:
+                _, estados[emisor] = futuro.result()
+                logger.info("[%d/%d] %s OK", i, len(futuros), emisor)
+            except Exception as e:
+                errores[emisor] = str(e)
+                logger.error("[%d/%d] %s falló: %s", i, len(futuros), emisor, e)
+
+    # Tabla combinada en una sola pasada sobre el panel: filas (Emisor, Ratio), columnas = años
+    panel_balance, panel_resultados, panel_flujo_efectivo = apilar_emisores({emisor: estados[emisor] for emisor in sorted(estados)})
+    df_consolidado, df_motivos = calcular_ratios_panel(panel_balance, panel_resultados, panel_flujo_efectivo)
+    if not df_consolidado.empty:
+        # Los emisores sin ningún año común no aportan filas
+        con_datos = (df_motivos != MOTIVO_SIN_ANIO).any(axis=1).groupby(level='Emisor', sort=False).transform('any')
+        df_consolidado = df_consolidado[con_datos]
+    if not df_consolidado.empty:
+        df_medianas, df_percentiles = estadisticas_sector(df_consolidado)
+        if 'xlsx' in formatos:
+            with pd.ExcelWriter(os.path.join(salida, 'ratios_consolidados.xlsx')) as writer:
+                df_consolidado.to_excel(writer, sheet_name='Ratios Consolidados')
+                df_medianas.to_excel(writer, sheet_name='Mediana Sector')
+                df_percentiles.to_excel(writer, sheet_name='Percentil Sector')
+        tablas = {
+            'ratios_consolidados': aplanar(df_consolidado, ['Emisor', 'Ratio']),
+            'mediana_sector': aplanar(df_medianas, 'Ratio'),
+            'percentil_sector': aplanar(df_percentiles, ['Emisor', 'Ratio']),
+        }
+        for formato in formatos:
+            if formato in FORMATOS_COLUMNARES:
+                escribir_columnar(tablas, directorio_columnar(salida, formato), formato,
+                                  anios=sorted(df_consolidado.columns))
+    logger.info("%d emisores procesados, %d con error, en %.1f s",
+                len(estados), len(errores), time.perf_counter() - inicio)
+    return df_consolidado, errores
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consolida estados financieros SMV de muchos emisores sin Streamlit.")
+    parser.add_argument('directorio', help="Directorio con un subdirectorio de archivos .xls por emisor")
+    parser.add_argument('--salida', default='reportes', help="Directorio de salida (por defecto: reportes)")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto: núcleos disponibles)")
+    parser.add_argument('--sin-cache', action='store_true', help="No usar la cache de archivos parseados ni la de etapas")
+    parser.add_argument('--graficas', choices=sorted(_MODOS_GRAFICAS), default='nativas',
+                        help="Gráficas de ratios: nativas de Excel (por defecto), imágenes PNG o ninguna")
+    parser.add_argument('--formato', action='append', choices=FORMATOS_SALIDA, default=None,
+                        help="Formato de salida; se puede repetir (por defecto: xlsx). parquet y arrow "
+                             "escriben un archivo por tabla en <salida>/<formato>/emisores/<emisor>/, csv un tablas_csv.zip")
+    args = parser.parse_args(argv)
+
+    formatos = tuple(args.formato or ['xlsx'])
+    try:
+        for formato in formatos:
+            if formato in FORMATOS_COLUMNARES:
+                validar_formato(formato)
+    except ImportError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(message)s')
+    logger.setLevel(logging.INFO)
+    _, errores = consolidar(args.directorio, args.salida, args.workers, usar_cache=not args.sin_cache,
+                           graficas=_MODOS_GRAFICAS[args.graficas], formatos=formatos)
+    return 1 if errores else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
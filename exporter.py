@@ -1,232 +1,304 @@
 import io
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import LineChart, Reference
+from openpyxl.chart.axis import ChartLines
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-from openpyxl.chart import BarChart, Reference, Series, ScatterChart
 from openpyxl.formatting.rule import ColorScaleRule
-from openpyxl.chart.axis import ChartLines
-import matplotlib.pyplot as plt
 import pandas as pd
+from graficos import renderizar_graficas
 
-def exportar_a_excel(df_balance, df_resultados, df_flujo_efectivo, df_vertical_balance, df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados, df_ratios, nombre_empresa, anios_comunes):
-    """Exporta todos los datos a un archivo Excel con estilos y gráficas."""
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        if not df_balance.empty:
-            df_balance.to_excel(writer, sheet_name='Balance', index_label='Cuenta')
-        if not df_resultados.empty:
-            df_resultados.to_excel(writer, sheet_name='Estado Resultados', index_label='Cuenta')
-        if not df_flujo_efectivo.empty:
-            df_flujo_efectivo.to_excel(writer, sheet_name='Flujo Efectivo', index_label='Cuenta')
-        if not df_vertical_balance.empty and not df_horizontal_balance.empty:
-            df_vertical_balance.to_excel(writer, sheet_name='Analisis Balance', index_label='Cuenta', startrow=0)
-            ws = writer.sheets['Analisis Balance']
-            startrow = len(df_vertical_balance) + 3
-            ws.cell(row=startrow, column=1, value="ANÁLISIS HORIZONTAL (Variación %)")
-            df_horizontal_balance.to_excel(writer, sheet_name='Analisis Balance', index_label='Cuenta', startrow=startrow+1, header=True)
-        elif not df_vertical_balance.empty:
-            df_vertical_balance.to_excel(writer, sheet_name='Analisis Balance', index_label='Cuenta')
-        elif not df_horizontal_balance.empty:
-            df_horizontal_balance.to_excel(writer, sheet_name='Analisis Balance', index_label='Cuenta')
-        if not df_vertical_resultados.empty and not df_horizontal_resultados.empty:
-            df_vertical_resultados.to_excel(writer, sheet_name='Analisis Resultados', index_label='Cuenta', startrow=0)
-            ws = writer.sheets['Analisis Resultados']
-            startrow = len(df_vertical_resultados) + 3
-            ws.cell(row=startrow, column=1, value="ANÁLISIS HORIZONTAL (Variación %)")
-            df_horizontal_resultados.to_excel(writer, sheet_name='Analisis Resultados', index_label='Cuenta', startrow=startrow+1, header=True)
-        elif not df_vertical_resultados.empty:
-            df_vertical_resultados.to_excel(writer, sheet_name='Analisis Resultados', index_label='Cuenta')
-        elif not df_horizontal_resultados.empty:
-            df_horizontal_resultados.to_excel(writer, sheet_name='Analisis Resultados', index_label='Cuenta')
-        if not df_ratios.empty:
-            df_ratios.to_excel(writer, sheet_name='Ratios', index_label='Ratio')
+# Formatos numéricos por tipo de hoja
+FORMATO_MONTOS = '#,##0'
+FORMATO_ANALISIS = '0.0"%"'
+FORMATO_RATIOS = '0.0000'
+FORMATO_DECIMALES = '#,##0.00'
+ANCHO_MAXIMO = 50
 
-    output.seek(0)
-    wb = load_workbook(output)
-
-    # Estilos
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(name='Calibri', size=11, bold=True, color="FFFFFF")
-    total_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-    total_font = Font(name='Calibri', size=10, bold=True)
-    cell_font = Font(name='Calibri', size=10)
-    subtitle_fill = PatternFill(start_color="8EA9DB", end_color="8EA9DB", fill_type="solid")
-    subtitle_font = Font(name='Calibri', size=11, bold=True, color="FFFFFF")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = thin_border
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=1):
-            for cell in row:
-                if isinstance(cell.value, str) and "ANÁLISIS HORIZONTAL" in cell.value:
-                    for col in range(1, ws.max_column + 1):
-                        ws.cell(row=cell.row, column=col).fill = subtitle_fill
-                        ws.cell(row=cell.row, column=col).font = subtitle_font
-                        ws.cell(row=cell.row, column=col).alignment = Alignment(horizontal='center', vertical='center')
-                    for col in range(1, ws.max_column + 1):
-                        ws.cell(row=cell.row + 1, column=col).fill = header_fill
-                        ws.cell(row=cell.row + 1, column=col).font = header_font
-                        ws.cell(row=cell.row + 1, column=col).alignment = Alignment(horizontal='center', vertical='center')
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-            for cell in row:
-                cell.font = cell_font
-                cell.border = thin_border
-                if isinstance(cell.value, str) and "TOTAL" in cell.value.upper():
-                    for c in row:
-                        c.fill = total_fill
-                        c.font = total_font
-                if isinstance(cell.value, (int, float)) and cell.column > 1:
-                    if 'Analisis' in sheet_name:
-                        cell.number_format = '0.0"%"'
-                    elif 'Ratios' in sheet_name:
-                        cell.number_format = '0.0000'
-                    else:
-                        cell.number_format = '#,##0'
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Color scale
-    color_scale = ColorScaleRule(
-        start_type='min', start_color='F8696B',
-        mid_type='percentile', mid_value=50, mid_color='FFEB84',
-        end_type='max', end_color='63BE7B'
-    )
-    if 'Analisis Balance' in wb.sheetnames:
-        ws_ab = wb['Analisis Balance']
-        if not df_vertical_balance.empty:
-            n_rows_v = len(df_vertical_balance)
-            n_cols_v = df_vertical_balance.shape[1]
-            start_row_v = 2
-            start_col_v = 2
-            end_row_v = start_row_v + n_rows_v - 1
-            end_col_v = start_col_v + n_cols_v - 1
-            ws_ab.conditional_formatting.add(f"{get_column_letter(start_col_v)}{start_row_v}:{get_column_letter(end_col_v)}{end_row_v}", color_scale)
-        if not df_horizontal_balance.empty:
-            startrow_h = len(df_vertical_balance) + 4
-            n_rows_h = len(df_horizontal_balance)
-            n_cols_h = df_horizontal_balance.shape[1]
-            start_col_h = 2
-            end_col_h = start_col_h + n_cols_h - 1
-            start_row_h = startrow_h + 1
-            end_row_h = start_row_h + n_rows_h - 1
-            ws_ab.conditional_formatting.add(f"{get_column_letter(start_col_h)}{start_row_h}:{get_column_letter(end_col_h)}{end_row_h}", color_scale)
-    if 'Analisis Resultados' in wb.sheetnames:
-        ws_ar = wb['Analisis Resultados']
-        if not df_vertical_resultados.empty:
-            n_rows_v = len(df_vertical_resultados)
-            n_cols_v = df_vertical_resultados.shape[1]
-            start_row_v = 2
-            start_col_v = 2
-            end_row_v = start_row_v + n_rows_v - 1
-            end_col_v = start_col_v + n_cols_v - 1
-            ws_ar.conditional_formatting.add(f"{get_column_letter(start_col_v)}{start_row_v}:{get_column_letter(end_col_v)}{end_row_v}", color_scale)
-        if not df_horizontal_resultados.empty:
-            startrow_h = len(df_vertical_resultados) + 4
-            n_rows_h = len(df_horizontal_resultados)
-            n_cols_h = df_horizontal_resultados.shape[1]
-            start_col_h = 2
-            end_col_h = start_col_h + n_cols_h - 1
-            start_row_h = startrow_h + 1
-            end_row_h = start_row_h + n_rows_h - 1
-            ws_ar.conditional_formatting.add(f"{get_column_letter(start_col_h)}{start_row_h}:{get_column_letter(end_col_h)}{end_row_h}", color_scale)
-
-    # Gráficas en Excel
-    if not df_ratios.empty and 'Ratios' in wb.sheetnames:
-        ws_ratios = wb['Ratios']
-        if 'Ratios y Graficas' in wb.sheetnames:
-            del wb['Ratios y Graficas']
-        ws_graficas = wb.create_sheet('Ratios y Graficas')
-        ws_graficas['A1'] = 'TABLA DE RATIOS FINANCIEROS'
-        ws_graficas['A1'].font = Font(name='Calibri', size=14, bold=True, color="366092")
-        ws_graficas.merge_cells('A1:H1')
-        ws_graficas.append([])
-        header_row = ['Ratio / Año'] + [str(y) for y in df_ratios.columns]
-        ws_graficas.append(header_row)
-        for idx, cell in enumerate(ws_graficas[3], 1):
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = thin_border
-        for ratio_name in df_ratios.index:
-            row_data = [ratio_name]
-            for col in df_ratios.columns:
-                val = df_ratios.loc[ratio_name, col]
-                if isinstance(val, (int, float)) and not pd.isna(val):
-                    row_data.append(val)
-                else:
-                    row_data.append("")
-            ws_graficas.append(row_data)
-        for row_idx in range(4, 4 + len(df_ratios)):
-            ws_graficas.cell(row=row_idx, column=1).font = Font(name='Calibri', size=10, bold=True)
-            for col_idx in range(2, 2 + len(df_ratios.columns)):
-                cell = ws_graficas.cell(row=row_idx, column=col_idx)
-                cell.number_format = '0.0000'
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = thin_border
-        ws_graficas.column_dimensions['A'].width = 30
-        for col in range(2, len(df_ratios.columns) + 2):
-            ws_graficas.column_dimensions[get_column_letter(col)].width = 12
-
-        chart_start_row = len(df_ratios) + 6
-        ws_graficas.cell(row=chart_start_row, column=1, value='GRÁFICAS INDIVIDUALES POR RATIO')
-        ws_graficas.cell(row=chart_start_row, column=1).font = Font(name='Calibri', size=14, bold=True, color="366092")
-        chart_row = chart_start_row + 2
-        charts_per_row = 2
-        chart_height = 20
-        chart_width = 10
-        from openpyxl.drawing.image import Image as XLImage
-        from io import BytesIO
-
-        for idx, ratio_name in enumerate(df_ratios.index):
-            years = []
-            values = []
-            for col in df_ratios.columns:
-                val = df_ratios.loc[ratio_name, col]
-                if isinstance(val, (int, float)) and not pd.isna(val):
-                    years.append(str(col))
-                    values.append(val)
-            if not years or not values:
-                continue
-            plt.figure(figsize=(6, 4))
-            plt.plot(years, values, marker='o', linewidth=2, markersize=6, color='#007acc')
-            plt.title(ratio_name, fontsize=12, fontweight='bold')
-            plt.xlabel('Año', fontsize=10)
-            plt.ylabel('Valor', fontsize=10)
-            plt.grid(True, axis='y', linestyle='--', alpha=0.7)
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-            img_buffer = BytesIO()
-            plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-            plt.close()
-            img_buffer.seek(0)
-            img = XLImage(img_buffer)
+# Modos de las gráficas de 'Ratios y Graficas' (None: sin gráficas)
+GRAFICAS_NATIVAS = 'nativas'
+GRAFICAS_IMAGENES = 'imagenes'
+
+# Formato por columna de la hoja Tendencias (el resto con dos decimales)
+FORMATOS_TENDENCIAS = {'Desde': '0', 'Hasta': '0', 'CAGR': '0.00%', 'Máx. Drawdown': '0.00%'}
+
+# Títulos de los bloques inferiores de una hoja (se estilan como subtítulo + encabezado)
+SUBTITULO_HORIZONTAL = "ANÁLISIS HORIZONTAL (Variación %)"
+SUBTITULO_RATIOS_FLUJO = "RATIOS DEL FLUJO DE EFECTIVO Y CALIDAD DE UTILIDADES"
+
+_BORDE = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+_CENTRADO = Alignment(horizontal='center', vertical='center')
+_ESCALA_COLOR = dict(
+    start_type='min', start_color='F8696B',
+    mid_type='percentile', mid_value=50, mid_color='FFEB84',
+    end_type='max', end_color='63BE7B'
+)
+
+def _texto(valor):
+    """Texto con que se mide el ancho de una celda (los float enteros se leen como enteros)."""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+class _Estilos:
+    """Estilos con nombre del libro: se registran una vez y todas las celdas los comparten."""
+
+    def __init__(self, wb):
+        self.wb = wb
+        self._registrados = set()
+
+    def _registrar(self, nombre, atributos):
+        """Registra el estilo la primera vez; ``atributos`` es una función que devuelve sus atributos."""
+        if nombre not in self._registrados:
+            self.wb.add_named_style(NamedStyle(name=nombre, **atributos()))
+            self._registrados.add(nombre)
+        return nombre
+
+    def encabezado(self):
+        return self._registrar('Encabezado', lambda: dict(
+            font=Font(name='Calibri', size=11, bold=True, color="FFFFFF"),
+            fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+            alignment=_CENTRADO, border=_BORDE))
+
+    def subtitulo(self):
+        return self._registrar('Subtitulo', lambda: dict(
+            font=Font(name='Calibri', size=11, bold=True, color="FFFFFF"),
+            fill=PatternFill(start_color="8EA9DB", end_color="8EA9DB", fill_type="solid"),
+            alignment=_CENTRADO))
+
+    def celda(self, formato='General', total=False):
+        """Celda de datos (o de etiqueta con formato General); ``total`` resalta la fila."""
+        if total:
+            return self._registrar(f'Total {formato}', lambda: dict(
+                font=Font(name='Calibri', size=10, bold=True),
+                fill=PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid"),
+                border=_BORDE, number_format=formato))
+        return self._registrar(f'Celda {formato}', lambda: dict(
+            font=Font(name='Calibri', size=10), border=_BORDE, number_format=formato))
+
+    def titulo(self):
+        return self._registrar('Titulo', lambda: dict(font=Font(name='Calibri', size=14, bold=True, color="366092")))
+
+    def etiqueta_ratio(self):
+        return self._registrar('Etiqueta Ratio', lambda: dict(font=Font(name='Calibri', size=10, bold=True)))
+
+    def valor_ratio(self):
+        return self._registrar('Valor Ratio', lambda: dict(
+            number_format=FORMATO_RATIOS, alignment=Alignment(horizontal='center'), border=_BORDE))
+
+class _Hoja:
+    """Hoja en modo de solo escritura: acumula filas de (valor, estilo) y las escribe de una vez.
+
+    Acumularlas permite fijar el ancho de las columnas (que en este modo va antes de las
+    celdas) y extender los subtítulos a todo el ancho de la hoja.
+    """
+
+    def __init__(self, wb, titulo, estilos):
+        self.ws = wb.create_sheet(titulo)
+        self.estilos = estilos
+        self.filas = []
+        self._subtitulos = set()
+
+    def fila(self, celdas=()):
+        """Agrega una fila de (valor, estilo) y devuelve su número (base 1)."""
+        self.filas.append(list(celdas))
+        return len(self.filas)
+
+    def subtitulo(self, texto):
+        self._subtitulos.add(self.fila([(texto, self.estilos.subtitulo())]))
+
+    def bloque(self, df, index_label, formato):
+        """Escribe df con encabezado; ``formato`` es uno para todo o {columna: formato}.
+
+        Las filas cuya etiqueta contiene TOTAL se resaltan. Devuelve (primera, última) fila de datos.
+        """
+        encabezado = self.estilos.encabezado()
+        etiquetas = list(index_label) if isinstance(index_label, (list, tuple)) else [index_label]
+        self.fila([(etiqueta, encabezado) for etiqueta in etiquetas] + [(columna, encabezado) for columna in df.columns])
+        if isinstance(formato, dict):
+            formatos = [formato.get(columna, FORMATO_DECIMALES) for columna in df.columns]
+        else:
+            formatos = [formato] * len(df.columns)
+        # Estilo por columna (normal / total) resuelto una vez para todo el bloque
+        estilos_columna = {total: [self.estilos.celda(fmt, total) for fmt in formatos] for total in (False, True)}
+        valores = df.to_numpy(dtype=object)
+        nulos = pd.isna(valores)
+        primera = len(self.filas) + 1
+        for i, indice in enumerate(df.index):
+            indice = list(indice) if isinstance(indice, tuple) else [indice]
+            total = any(isinstance(e, str) and "TOTAL" in e.upper() for e in indice)
+            estilo_etiqueta = self.estilos.celda(total=total)
+            self.fila([(e, estilo_etiqueta) for e in indice] + [
+                (None if nulo else valor, estilo)
+                for valor, nulo, estilo in zip(valores[i], nulos[i], estilos_columna[total])
+            ])
+        return primera, len(self.filas)
+
+    def escribir(self, anchos=None):
+        """Fija los anchos (por defecto según el contenido, hasta ANCHO_MAXIMO) y escribe las filas."""
+        n_columnas = max((len(fila) for fila in self.filas), default=0)
+        if anchos is None:
+            anchos = [0] * n_columnas
+            for fila in self.filas:
+                for j, (valor, _) in enumerate(fila):
+                    if valor is not None:
+                        anchos[j] = max(anchos[j], len(_texto(valor)))
+            anchos = [min(ancho + 2, ANCHO_MAXIMO) for ancho in anchos]
+        for j, ancho in enumerate(anchos, 1):
+            self.ws.column_dimensions[get_column_letter(j)].width = ancho
+        for n, fila in enumerate(self.filas, 1):
+            if n in self._subtitulos:
+                fila = fila + [(None, fila[0][1])] * (n_columnas - len(fila))
+            celdas = []
+            for valor, estilo in fila:
+                celda = WriteOnlyCell(self.ws, value=valor)
+                if estilo is not None:
+                    celda.style = estilo
+                celdas.append(celda)
+            self.ws.append(celdas)
+
+    def escala_color(self, primera, ultima, n_columnas):
+        if ultima >= primera and n_columnas:
+            self.ws.conditional_formatting.add(
+                f"B{primera}:{get_column_letter(n_columnas + 1)}{ultima}", ColorScaleRule(**_ESCALA_COLOR))
+
+def _escribir_estado(wb, estilos, hoja, df, index_label='Cuenta', formato=FORMATO_MONTOS):
+    if df is None or df.empty:
+        return
+    h = _Hoja(wb, hoja, estilos)
+    h.bloque(df, index_label, formato)
+    h.escribir()
+
+def _escribir_analisis(wb, estilos, hoja, df_vertical, df_horizontal, titulo=SUBTITULO_HORIZONTAL, index_label='Cuenta',
+                       formatos=(FORMATO_ANALISIS, FORMATO_ANALISIS), escala_color=True):
+    """Escribe el análisis vertical y, debajo con su título, el horizontal de un estado en una misma hoja."""
+    bloques = [(df, formato) for df, formato in zip((df_vertical, df_horizontal), formatos) if not df.empty]
+    if not bloques:
+        return
+    h = _Hoja(wb, hoja, estilos)
+    for i, (df, formato) in enumerate(bloques):
+        if i:
+            h.fila()
+            h.subtitulo(titulo)
+            h.fila()
+        primera, ultima = h.bloque(df, index_label, formato)
+        if escala_color:
+            h.escala_color(primera, ultima, df.shape[1])
+    h.escribir()
+
+def _grafica_nativa(ws, ratio_name, fila, n_anios):
+    """Gráfica de líneas de Excel que apunta a la fila del ratio (años en la fila de encabezado 3)."""
+    chart = LineChart()
+    chart.title = ratio_name
+    chart.style = 2
+    chart.legend = None
+    chart.width = 10.6  # cm, lo mismo que las imágenes de 400 x 250 px
+    chart.height = 6.6
+    chart.display_blanks = 'gap'
+    chart.x_axis.title = 'Año'
+    chart.y_axis.title = 'Valor'
+    chart.x_axis.delete = False
+    chart.y_axis.delete = False
+    chart.y_axis.majorGridlines = ChartLines()
+    chart.add_data(Reference(ws, min_col=2, max_col=n_anios + 1, min_row=fila), from_rows=True, titles_from_data=False)
+    chart.set_categories(Reference(ws, min_col=2, max_col=n_anios + 1, min_row=3))
+    serie = chart.series[0]
+    serie.marker.symbol = 'circle'
+    serie.marker.size = 6
+    serie.graphicalProperties.line.solidFill = '007ACC'
+    serie.graphicalProperties.line.width = 25400  # 2 pt en EMU
+    serie.smooth = False
+    return chart
+
+def _escribir_graficas(wb, estilos, df_ratios, graficas=GRAFICAS_NATIVAS, paralelo=None):
+    """Hoja 'Ratios y Graficas': tabla de ratios y una gráfica por ratio, dos por fila.
+
+    ``graficas`` elige gráficas nativas de Excel (apuntan a la tabla), imágenes PNG o ninguna (None);
+    ``paralelo`` se pasa a renderizar_graficas.
+    """
+    h = _Hoja(wb, 'Ratios y Graficas', estilos)
+    h.fila([('TABLA DE RATIOS FINANCIEROS', estilos.titulo())])
+    h.ws.merged_cells.add('A1:H1')
+    h.fila()
+    encabezado = estilos.encabezado()
+    h.fila([(celda, encabezado) for celda in ['Ratio / Año'] + [str(y) for y in df_ratios.columns]])
+    etiqueta, valor = estilos.etiqueta_ratio(), estilos.valor_ratio()
+    # Los N/A quedan como celdas vacías: las gráficas nativas los muestran como huecos
+    for ratio_name, fila in zip(df_ratios.index, df_ratios.to_numpy(dtype=object)):
+        h.fila([(ratio_name, etiqueta)] + [(None if pd.isna(val) else val, valor) for val in fila])
+
+    chart_start_row = len(df_ratios) + 6
+    if graficas is not None:
+        while len(h.filas) < chart_start_row - 1:
+            h.fila()
+        h.fila([('GRÁFICAS INDIVIDUALES POR RATIO', estilos.titulo())])
+    h.escribir([30] + [12] * len(df_ratios.columns))
+    if graficas is None:
+        return
+
+    chart_row = chart_start_row + 2
+    charts_per_row = 2
+    chart_height = 20
+    chart_width = 10
+    posiciones = []
+    for idx, ratio_name in enumerate(df_ratios.index):
+        serie = df_ratios.loc[ratio_name].dropna()
+        if serie.empty:
+            continue
+        row_pos = chart_row + (idx // charts_per_row) * chart_height
+        col_pos = 1 + (idx % charts_per_row) * chart_width
+        posiciones.append((idx, ratio_name, serie, f"{get_column_letter(col_pos)}{row_pos}"))
+
+    if graficas == GRAFICAS_IMAGENES:
+        # Todas las imágenes de una vez: en paralelo y reutilizando las ya dibujadas
+        pngs = renderizar_graficas([(ratio_name, serie.index, serie.tolist()) for _, ratio_name, serie, _ in posiciones],
+                                   paralelo=paralelo)
+        for (_, _, _, celda), png in zip(posiciones, pngs):
+            img = XLImage(io.BytesIO(png))
             img.width = 400
             img.height = 250
-            row_pos = chart_row + (idx // charts_per_row) * chart_height
-            col_pos = 1 + (idx % charts_per_row) * chart_width
-            cell_pos = f"{get_column_letter(col_pos)}{row_pos}"
-            ws_graficas.add_image(img, cell_pos)
-
-    output_formatted = io.BytesIO()
-    wb.save(output_formatted)
-    output_formatted.seek(0)
-    return output_formatted
\ No newline at end of file
+            h.ws.add_image(img, celda)
+    else:
+        for idx, ratio_name, _, celda in posiciones:
+            h.ws.add_chart(_grafica_nativa(h.ws, ratio_name, 4 + idx, len(df_ratios.columns)), celda)
+
+def exportar_a_excel(df_balance, df_resultados, df_flujo_efectivo, df_vertical_balance, df_horizontal_balance, df_vertical_resultados, df_horizontal_resultados, df_ratios, nombre_empresa, anios_comunes, df_vertical_flujo=None, df_horizontal_flujo=None, df_tendencias=None, df_montos_flujo=None, df_ratios_flujo=None, graficas=GRAFICAS_NATIVAS, graficas_en_paralelo=None):
+    """Exporta todos los datos a un archivo Excel con estilos y gráficas.
+
+    El libro se escribe en modo de solo escritura aplicando los estilos (con nombre, compartidos)
+    a medida que se agregan las filas, y se serializa una sola vez. Las gráficas de ratios son
+    nativas de Excel salvo que se pidan imágenes (``graficas=GRAFICAS_IMAGENES``) o ninguna (None).
+    Con ``graficas_en_paralelo=False`` las imágenes se dibujan en serie (p. ej. desde un hilo en
+    segundo plano); None deja decidir a renderizar_graficas.
+    """
+    hojas_analisis = [
+        ('Analisis Balance', df_vertical_balance, df_horizontal_balance),
+        ('Analisis Resultados', df_vertical_resultados, df_horizontal_resultados),
+        ('Analisis Flujo Efectivo',
+         df_vertical_flujo if df_vertical_flujo is not None else pd.DataFrame(),
+         df_horizontal_flujo if df_horizontal_flujo is not None else pd.DataFrame()),
+    ]
+    wb = Workbook(write_only=True)
+    estilos = _Estilos(wb)
+    _escribir_estado(wb, estilos, 'Balance', df_balance)
+    _escribir_estado(wb, estilos, 'Estado Resultados', df_resultados)
+    _escribir_estado(wb, estilos, 'Flujo Efectivo', df_flujo_efectivo)
+    for hoja, df_vertical, df_horizontal in hojas_analisis:
+        _escribir_analisis(wb, estilos, hoja, df_vertical, df_horizontal)
+    _escribir_estado(wb, estilos, 'Ratios', df_ratios, index_label='Ratio', formato=FORMATO_RATIOS)
+    if df_montos_flujo is not None and df_ratios_flujo is not None:
+        _escribir_analisis(wb, estilos, 'Calidad de Utilidades', df_montos_flujo, df_ratios_flujo,
+                           titulo=SUBTITULO_RATIOS_FLUJO, index_label='Concepto',
+                           formatos=(FORMATO_MONTOS, FORMATO_RATIOS), escala_color=False)
+    if df_tendencias is not None:
+        _escribir_estado(wb, estilos, 'Tendencias', df_tendencias, index_label=list(df_tendencias.index.names),
+                         formato=FORMATOS_TENDENCIAS)
+    if not df_ratios.empty:
+        _escribir_graficas(wb, estilos, df_ratios, graficas, graficas_en_paralelo)
+
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
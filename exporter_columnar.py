@@ -0,0 +1,128 @@
+"""Exportación columnar de los resultados: Parquet, Arrow IPC (Feather v2) o un paquete de CSV.
+
+Cada estado, análisis y tabla de ratios se guarda como una tabla plana: las columnas del
+índice (Cuenta, Ratio, ...) primero y luego una columna tipada por año. Los metadatos
+(emisor, tabla, años, columnas del índice) van en el esquema de Arrow/Parquet y, en el
+paquete CSV, en metadatos.json. Los archivos Arrow se escriben sin comprimir para que se
+puedan abrir con memory-map (``pyarrow.ipc.open_file(pyarrow.memory_map(ruta))``).
+pyarrow solo se necesita para Parquet y Arrow.
+"""
+import io
+import json
+import os
+import zipfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # opcional: sin pyarrow solo está disponible el paquete CSV
+    pa = None
+    pq = None
+
+VERSION_COLUMNAR = 1
+FORMATOS_COLUMNARES = ('parquet', 'arrow', 'csv')
+_EXTENSIONES = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+CLAVE_METADATOS = b'consolidador_smv'
+
+def aplanar(df, index_label):
+    """(df plano, columnas del índice): el índice pasa a columnas con nombre y los años a texto."""
+    etiquetas = list(index_label) if isinstance(index_label, (list, tuple)) else [index_label]
+    plano = df.copy(deep=False)
+    plano.index = plano.index.set_names(etiquetas)
+    plano.columns = [str(columna) for columna in plano.columns]
+    return plano.reset_index(), etiquetas
+
+def tablas_reporte(df_balance, df_resultados, df_flujo_efectivo, df_vertical_balance, df_horizontal_balance,
+                   df_vertical_resultados, df_horizontal_resultados, df_ratios, df_vertical_flujo=None,
+                   df_horizontal_flujo=None, df_motivos=None, df_tendencias=None, df_montos_flujo=None,
+                   df_ratios_flujo=None, df_motivos_flujo=None):
+    """Reúne los DataFrames del reporte como {tabla: (df plano, columnas del índice)}; omite los vacíos."""
+    fuentes = [
+        ('balance', df_balance, 'Cuenta'),
+        ('resultados', df_resultados, 'Cuenta'),
+        ('flujo_efectivo', df_flujo_efectivo, 'Cuenta'),
+        ('vertical_balance', df_vertical_balance, 'Cuenta'),
+        ('horizontal_balance', df_horizontal_balance, 'Cuenta'),
+        ('vertical_resultados', df_vertical_resultados, 'Cuenta'),
+        ('horizontal_resultados', df_horizontal_resultados, 'Cuenta'),
+        ('vertical_flujo', df_vertical_flujo, 'Cuenta'),
+        ('horizontal_flujo', df_horizontal_flujo, 'Cuenta'),
+        ('ratios', df_ratios, 'Ratio'),
+        ('motivos_ratios', df_motivos, 'Ratio'),
+        ('montos_flujo', df_montos_flujo, 'Concepto'),
+        ('ratios_flujo', df_ratios_flujo, 'Ratio'),
+        ('motivos_flujo', df_motivos_flujo, 'Ratio'),
+        ('tendencias', df_tendencias, ['Origen', 'Cuenta']),
+    ]
+    return {nombre: aplanar(df, index_label) for nombre, df, index_label in fuentes
+            if df is not None and not df.empty}
+
+def _metadatos(tabla, df, indice, emisor, anios):
+    return {
+        'version': VERSION_COLUMNAR,
+        'tabla': tabla,
+        'emisor': emisor,
+        'anios': [int(anio) for anio in anios] if anios is not None else None,
+        'columnas_indice': indice,
+        'tipos': {columna: str(tipo) for columna, tipo in df.dtypes.items()},
+    }
+
+def _tabla_arrow(df, metadatos):
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    return tabla.replace_schema_metadata({**(tabla.schema.metadata or {}),
+                                          CLAVE_METADATOS: json.dumps(metadatos).encode('utf-8')})
+
+def _serializar(df, formato, metadatos):
+    """Bytes de una tabla en el formato pedido."""
+    if formato == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    tabla = _tabla_arrow(df, metadatos)
+    sink = pa.BufferOutputStream()
+    if formato == 'parquet':
+        pq.write_table(tabla, sink)
+    else:
+        with pa.ipc.new_file(sink, tabla.schema) as writer:
+            writer.write_table(tabla)
+    return sink.getvalue().to_pybytes()
+
+def validar_formato(formato):
+    """ValueError si el formato no existe; ImportError si es Parquet o Arrow y falta pyarrow."""
+    if formato not in FORMATOS_COLUMNARES:
+        raise ValueError(f"Formato no soportado: {formato} (opciones: {', '.join(FORMATOS_COLUMNARES)})")
+    if formato != 'csv' and pa is None:
+        raise ImportError("Exportar a Parquet o Arrow requiere pyarrow (pip install pyarrow)")
+
+def exportar_columnar(tablas, formato, emisor=None, anios=None):
+    """Empaqueta las tablas en un .zip en memoria (un archivo por tabla + metadatos.json) y devuelve sus bytes."""
+    validar_formato(formato)
+    # Parquet y Arrow ya van comprimidos o deben poder mapearse tras extraerse: se guardan sin comprimir
+    compresion = zipfile.ZIP_DEFLATED if formato == 'csv' else zipfile.ZIP_STORED
+    output = io.BytesIO()
+    indice = {}
+    with zipfile.ZipFile(output, 'w', compresion) as paquete:
+        for nombre, (df, columnas_indice) in tablas.items():
+            metadatos = _metadatos(nombre, df, columnas_indice, emisor, anios)
+            paquete.writestr(nombre + _EXTENSIONES[formato], _serializar(df, formato, metadatos))
+            indice[nombre] = metadatos
+        paquete.writestr('metadatos.json', json.dumps(indice, ensure_ascii=False, indent=2))
+    return output.getvalue()
+
+def escribir_columnar(tablas, directorio, formato, emisor=None, anios=None):
+    """Escribe las tablas en un directorio: un archivo por tabla (Parquet/Arrow) o tablas_csv.zip (CSV).
+
+    Devuelve las rutas escritas.
+    """
+    validar_formato(formato)
+    os.makedirs(directorio, exist_ok=True)
+    if formato == 'csv':
+        ruta = os.path.join(directorio, 'tablas_csv.zip')
+        with open(ruta, 'wb') as f:
+            f.write(exportar_columnar(tablas, formato, emisor, anios))
+        return [ruta]
+    rutas = []
+    for nombre, (df, columnas_indice) in tablas.items():
+        ruta = os.path.join(directorio, nombre + _EXTENSIONES[formato])
+        with open(ruta, 'wb') as f:
+            f.write(_serializar(df, formato, _metadatos(nombre, df, columnas_indice, emisor, anios)))
+        rutas.append(ruta)
+    return rutas
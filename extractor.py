@@ -0,0 +1,112 @@
+import codecs
+from html.parser import HTMLParser
+
+IDS_TABLAS = ('gvReporte', 'gvReporte1', 'gvReporte3')
+TAMANIO_BLOQUE = 64 * 1024
+ETIQUETAS_ESTRUCTURA = ('table', 'tr', 'td', 'th')
+
+class _ExtractorTablas(HTMLParser):
+    """Parser por eventos que solo construye las filas de las tablas buscadas.
+
+    Replica lo que hacía BeautifulSoup con html.parser: todas las filas <tr> descendientes
+    de la tabla y, por fila, el texto de cada <td>/<th> con sus fragmentos recortados y
+    concatenados. El resto de la página (scripts, estilos, otras tablas) se recorre sin guardar nada.
+    """
+
+    def __init__(self, ids):
+        super().__init__(convert_charrefs=True)
+        self.pendientes = set(ids)
+        self.tablas = {}
+        self._filas = None
+        self._abiertas = []
+        self._texto = []
+        self._ignorar = 0
+
+    @property
+    def terminado(self):
+        return not self.pendientes and self._filas is None
+
+    def _volcar_texto(self):
+        # Un nodo de texto termina en cualquier etiqueta; se recorta completo como en get_text(strip=True)
+        if not self._texto:
+            return
+        texto = ''.join(self._texto).strip()
+        self._texto = []
+        if texto and not self._ignorar:
+            for etiqueta, elemento in self._abiertas:
+                if etiqueta in ('td', 'th'):
+                    elemento.append(texto)
+
+    def handle_starttag(self, tag, attrs):
+        self._volcar_texto()
+        if self._filas is None:
+            if tag == 'table':
+                id_tabla = dict(attrs).get('id')
+                if id_tabla in self.pendientes:
+                    self.pendientes.discard(id_tabla)
+                    self._filas = self.tablas[id_tabla] = []
+                    self._abiertas = [('table', None)]
+            return
+        if tag == 'tr':
+            fila = []
+            self._filas.append(fila)
+            self._abiertas.append(('tr', fila))
+        elif tag in ('td', 'th'):
+            celda = []
+            for etiqueta, elemento in self._abiertas:
+                if etiqueta == 'tr':
+                    elemento.append(celda)
+            self._abiertas.append((tag, celda))
+        elif tag == 'table':
+            self._abiertas.append(('table', None))
+        elif tag in ('script', 'style'):
+            self._ignorar += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._volcar_texto()
+
+    def handle_endtag(self, tag):
+        self._volcar_texto()
+        if self._filas is None:
+            return
+        if tag in ('script', 'style'):
+            self._ignorar = max(self._ignorar - 1, 0)
+            return
+        if tag not in ETIQUETAS_ESTRUCTURA:
+            return
+        # Igual que el árbol de BeautifulSoup: se cierra el elemento abierto más reciente con ese nombre
+        for i in range(len(self._abiertas) - 1, -1, -1):
+            if self._abiertas[i][0] == tag:
+                del self._abiertas[i:]
+                break
+        if not self._abiertas:
+            self._filas = None
+
+    def handle_data(self, data):
+        if self._filas is not None:
+            self._texto.append(data)
+
+    def handle_comment(self, data):
+        self._volcar_texto()
+
+def extraer_tablas(datos, codificacion='latin-1', ids=IDS_TABLAS, tamanio_bloque=TAMANIO_BLOQUE):
+    """Recorre los bytes por bloques y devuelve {id_tabla: filas} con el texto de cada celda.
+
+    Solo se materializan las filas de las tablas pedidas y el recorrido se detiene en cuanto
+    todas se han cerrado, así que el costo depende del tamaño de las tablas y no de la página.
+    """
+    parser = _ExtractorTablas(ids)
+    decodificador = codecs.getincrementaldecoder(codificacion)()
+    vista = memoryview(datos)
+    for inicio in range(0, len(vista), tamanio_bloque):
+        parser.feed(decodificador.decode(vista[inicio:inicio + tamanio_bloque]))
+        if parser.terminado:
+            break
+    else:
+        parser.feed(decodificador.decode(b'', final=True))
+        parser.close()
+        parser._volcar_texto()
+    return {
+        id_tabla: [[''.join(celda) for celda in fila] for fila in filas if fila]
+        for id_tabla, filas in parser.tablas.items()
+    }
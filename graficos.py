@@ -0,0 +1,98 @@
+"""Renderizado de gráficas de ratios a PNG para los reportes que las piden como imagen.
+
+Se usa la API orientada a objetos de matplotlib (Figure + lienzo Agg), sin el estado global
+de pyplot, de modo que las figuras se pueden dibujar en paralelo en un pool de procesos.
+Los PNG se guardan por la huella de (título, años, valores, estilo): en memoria y en disco,
+así que volver a exportar un emisor cuyos ratios no cambiaron reutiliza todas las imágenes.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from cache import DIRECTORIO_CACHE, AlmacenDisco
+from memo import MemoriaLRU, huella
+
+# Cambiarla invalida los PNG guardados (p. ej. si cambia el dibujo)
+VERSION_GRAFICOS = 1
+ESTILO_POR_DEFECTO = {
+    'figsize': (6, 4), 'dpi': 150, 'color': '#007acc',
+    'marker': 'o', 'linewidth': 2, 'markersize': 6,
+}
+MAX_BYTES_MEMORIA = 32 * 1024 * 1024
+
+_memoria = MemoriaLRU(MAX_BYTES_MEMORIA)
+_disco = None
+
+def _almacen_disco():
+    global _disco
+    if _disco is None:
+        _disco = AlmacenDisco(os.path.join(DIRECTORIO_CACHE, 'graficas'), extension='.png')
+    return _disco
+
+def renderizar_png(titulo, anios, valores, estilo=None):
+    """Dibuja la serie de un ratio (años como etiquetas) y devuelve los bytes del PNG."""
+    estilo = {**ESTILO_POR_DEFECTO, **(estilo or {})}
+    fig = Figure(figsize=estilo['figsize'])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(anios, valores, marker=estilo['marker'], linewidth=estilo['linewidth'],
+            markersize=estilo['markersize'], color=estilo['color'])
+    ax.set_title(titulo, fontsize=12, fontweight='bold')
+    ax.set_xlabel('Año', fontsize=10)
+    ax.set_ylabel('Valor', fontsize=10)
+    ax.grid(True, axis='y', linestyle='--', alpha=0.7)
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_rotation(45)
+        etiqueta.set_horizontalalignment('right')
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=estilo['dpi'], bbox_inches='tight')
+    return buffer.getvalue()
+
+def _renderizar_tarea(tarea):
+    return renderizar_png(*tarea)
+
+def clave_grafica(titulo, anios, valores, estilo=None):
+    return f"{VERSION_GRAFICOS}_{huella((titulo, list(anios), list(valores), {**ESTILO_POR_DEFECTO, **(estilo or {})}))}"
+
+def renderizar_graficas(series, estilo=None, paralelo=None, max_workers=None, usar_disco=True):
+    """PNG de cada serie [(título, años, valores)], en el mismo orden, reutilizando los ya dibujados.
+
+    Las que faltan se dibujan en un pool de procesos; por defecto solo desde el hilo principal
+    del proceso principal y con más de un núcleo. Dentro de un worker (p. ej. del CLI por
+    lotes) o de un hilo en segundo plano (p. ej. del servidor de Streamlit, donde hacer fork
+    de un proceso con varios hilos puede bloquearse) se dibujan en serie.
+    """
+    series = [(titulo, [str(a) for a in anios], [float(v) for v in valores]) for titulo, anios, valores in series]
+    disco = _almacen_disco() if usar_disco else None
+    claves = [clave_grafica(titulo, anios, valores, estilo) for titulo, anios, valores in series]
+    pngs = []
+    for clave in claves:
+        png = _memoria.obtener(clave)
+        if png is None and disco is not None:
+            png = disco.leer(clave)
+            if png is not None:
+                _memoria.guardar(clave, png)
+        pngs.append(png)
+
+    pendientes = [i for i, png in enumerate(pngs) if png is None]
+    tareas = [series[i] + (estilo,) for i in pendientes]
+    if paralelo is None:
+        paralelo = (multiprocessing.parent_process() is None and threading.current_thread() is threading.main_thread()
+                    and (os.cpu_count() or 1) > 1)
+    if paralelo and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            nuevos = list(executor.map(_renderizar_tarea, tareas))
+    else:
+        nuevos = [_renderizar_tarea(tarea) for tarea in tareas]
+    for i, png in zip(pendientes, nuevos):
+        pngs[i] = png
+        _memoria.guardar(claves[i], png)
+        if disco is not None:
+            disco.escribir(claves[i], png)
+    return pngs
@@ -0,0 +1,70 @@
+import codecs
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+# Los reportes del SMV no declaran siempre su charset; latin-1 es lo que se usaba hasta ahora
+CODIFICACION_POR_DEFECTO = 'latin-1'
+BYTES_SONDEO = 4096
+_RE_CHARSET = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([A-Za-z0-9_.:\-]+)', re.IGNORECASE)
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+def detectar_codificacion(datos):
+    """Detecta la codificación por BOM o por el <meta charset> de los primeros bytes."""
+    prefijo = bytes(datos[:BYTES_SONDEO])
+    for bom, codificacion in _BOMS:
+        if prefijo.startswith(bom):
+            return codificacion
+    m = _RE_CHARSET.search(prefijo)
+    if m:
+        try:
+            return codecs.lookup(m.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return CODIFICACION_POR_DEFECTO
+
+@contextmanager
+def abrir_contenido(archivo):
+    """Entrega el contenido de un archivo como un único buffer, sin copias decodificadas.
+
+    Acepta bytes, rutas, archivos subidos en memoria (``getvalue``) y archivos en disco
+    (que se mapean con mmap). El buffer solo es válido dentro del bloque ``with``.
+    """
+    if isinstance(archivo, (bytes, bytearray, memoryview)):
+        yield memoryview(archivo)
+        return
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            with _mapear(f) as vista:
+                yield vista
+        return
+    if hasattr(archivo, 'getvalue'):
+        # getvalue() devuelve sin copiar los bytes con los que se creó el BytesIO (getbuffer sí copia)
+        yield memoryview(archivo.getvalue())
+        return
+    try:
+        archivo.fileno()
+    except (AttributeError, OSError, ValueError):
+        archivo.seek(0)
+        yield memoryview(archivo.read())
+        return
+    with _mapear(archivo) as vista:
+        yield vista
+
+@contextmanager
+def _mapear(f):
+    if os.fstat(f.fileno()).st_size == 0:
+        yield memoryview(b'')
+        return
+    mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    vista = memoryview(mapa)
+    try:
+        yield vista
+    finally:
+        vista.release()
+        mapa.close()
@@ -0,0 +1,210 @@
+"""Memoización de etapas del pipeline (parseo, análisis, exportación), independiente de Streamlit.
+
+Cada etapa se indexa por una huella estable de sus entradas (bytes, DataFrames, listas...) y
+por la huella del código del proyecto, así que un cambio en los .py invalida lo guardado.
+Hay un nivel en memoria (LRU por bytes totales) y, opcionalmente, uno en disco que reutiliza
+el AlmacenDisco de la cache de parseo. Los valores devueltos se comparten entre llamadas: no
+deben modificarse.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cache import DIRECTORIO_CACHE, MAX_BYTES_CACHE, AlmacenDisco, huella_bytes
+from ingesta import abrir_contenido
+
+VERSION_MEMO = 1
+MAX_BYTES_MEMO = int(os.environ.get('SMV_MEMO_MAX_MB', '128')) * 1024 * 1024
+_DIRECTORIO_CODIGO = os.path.dirname(os.path.abspath(__file__))
+
+def _alimentar(h, obj):
+    """Agrega a ``h`` una representación estable (entre procesos) de obj."""
+    if obj is None or isinstance(obj, (bool, int, float, str, np.generic)):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode('utf-8'))
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        datos = memoryview(obj).cast('B')
+        h.update(b"bytes:%d;" % len(datos))
+        h.update(datos)
+    elif isinstance(obj, pd.DataFrame):
+        h.update(b"df;")
+        _alimentar(h, obj.index)
+        _alimentar(h, obj.columns)
+        for _, columna in obj.items():
+            _alimentar(h, columna.to_numpy())
+    elif isinstance(obj, pd.Series):
+        h.update(b"serie;")
+        _alimentar(h, obj.index)
+        _alimentar(h, obj.name)
+        _alimentar(h, obj.to_numpy())
+    elif isinstance(obj, pd.Index):
+        h.update(f"indice:{type(obj).__name__}:{obj.dtype}:{len(obj)};".encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"nd:{obj.dtype}:{obj.shape};".encode('utf-8'))
+        if obj.dtype == object:
+            h.update(pd.util.hash_pandas_object(pd.Series(obj.ravel()), index=False).to_numpy().tobytes())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}:{len(obj)};".encode('utf-8'))
+        for elemento in obj:
+            _alimentar(h, elemento)
+    elif isinstance(obj, dict):
+        h.update(f"dict:{len(obj)};".encode('utf-8'))
+        for clave in sorted(obj, key=repr):
+            _alimentar(h, clave)
+            _alimentar(h, obj[clave])
+    elif hasattr(obj, 'getvalue'):
+        _alimentar(h, obj.getvalue())
+    else:
+        raise TypeError(f"No se puede calcular la huella de un {type(obj).__name__}")
+
+def huella(obj):
+    """Huella SHA-256 (hex) estable del contenido de obj, no de su identidad."""
+    h = hashlib.sha256()
+    _alimentar(h, obj)
+    return h.hexdigest()
+
+def huella_archivo(archivo):
+    """Huella del contenido de un archivo (ruta, subido o abierto en binario)."""
+    with abrir_contenido(archivo) as datos:
+        return huella_bytes(datos)
+
+_huella_codigo = None
+
+def huella_codigo():
+    """Huella de los .py del proyecto; cambia con cualquier edición del código."""
+    global _huella_codigo
+    if _huella_codigo is None:
+        h = hashlib.sha256()
+        for ruta in sorted(glob.glob(os.path.join(_DIRECTORIO_CODIGO, '*.py'))):
+            with open(ruta, 'rb') as f:
+                _alimentar(h, (os.path.basename(ruta), f.read()))
+        _huella_codigo = h.hexdigest()
+    return _huella_codigo
+
+def _tamanio(obj):
+    """Bytes aproximados que ocupa obj en memoria (para el límite del LRU)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if hasattr(obj, 'getbuffer'):
+        with obj.getbuffer() as buffer:
+            return buffer.nbytes
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(_tamanio(elemento) for elemento in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_tamanio(k) + _tamanio(v) for k, v in obj.items())
+    return sys.getsizeof(obj)
+
+class MemoriaLRU:
+    """Diccionario clave → valor con límite de bytes totales y desalojo del menos usado."""
+
+    def __init__(self, max_bytes=MAX_BYTES_MEMO):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._entradas = OrderedDict()
+        self._candado = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave):
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada[0]
+
+    def guardar(self, clave, valor):
+        tamanio = _tamanio(valor)
+        if tamanio > self.max_bytes:
+            return
+        with self._candado:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.total -= anterior[1]
+            self._entradas[clave] = (valor, tamanio)
+            self.total += tamanio
+            while self.total > self.max_bytes:
+                _, (_, liberado) = self._entradas.popitem(last=False)
+                self.total -= liberado
+
+class Memo:
+    """Memoización de etapas: LRU en memoria y, con ``disco``, un segundo nivel persistente.
+
+    ``disco`` puede ser False (solo memoria), True (directorio por defecto dentro de la cache)
+    o la ruta de un directorio.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES_MEMO, disco=False, max_bytes_disco=MAX_BYTES_CACHE):
+        self.memoria = MemoriaLRU(max_bytes)
+        self.disco = None
+        if disco:
+            directorio = os.path.join(DIRECTORIO_CACHE, 'memo') if disco is True else disco
+            self.disco = AlmacenDisco(directorio, max_bytes_disco, extension='.pkl')
+
+    def clave(self, etapa, entradas):
+        return f"{etapa}_{huella((VERSION_MEMO, huella_codigo(), etapa, entradas))}"
+
+    def buscar(self, clave):
+        """Valor ya memorizado para la clave (memoria y luego disco) o None, sin calcular nada."""
+        valor = self.memoria.obtener(clave)
+        if valor is not None or self.disco is None:
+            return valor
+        datos = self.disco.leer(clave)
+        if datos is None:
+            return None
+        try:
+            valor = pickle.loads(datos)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, TypeError, ValueError):
+            return None
+        if valor is not None:
+            self.memoria.guardar(clave, valor)
+        return valor
+
+    def calcular(self, etapa, entradas, funcion):
+        """Devuelve funcion() memorizado por (etapa, huella de entradas); funcion no recibe argumentos."""
+        clave = self.clave(etapa, entradas)
+        valor = self.buscar(clave)
+        if valor is not None:
+            return valor
+        valor = funcion()
+        self.memoria.guardar(clave, valor)
+        if self.disco is not None:
+            self.disco.escribir(clave, pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+        return valor
+
+    def memoizar(self, etapa):
+        """Decorador: memoriza una función pura por la huella de todos sus argumentos."""
+        def decorador(funcion):
+            def envoltura(*args, **kwargs):
+                return self.calcular(etapa, (args, kwargs), lambda: funcion(*args, **kwargs))
+            envoltura.__name__ = funcion.__name__
+            envoltura.__doc__ = funcion.__doc__
+            return envoltura
+        return decorador
+
+_memo_global = None
+_candado_global = threading.Lock()
+
+def memo_global():
+    """Instancia compartida del proceso (memoria + disco), p. ej. entre sesiones de Streamlit."""
+    global _memo_global
+    with _candado_global:
+        if _memo_global is None:
+            _memo_global = Memo(disco=True)
+        return _memo_global
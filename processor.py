@@ -1,167 +1,217 @@
-import pandas as pd
-from bs4 import BeautifulSoup
 import re
-from utils import normalize_name, limpiar_valor, mapear_cuenta_normalizada
-
-def procesar_archivos(archivos):
-    """Procesa los archivos subidos y devuelve datos de balance, resultados y flujo de efectivo."""
-    datos_balance = {}
-    datos_resultados = {}
-    datos_flujo_efectivo = {}
-
-    for i, archivo in enumerate(archivos):
-        contenido = None
-        for cod in ['latin-1', 'cp1252', 'utf-8']:
-            try:
-                archivo.seek(0)
-                contenido = archivo.read().decode(cod)
-                break
-            except:
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from acumulador import AcumuladorLargo, BALANCE, RESULTADOS, FLUJO_EFECTIVO
+from cache import huella_bytes
+from extractor import extraer_tablas
+from ingesta import CODIFICACION_POR_DEFECTO, abrir_contenido, detectar_codificacion
+from utils import normalize_name, limpiar_valores, mapear_cuenta_normalizada
+
+# Filas de sección del balance (sin valores propios); se comparan ya normalizadas
+ENCABEZADOS_SECCION = frozenset([
+    "ACTIVOS", "ACTIVO", "ACTIVOS CORRIENTES", "ACTIVO CORRIENTE",
+    "ACTIVOS NO CORRIENTES", "ACTIVO NO CORRIENTE",
+    "PASIVOS", "PASIVO", "PASIVOS CORRIENTES", "PASIVO CORRIENTE",
+    "PASIVOS NO CORRIENTES", "PASIVO NO CORRIENTE",
+    "PATRIMONIO", "PATRIMONIO NETO", "PASIVO Y PATRIMONIO", "PASIVOS Y PATRIMONIO",
+    "CUENTAS POR COBRAR COMERCIALES Y OTRAS CUENTAS POR COBRAR",
+    "CUENTAS POR PAGAR COMERCIALES Y OTRAS CUENTAS POR PAGAR"
+])
+
+def _valores_por_fila(filas):
+    """Limpia de una vez todas las celdas de valores (columnas 2+) y las devuelve agrupadas por fila."""
+    valores = limpiar_valores([v for fila in filas for v in fila[2:]])
+    por_fila = []
+    inicio = 0
+    for fila in filas:
+        fin = inicio + max(len(fila) - 2, 0)
+        por_fila.append(valores[inicio:fin])
+        inicio = fin
+    return por_fila
+
+def _parsear_contenido(datos):
+    """Parsea un archivo SMV y devuelve sus celdas (balance, resultados, flujo) en un AcumuladorLargo."""
+    acumulador = AcumuladorLargo()
+
+    if not len(datos):
+        return acumulador
+
+    codificacion = detectar_codificacion(datos)
+    try:
+        tablas = extraer_tablas(datos, codificacion)
+    except UnicodeDecodeError:
+        # charset declarado pero incorrecto: latin-1 decodifica cualquier secuencia de bytes
+        tablas = extraer_tablas(datos, CODIFICACION_POR_DEFECTO)
+
+    # Procesar Balance
+    filas = tablas.get('gvReporte', [])
+    if len(filas) > 1:
+        encabezados = filas[0]
+        columnas_anios = encabezados[2:]
+        anios = []
+        for col in columnas_anios:
+            m = re.search(r'\b(19|20)\d{2}\b', col)
+            if m:
+                anios.append(int(m.group(0)))
+            else:
+                anios.append(None)
+        for fila, valores_fila in zip(filas[1:], _valores_por_fila(filas[1:])):
+            if len(fila) < 3:
+                continue
+            cuenta_raw = fila[0].strip()
+            if not cuenta_raw:
+                continue
+            cuenta_normalizada_temp = normalize_name(cuenta_raw)
+            if cuenta_normalizada_temp in ENCABEZADOS_SECCION:
+                continue
+            if not valores_fila.any():
+                continue
+            for i_col, valor in enumerate(valores_fila):
+                anio = anios[i_col]
+                if anio is None:
+                    continue
+                cuenta_normalizada = mapear_cuenta_normalizada(cuenta_raw, anio)
+                acumulador.agregar(BALANCE, cuenta_normalizada, anio, valor)
+
+    # Procesar Estado de Resultados
+    filas = tablas.get('gvReporte1', [])
+    if len(filas) > 1:
+        encabezados = filas[0]
+        columnas_anios = encabezados[2:]
+        anios = []
+        for col in columnas_anios:
+            m = re.search(r'\b(19|20)\d{2}\b', col)
+            if m:
+                anios.append(int(m.group(0)))
+            else:
+                anios.append(None)
+        for fila, valores_fila in zip(filas[1:], _valores_por_fila(filas[1:])):
+            if len(fila) < 2:
+                continue
+            cuenta_raw = fila[0].strip()
+            if len(fila) <= 2:
+                continue
+            for i_col, valor in enumerate(valores_fila):
+                anio = anios[i_col]
+                if anio is None:
+                    continue
+                cuenta_normalizada = mapear_cuenta_normalizada(cuenta_raw, anio)
+                acumulador.agregar(RESULTADOS, cuenta_normalizada, anio, valor)
+
+    # Procesar Flujo de Efectivo
+    filas = tablas.get('gvReporte3', [])
+    if len(filas) > 1:
+        encabezados = filas[0]
+        columnas_anios = encabezados[2:]
+        anios = []
+        for col in columnas_anios:
+            m = re.search(r'\b(19|20)\d{2}\b', col)
+            if m:
+                anios.append(int(m.group(0)))
+            else:
+                anios.append(None)
+        for fila, valores_fila in zip(filas[1:], _valores_por_fila(filas[1:])):
+            if len(fila) < 2:
                 continue
-        if not contenido:
-            continue
-
-        soup = BeautifulSoup(contenido, 'html.parser')
-
-        # Procesar Balance
-        tabla_balance = soup.find('table', {'id': 'gvReporte'})
-        if tabla_balance:
-            filas = []
-            for tr in tabla_balance.find_all('tr'):
-                celdas = [td.get_text(strip=True) for td in tr.find_all(['td', 'th'])]
-                if celdas:
-                    filas.append(celdas)
-            if len(filas) > 1:
-                encabezados = filas[0]
-                columnas_anios = encabezados[2:]
-                anios = []
-                for col in columnas_anios:
-                    m = re.search(r'\b(19|20)\d{2}\b', col)
-                    if m:
-                        anios.append(int(m.group(0)))
-                    else:
-                        anios.append(None)
-                encabezados_seccion = [
-                    "ACTIVOS", "ACTIVO", "ACTIVOS CORRIENTES", "ACTIVO CORRIENTE",
-                    "ACTIVOS NO CORRIENTES", "ACTIVO NO CORRIENTE",
-                    "PASIVOS", "PASIVO", "PASIVOS CORRIENTES", "PASIVO CORRIENTE",
-                    "PASIVOS NO CORRIENTES", "PASIVO NO CORRIENTE",
-                    "PATRIMONIO", "PATRIMONIO NETO", "PASIVO Y PATRIMONIO", "PASIVOS Y PATRIMONIO",
-                    "CUENTAS POR COBRAR COMERCIALES Y OTRAS CUENTAS POR COBRAR",
-                    "CUENTAS POR PAGAR COMERCIALES Y OTRAS CUENTAS POR PAGAR"
-                ]
-                for fila in filas[1:]:
-                    if len(fila) < 3:
-                        continue
-                    cuenta_raw = fila[0].strip()
-                    if not cuenta_raw:
-                        continue
-                    cuenta_normalizada_temp = normalize_name(cuenta_raw)
-                    if cuenta_normalizada_temp in encabezados_seccion:
-                        continue
-                    valores_fila = [limpiar_valor(v) for v in fila[2:]]
-                    if all(v == 0 for v in valores_fila):
-                        continue
-                    for i_col, valor_str in enumerate(fila[2:]):
-                        anio = anios[i_col]
-                        if anio is None:
-                            continue
-                        valor = limpiar_valor(valor_str)
-                        cuenta_normalizada = mapear_cuenta_normalizada(cuenta_raw, anio)
-                        if anio not in datos_balance:
-                            datos_balance[anio] = {}
-                        if cuenta_normalizada not in datos_balance[anio]:
-                            datos_balance[anio][cuenta_normalizada] = valor
-                        elif datos_balance[anio][cuenta_normalizada] == 0 and valor != 0:
-                            datos_balance[anio][cuenta_normalizada] = valor
-
-        # Procesar Estado de Resultados
-        tabla_resultados = soup.find('table', {'id': 'gvReporte1'})
-        if tabla_resultados:
-            filas = []
-            for tr in tabla_resultados.find_all('tr'):
-                celdas = [td.get_text(strip=True) for td in tr.find_all(['td', 'th'])]
-                if celdas:
-                    filas.append(celdas)
-            if len(filas) > 1:
-                encabezados = filas[0]
-                columnas_anios = encabezados[2:]
-                anios = []
-                for col in columnas_anios:
-                    m = re.search(r'\b(19|20)\d{2}\b', col)
-                    if m:
-                        anios.append(int(m.group(0)))
-                    else:
-                        anios.append(None)
-                for fila in filas[1:]:
-                    if len(fila) < 2:
-                        continue
-                    cuenta_raw = fila[0].strip()
-                    if len(fila) <= 2:
-                        continue
-                    for i_col, valor_str in enumerate(fila[2:]):
-                        anio = anios[i_col]
-                        if anio is None:
-                            continue
-                        valor = limpiar_valor(valor_str)
-                        cuenta_normalizada = mapear_cuenta_normalizada(cuenta_raw, anio)
-                        if anio not in datos_resultados:
-                            datos_resultados[anio] = {}
-                        datos_resultados[anio][cuenta_normalizada] = valor
-
-        # Procesar Flujo de Efectivo
-        tabla_flujo = soup.find('table', {'id': 'gvReporte3'})
-        if tabla_flujo:
-            filas = []
-            for tr in tabla_flujo.find_all('tr'):
-                celdas = [td.get_text(strip=True) for td in tr.find_all(['td', 'th'])]
-                if celdas:
-                    filas.append(celdas)
-            if len(filas) > 1:
-                encabezados = filas[0]
-                columnas_anios = encabezados[2:]
-                anios = []
-                for col in columnas_anios:
-                    m = re.search(r'\b(19|20)\d{2}\b', col)
-                    if m:
-                        anios.append(int(m.group(0)))
-                    else:
-                        anios.append(None)
-                for fila in filas[1:]:
-                    if len(fila) < 2:
-                        continue
-                    cuenta_raw = fila[0].strip()
-                    for i_col, valor_str in enumerate(fila[2:]):
-                        anio = anios[i_col]
-                        if anio is None:
-                            continue
-                        valor = limpiar_valor(valor_str)
-                        cuenta_normalizada = mapear_cuenta_normalizada(cuenta_raw, anio)
-                        if anio not in datos_flujo_efectivo:
-                            datos_flujo_efectivo[anio] = {}
-                        if cuenta_normalizada not in datos_flujo_efectivo[anio]:
-                            datos_flujo_efectivo[anio][cuenta_normalizada] = valor
-                        elif datos_flujo_efectivo[anio][cuenta_normalizada] == 0 and valor != 0:
-                            datos_flujo_efectivo[anio][cuenta_normalizada] = valor
-
-    df_balance = pd.DataFrame.from_dict(datos_balance, orient='index').fillna(0.0).T if datos_balance else pd.DataFrame()
-    df_resultados = pd.DataFrame.from_dict(datos_resultados, orient='index').fillna(0.0).T if datos_resultados else pd.DataFrame()
-    df_flujo_efectivo = pd.DataFrame.from_dict(datos_flujo_efectivo, orient='index').fillna(0.0).T if datos_flujo_efectivo else pd.DataFrame()
+            cuenta_raw = fila[0].strip()
+            for i_col, valor in enumerate(valores_fila):
+                anio = anios[i_col]
+                if anio is None:
+                    continue
+                cuenta_normalizada = mapear_cuenta_normalizada(cuenta_raw, anio)
+                acumulador.agregar(FLUJO_EFECTIVO, cuenta_normalizada, anio, valor)
+
+    return acumulador
+
+def _parsear_contenidos(contenidos, paralelo=False, max_workers=None):
+    """Parsea una lista de contenidos, en serie o en un pool de procesos, conservando el orden."""
+    if paralelo and len(contenidos) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Los buffers (memoryview/mmap) no se pueden enviar a otro proceso: se copian a bytes
+            return list(executor.map(_parsear_contenido, (bytes(datos) for datos in contenidos)))
+    return [_parsear_contenido(datos) for datos in contenidos]
+
+def _obtener_parciales(contenidos, paralelo=False, max_workers=None, cache=None):
+    """Devuelve el AcumuladorLargo de cada contenido, leyendo de la cache los ya conocidos."""
+    if cache is None:
+        return _parsear_contenidos(contenidos, paralelo, max_workers)
+    claves = [cache.clave(datos) for datos in contenidos]
+    parciales = [cache.obtener(clave) for clave in claves]
+    pendientes = [i for i, parcial in enumerate(parciales) if parcial is None]
+    nuevos = _parsear_contenidos([contenidos[i] for i in pendientes], paralelo, max_workers)
+    for i, parcial in zip(pendientes, nuevos):
+        parciales[i] = parcial
+        cache.guardar(claves[i], parcial)
+    return parciales
+
+def _construir_estados(parciales):
+    """Concatena los parciales en orden y arma los DataFrames de balance, resultados y flujo."""
+    acumulador = AcumuladorLargo()
+    for parcial in parciales:
+        acumulador.extender(parcial)
+    df_balance, df_resultados, df_flujo_efectivo = acumulador.pivotar()
 
     # ⭐️ ELIMINAR EL PRIMER AÑO DE TODAS LAS TABLAS (LOGICA DE TU COMPAÑERO)
     if not df_balance.empty:
-        df_balance = df_balance.reindex(sorted(df_balance.columns), axis=1)
         if len(df_balance.columns) > 1:
             df_balance = df_balance.iloc[:, 1:]  # ← Elimina la primera columna (primer año)
 
     if not df_resultados.empty:
-        df_resultados = df_resultados.reindex(sorted(df_resultados.columns), axis=1)
         if len(df_resultados.columns) > 1:
             df_resultados = df_resultados.iloc[:, 1:]  # ← Elimina la primera columna (primer año)
 
     if not df_flujo_efectivo.empty:
-        df_flujo_efectivo = df_flujo_efectivo.reindex(sorted(df_flujo_efectivo.columns), axis=1)
         if len(df_flujo_efectivo.columns) > 1:
             df_flujo_efectivo = df_flujo_efectivo.iloc[:, 1:]  # ← Elimina la primera columna (primer año)
 
-    return df_balance, df_resultados, df_flujo_efectivo
\ No newline at end of file
+    return df_balance, df_resultados, df_flujo_efectivo
+
+def procesar_archivos(archivos, paralelo=False, max_workers=None, cache=None):
+    """Procesa los archivos subidos y devuelve datos de balance, resultados y flujo de efectivo.
+
+    ``archivos`` puede contener archivos subidos, archivos abiertos en modo binario, rutas o bytes.
+    Con ``paralelo=True`` cada archivo se parsea en un pool de procesos y los resultados
+    parciales se concatenan en el orden original, por lo que la salida es idéntica.
+    Si se pasa una ``CacheParseo``, los archivos ya conocidos (mismo contenido) no se vuelven a parsear.
+    """
+    with ExitStack() as pila:
+        contenidos = [pila.enter_context(abrir_contenido(archivo)) for archivo in archivos]
+        parciales = _obtener_parciales(contenidos, paralelo, max_workers, cache)
+    return _construir_estados(parciales)
+
+class ProcesadorIncremental:
+    """Versión con estado de procesar_archivos para reruns sucesivos con el mismo conjunto de archivos.
+
+    Recuerda las celdas parseadas de cada archivo por el hash de su contenido: al cambiar la
+    lista subida solo se parsean los archivos nuevos y se descartan los retirados, y si la
+    lista no cambió se devuelven los mismos DataFrames sin recalcular nada.
+    """
+
+    def __init__(self, paralelo=False, max_workers=None, cache=None):
+        self.paralelo = paralelo
+        self.max_workers = max_workers
+        self.cache = cache
+        self._parciales = {}
+        self._huellas = None
+        self._estados = None
+
+    def actualizar(self, archivos):
+        """Devuelve (df_balance, df_resultados, df_flujo_efectivo) para la lista actual de archivos."""
+        with ExitStack() as pila:
+            contenidos = [pila.enter_context(abrir_contenido(archivo)) for archivo in archivos]
+            huellas = [huella_bytes(datos) for datos in contenidos]
+            if huellas == self._huellas:
+                return self._estados
+
+            nuevos = {}
+            for huella, datos in zip(huellas, contenidos):
+                if huella not in self._parciales and huella not in nuevos:
+                    nuevos[huella] = datos
+            parciales = _obtener_parciales(list(nuevos.values()), self.paralelo, self.max_workers, self.cache)
+        self._parciales.update(zip(nuevos, parciales))
+        # Se descartan los aportes de los archivos que ya no están en la lista
+        self._parciales = {huella: self._parciales[huella] for huella in huellas}
+
+        self._estados = _construir_estados([self._parciales[huella] for huella in huellas])
+        self._huellas = huellas
+        return self._estados
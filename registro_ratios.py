@@ -0,0 +1,237 @@
+"""Registro declarativo de ratios financieros y su compilación a un DAG de operaciones vectorizadas.
+
+Cada ratio declara numerador y denominador como nombres de nodos. Un nodo es una cuenta de
+entrada (la resuelve analyzer) o un nodo intermedio del registro (Formula o Promedio). El
+compilador ordena topológicamente solo los nodos que usan los ratios pedidos, de modo que los
+intermedios compartidos (activos promedio, patrimonio con respaldo, ...) se calculan una vez.
+Todos los arreglos llevan los años en el último eje: sirven igual para un emisor o un panel.
+"""
+import numpy as np
+
+# Motivos por los que un ratio no tiene valor (máscara paralela a df_ratios)
+MOTIVO_VALIDO = 0
+MOTIVO_SIN_CUENTA = 1
+MOTIVO_PROMEDIO_NULO = 2
+MOTIVO_DENOMINADOR_CERO = 3
+MOTIVO_SIN_ANIO = 4
+DESCRIPCION_MOTIVOS = {
+    MOTIVO_SIN_CUENTA: "No se encontró una cuenta necesaria (denominador o insumo requerido)",
+    MOTIVO_PROMEDIO_NULO: "El promedio con el año anterior es 0",
+    MOTIVO_DENOMINADOR_CERO: "El denominador es 0",
+    MOTIVO_SIN_ANIO: "El emisor no reporta ese año",
+}
+
+class Formula:
+    """Nodo intermedio: ``funcion(*entradas)`` elemento a elemento.
+
+    Se considera presente (cuenta encontrada) si lo están todas sus entradas o, si se indica
+    ``presente_con``, alguna de esas.
+    """
+
+    def __init__(self, entradas, funcion, presente_con=None):
+        self.entradas = tuple(entradas)
+        self.funcion = funcion
+        self.presente_con = tuple(presente_con) if presente_con else None
+
+    def presente(self, presencia):
+        if self.presente_con:
+            return np.logical_or.reduce([presencia[e] for e in self.presente_con])
+        return np.logical_and.reduce([presencia[e] for e in self.entradas])
+
+class Promedio:
+    """Promedio de otro nodo con su año anterior válido (el primer año usa su propio valor)."""
+
+    def __init__(self, base):
+        self.entradas = (base,)
+
+    def presente(self, presencia):
+        return presencia[self.entradas[0]]
+
+class Ratio:
+    """numerador / denominador; los motivos de N/A salen del denominador.
+
+    ``requiere`` lista nodos que además deben estar presentes (si no, MOTIVO_SIN_CUENTA); por
+    defecto un numerador no encontrado vale 0, como en los ratios originales.
+    """
+
+    def __init__(self, numerador, denominador, requiere=()):
+        self.numerador = numerador
+        self.denominador = denominador
+        self.requiere = tuple(requiere)
+
+def _patrimonio_con_respaldo(patr, act_tot, pas_tot):
+    # Sin patrimonio reportado pero con activos: activos - pasivos
+    return np.where((patr == 0.0) & (act_tot != 0.0), act_tot - pas_tot, patr)
+
+def _ebitda(util_oper, dya):
+    # La depreciación y amortización se suma en valor absoluto (en el flujo suele venir como ajuste)
+    return util_oper + np.abs(dya)
+
+def _flujo_caja_libre(fco, capex):
+    # La compra de activo fijo viene con signo negativo en el flujo de inversión
+    return fco - np.abs(capex)
+
+# Nodos intermedios compartidos por los ratios
+NODOS = {
+    "patrimonio": Formula(("patr", "act_tot", "pas_tot"), _patrimonio_con_respaldo, presente_con=("patr", "act_tot")),
+    "act_corr_sin_inv": Formula(("act_corr", "inv"), np.subtract),
+    "costo_abs": Formula(("costo",), np.abs),
+    "ebitda": Formula(("util_oper", "dya"), _ebitda),
+    "gastos_fin_abs": Formula(("gastos_fin",), np.abs),
+    "capex_abs": Formula(("capex",), np.abs),
+    "fcl": Formula(("fco", "capex"), _flujo_caja_libre, presente_con=("fco",)),
+    "devengos": Formula(("util", "fco"), np.subtract),
+    "cxc_prom": Promedio("cxc"),
+    "inv_prom": Promedio("inv"),
+    "act_prom": Promedio("act_tot"),
+    "patr_prom": Promedio("patrimonio"),
+}
+
+# Ratios en el orden en que se muestran
+RATIOS = {
+    "Liquidez Corriente": Ratio("act_corr", "pas_corr"),
+    "Prueba Ácida": Ratio("act_corr_sin_inv", "pas_corr"),
+    "Rotación CxC": Ratio("ventas", "cxc_prom"),
+    "Rotación Inventarios": Ratio("costo_abs", "inv_prom"),
+    "Rotación Activos Totales": Ratio("ventas", "act_prom"),
+    "Razón Deuda Total": Ratio("pas_tot", "act_tot"),
+    "Razón Deuda/Patrimonio": Ratio("pas_tot", "patrimonio"),
+    "Margen Neto": Ratio("util", "ventas"),
+    "ROA": Ratio("util", "act_prom"),
+    "ROE": Ratio("util", "patr_prom"),
+    "Margen EBITDA": Ratio("ebitda", "ventas", requiere=("ebitda",)),
+    "Cobertura de Intereses": Ratio("util_oper", "gastos_fin_abs", requiere=("util_oper",)),
+}
+
+def compilar(ratios=None, nodos=None):
+    """Ordena topológicamente los nodos que necesitan los ratios pedidos.
+
+    Devuelve (plan, entradas): ``plan`` es la lista [(nombre, nodo)] en orden de cálculo y
+    ``entradas`` los nombres de cuenta que deben venir de fuera. Falla ante ciclos.
+    """
+    ratios = RATIOS if ratios is None else ratios
+    nodos = NODOS if nodos is None else nodos
+    plan = []
+    entradas = []
+    estado = {}  # nombre -> 1 en curso, 2 listo
+
+    def visitar(nombre):
+        if estado.get(nombre) == 2:
+            return
+        if estado.get(nombre) == 1:
+            raise ValueError(f"Ciclo en el registro de ratios en el nodo '{nombre}'")
+        nodo = nodos.get(nombre)
+        if nodo is None:
+            entradas.append(nombre)
+            estado[nombre] = 2
+            return
+        estado[nombre] = 1
+        for entrada in nodo.entradas:
+            visitar(entrada)
+        estado[nombre] = 2
+        plan.append((nombre, nodo))
+
+    for ratio in ratios.values():
+        for nombre in (ratio.numerador, ratio.denominador) + ratio.requiere:
+            visitar(nombre)
+    return plan, entradas
+
+PLAN, ENTRADAS = compilar()
+
+# Ratios del flujo de efectivo y calidad de utilidades (FCO = flujo de caja operativo, FCL = libre)
+RATIOS_FLUJO = {
+    "FCO / Ventas": Ratio("fco", "ventas", requiere=("fco",)),
+    "FCO / Pasivo Corriente": Ratio("fco", "pas_corr", requiere=("fco",)),
+    "FCO / Pasivo Total": Ratio("fco", "pas_tot", requiere=("fco",)),
+    "Conversión de Efectivo (FCO / Utilidad Neta)": Ratio("fco", "util", requiere=("fco",)),
+    "FCL / Ventas": Ratio("fcl", "ventas", requiere=("fcl",)),
+    "Cobertura de Capex (FCO / Capex)": Ratio("fco", "capex_abs", requiere=("fco",)),
+    "Ratio de Devengos (Devengos / Activos Promedio)": Ratio("devengos", "act_prom", requiere=("devengos",)),
+}
+# Montos del flujo que se muestran junto a sus ratios: {etiqueta: nodo}
+MONTOS_FLUJO = {
+    "Flujo de Caja Operativo": "fco",
+    "Capex (Compra de Activo Fijo)": "capex_abs",
+    "Flujo de Caja Libre": "fcl",
+    "Devengos (Utilidad Neta - FCO)": "devengos",
+}
+PLAN_FLUJO, ENTRADAS_FLUJO = compilar(RATIOS_FLUJO)
+
+def promedio_con_anterior(actual, previo=None):
+    """Promedio con el año anterior (eje de años = último eje) y máscara de promedios nulos.
+
+    ``previo`` es, por celda, el índice del año anterior válido (-1 si no hay); por defecto la
+    columna anterior. El primer año usa su propio valor; en los demás el promedio es N/A si
+    la suma es 0.
+    """
+    if previo is None:
+        previo = np.broadcast_to(np.arange(actual.shape[-1]) - 1, actual.shape)
+    con_anterior = previo >= 0
+    suma = actual + np.take_along_axis(actual, np.maximum(previo, 0), axis=-1)
+    promedio = np.where(con_anterior, suma / 2, actual)
+    return promedio, con_anterior & (suma == 0)
+
+def anio_anterior_valido(valido):
+    """Índice del año válido anterior de cada celda (-1 si no hay), con los años en el último eje."""
+    indices = np.where(valido, np.arange(valido.shape[-1]), -1)
+    acumulado = np.maximum.accumulate(indices, axis=-1)
+    previo = np.full(valido.shape, -1, dtype=np.int64)
+    previo[..., 1:] = acumulado[..., :-1]
+    return previo
+
+def _motivo_base(forma, presente, nulo=None):
+    """Motivos de un denominador: sin cuenta si no se encontró y promedio nulo donde indica la máscara.
+
+    ``presente`` es un booleano o, en un panel, un arreglo con uno por emisor (primer eje).
+    """
+    presente = np.asarray(presente, dtype=bool)
+    if presente.ndim:
+        presente = presente[:, np.newaxis]
+    motivo = np.broadcast_to(np.where(presente, MOTIVO_VALIDO, MOTIVO_SIN_CUENTA).astype(np.int8), forma).copy()
+    if nulo is not None:
+        motivo[(motivo == MOTIVO_VALIDO) & nulo] = MOTIVO_PROMEDIO_NULO
+    return motivo
+
+def _division_segura(num, den, motivo):
+    """num/den elemento a elemento; NaN y su motivo donde el denominador es 0 o ya no era válido."""
+    motivo = np.where((motivo == MOTIVO_VALIDO) & (den == 0), MOTIVO_DENOMINADOR_CERO, motivo).astype(np.int8)
+    invalido = motivo != MOTIVO_VALIDO
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultado = num / np.where(invalido, 1.0, den)
+    resultado[invalido] = np.nan
+    return resultado, motivo
+
+def presencia_nodos(presentes, plan=None):
+    """Presencia (cuenta encontrada) de las entradas y de cada nodo del plan."""
+    presencia = dict(presentes)
+    for nombre, nodo in (PLAN if plan is None else plan):
+        presencia[nombre] = nodo.presente(presencia)
+    return presencia
+
+def evaluar(valores, presentes, previo=None, plan=None, ratios=None):
+    """Ejecuta el plan compilado sobre las cuentas de entrada.
+
+    ``valores`` y ``presentes`` traen, por cuenta de entrada, sus valores (ceros si no se
+    encontró) y si se encontró (escalar o uno por emisor); ``previo`` el año anterior válido
+    de cada celda. Devuelve ({ratio: (valores, motivos)}, {nodo: valores}).
+    """
+    plan = PLAN if plan is None else plan
+    ratios = RATIOS if ratios is None else ratios
+    nodos = dict(valores)
+    presencia = presencia_nodos(presentes, plan)
+    nulos = {}
+    for nombre, nodo in plan:
+        if isinstance(nodo, Promedio):
+            nodos[nombre], nulos[nombre] = promedio_con_anterior(nodos[nodo.entradas[0]], previo)
+        else:
+            nodos[nombre] = nodo.funcion(*(nodos[entrada] for entrada in nodo.entradas))
+
+    resultado = {}
+    for nombre, ratio in ratios.items():
+        den = nodos[ratio.denominador]
+        presente = presencia[ratio.denominador]
+        for requerido in ratio.requiere:
+            presente = np.logical_and(presente, presencia[requerido])
+        motivo = _motivo_base(den.shape, presente, nulos.get(ratio.denominador))
+        resultado[nombre] = _division_segura(nodos[ratio.numerador], den, motivo)
+    return resultado, nodos
@@ -0,0 +1,119 @@
+"""Estadísticas de tendencia multianual para cuentas y ratios, vectorizadas sobre todas las filas.
+
+Las columnas de entrada son años (enteros). Los años faltantes se tratan como huecos reales:
+la serie se ubica en una grilla anual completa (NaN en los huecos), de modo que las ventanas
+móviles cubren años calendario y el CAGR y la pendiente usan la distancia real entre años.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+VENTANA_POR_DEFECTO = 3
+COLUMNAS_RESUMEN = ['Desde', 'Hasta', 'CAGR', 'Pendiente', 'Máx. Drawdown', 'Media Móvil', 'Volatilidad']
+
+def _grilla_anual(df):
+    """Matriz (filas × todos los años del rango) con NaN en los huecos; devuelve (matriz, años, posiciones de df.columns)."""
+    anios = np.asarray(df.columns, dtype=np.int64)
+    todos = np.arange(anios.min(), anios.max() + 1)
+    matriz = np.full((len(df), len(todos)), np.nan)
+    posiciones = anios - anios.min()
+    matriz[:, posiciones] = df.to_numpy(dtype=np.float64)
+    return matriz, todos, posiciones
+
+def _ventanas_moviles(matriz, ventana):
+    """Media y desviación estándar (ddof=1) móviles de ``ventana`` años calendario, ignorando huecos.
+
+    La media necesita al menos un valor en la ventana y la desviación al menos dos.
+    """
+    relleno = np.pad(matriz, ((0, 0), (ventana - 1, 0)), constant_values=np.nan)
+    ventanas = sliding_window_view(relleno, ventana, axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        media = np.nanmean(ventanas, axis=-1)
+        desviacion = np.nanstd(ventanas, axis=-1, ddof=1)
+    return media, desviacion
+
+def _drawdown(matriz):
+    """Caída respecto del máximo acumulado (valor / máximo - 1); NaN si el máximo no es positivo."""
+    maximo = np.fmax.accumulate(matriz, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        caida = matriz / maximo - 1
+    caida[~(maximo > 0)] = np.nan
+    return caida
+
+def _cagr(matriz, todos, valido, primero, ultimo):
+    """Crecimiento anual compuesto entre el primer y el último año con dato (ambos positivos)."""
+    filas = np.arange(len(matriz))
+    inicial = matriz[filas, primero]
+    final = matriz[filas, ultimo]
+    n_anios = (todos[ultimo] - todos[primero]).astype(np.float64)
+    calculable = valido.any(axis=1) & (n_anios > 0) & (inicial > 0) & (final > 0)
+    cagr = np.full(len(matriz), np.nan)
+    cagr[calculable] = (final[calculable] / inicial[calculable]) ** (1 / n_anios[calculable]) - 1
+    return cagr
+
+def _pendiente(matriz, todos, valido):
+    """Pendiente de la recta de mínimos cuadrados valor ~ año, con los años reales (mín. 2 datos)."""
+    x = np.where(valido, todos - todos.mean(), 0.0)
+    y = np.where(valido, matriz, 0.0)
+    n = valido.sum(axis=1)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    denominador = n * (x * x).sum(axis=1) - sx * sx
+    pendiente = np.full(len(matriz), np.nan)
+    calculable = (n >= 2) & (denominador > 0)
+    pendiente[calculable] = ((n * (x * y).sum(axis=1) - sx * sy)[calculable] / denominador[calculable])
+    return pendiente
+
+def calcular_tendencias(df, ventana=VENTANA_POR_DEFECTO):
+    """Tendencias de todas las filas de df (columnas = años) en una sola pasada.
+
+    Devuelve (df_resumen, df_media_movil, df_volatilidad, df_drawdown). df_resumen tiene, por
+    fila, el primer y último año con dato, CAGR, pendiente anual, máximo drawdown y la media
+    móvil y volatilidad del último año con dato; los otros tres van por año (columnas de df).
+    """
+    if df.empty or not len(df.columns):
+        vacio = pd.DataFrame(index=df.index)
+        return pd.DataFrame(index=df.index, columns=COLUMNAS_RESUMEN, dtype=np.float64), vacio, vacio, vacio
+
+    matriz, todos, posiciones = _grilla_anual(df)
+    valido = ~np.isnan(matriz)
+    primero = valido.argmax(axis=1)
+    ultimo = matriz.shape[1] - 1 - valido[:, ::-1].argmax(axis=1)
+    media, desviacion = _ventanas_moviles(matriz, ventana)
+    caida = _drawdown(matriz)
+
+    filas = np.arange(len(matriz))
+    con_datos = valido.any(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        max_drawdown = np.nanmin(caida, axis=1)
+    df_resumen = pd.DataFrame({
+        'Desde': np.where(con_datos, todos[primero], np.nan),
+        'Hasta': np.where(con_datos, todos[ultimo], np.nan),
+        'CAGR': _cagr(matriz, todos, valido, primero, ultimo),
+        'Pendiente': _pendiente(matriz, todos, valido),
+        'Máx. Drawdown': max_drawdown,
+        'Media Móvil': np.where(con_datos, media[filas, ultimo], np.nan),
+        'Volatilidad': np.where(con_datos, desviacion[filas, ultimo], np.nan),
+    }, index=df.index)
+
+    def por_anio(valores):
+        return pd.DataFrame(valores[:, posiciones], index=df.index, columns=df.columns)
+
+    return df_resumen, por_anio(media), por_anio(desviacion), por_anio(caida)
+
+def calcular_tendencias_estados(estados, ventana=VENTANA_POR_DEFECTO):
+    """Tendencias de varios DataFrames ({origen: df}) apilados, en una sola pasada.
+
+    Las filas quedan indexadas por (Origen, Cuenta) sobre la unión de años; los años que un
+    origen no tiene son huecos. Devuelve lo mismo que calcular_tendencias.
+    """
+    estados = {origen: df for origen, df in estados.items() if df is not None and not df.empty}
+    if not estados:
+        vacio = pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=['Origen', 'Cuenta']))
+        return calcular_tendencias(vacio, ventana)
+    apilado = pd.concat(estados, names=['Origen', 'Cuenta'])
+    apilado = apilado.reindex(columns=sorted(apilado.columns))
+    return calcular_tendencias(apilado, ventana)
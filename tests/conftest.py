@@ -0,0 +1,25 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generador_smv import generar_emisor
+from processor import procesar_archivos
+
+def iguales(a, b):
+    """Mismas filas, columnas, tipos y valores (NaN == NaN); dos DataFrames vacíos son iguales."""
+    if a.empty or b.empty:
+        return a.empty and b.empty
+    return (list(a.index) == list(b.index) and list(a.columns) == list(b.columns)
+            and a.dtypes.equals(b.dtypes) and np.array_equal(a.to_numpy(), b.to_numpy(), equal_nan=True))
+
+@pytest.fixture(scope='session')
+def estados_emisores():
+    """Estados (balance, resultados, flujo) de cuatro emisores sintéticos 2005-2023 (nomenclatura antigua y nueva)."""
+    return [
+        procesar_archivos([contenido for _, contenido in generar_emisor(semilla=semilla, relleno_kb=0)])
+        for semilla in range(4)
+    ]
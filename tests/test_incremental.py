@@ -0,0 +1,87 @@
+"""AnalizadorIncremental frente al recálculo completo tras secuencias de ediciones."""
+import numpy as np
+import pytest
+
+import analyzer
+from conftest import iguales
+from tendencias import calcular_tendencias_estados
+
+def _comparar(resultado, b, r, f):
+    analisis_vh, ratios, flujo = resultado
+    for incremental, completo in zip(analisis_vh, analyzer.calcular_analisis_vh(b, r, f)):
+        assert iguales(incremental, completo)
+    df_ratios, df_motivos, debug_info, anios = analyzer.calcular_ratios(b, r, f)
+    assert iguales(ratios[0], df_ratios) and iguales(ratios[1], df_motivos)
+    assert ratios[2] == debug_info and ratios[3] == anios
+    for incremental, completo in zip(flujo, analyzer.calcular_ratios_flujo(b, r, f)):
+        assert iguales(incremental, completo)
+
+@pytest.mark.parametrize('emisor', range(4))
+def test_ediciones_aleatorias(estados_emisores, emisor):
+    B, R, F = estados_emisores[emisor]
+    rng = np.random.default_rng(7 + emisor)
+    analizador = analyzer.AnalizadorIncremental()
+    b, r, f = B.iloc[:, :3].copy(), R.iloc[:, :3].copy(), F.iloc[:, :3].copy()
+    for paso in range(60):
+        operacion = rng.integers(0, 5)
+        if operacion == 0 and b.shape[1] < B.shape[1]:
+            # Año nuevo (el flujo puede no tenerlo)
+            anio = B.columns[b.shape[1]]
+            b[anio] = B[anio]
+            r[anio] = R[anio] if anio in R else 0.0
+            if anio in F:
+                f[anio] = F[anio]
+        elif operacion == 1:
+            df = (b, r, f)[rng.integers(0, 3)]
+            if not df.empty:
+                i, j = rng.integers(0, len(df)), rng.integers(0, df.shape[1])
+                df.iat[i, j] = float(rng.integers(-5, 5)) * rng.choice([0, 1, 1000])
+        elif operacion == 2 and b.shape[1] > 1:
+            # Quitar un año (del medio o el primero): cambia el año anterior de los promedios
+            b = b.drop(columns=b.columns[rng.integers(0, b.shape[1])])
+        elif operacion == 3:
+            b.loc[f"NUEVA {paso}"] = 0.0
+        _comparar(analizador.actualizar(b, r, f), b, r, f)
+        b, r, f = b.copy(), r.copy(), f.copy()
+
+def test_cambio_se_propaga_al_promedio_del_anio_siguiente(estados_emisores):
+    b, r, f = (df.copy() for df in estados_emisores[1])
+    analizador = analyzer.AnalizadorIncremental()
+    antes = analizador.actualizar(b, r, f)[1][0].loc["ROA"].copy()
+    fila = analyzer._resolver_cuentas_ratios(b.index, r.index, f.index)["act_tot"]
+    # Dos años consecutivos con ROA calculable y distinto de cero
+    utiles = (antes != 0) & antes.notna()
+    j = next(j for j in range(1, len(antes) - 1) if utiles.iloc[j] and utiles.iloc[j + 1])
+    anio, siguiente = antes.index[j], antes.index[j + 1]
+
+    b = b.copy()
+    b.loc[fila, anio] *= 2
+    resultado = analizador.actualizar(b, r, f)
+    despues = resultado[1][0].loc["ROA"]
+    # El año editado y el siguiente (su promedio usa el editado) cambian; el resto no
+    assert despues[anio] != antes[anio] and despues[siguiente] != antes[siguiente]
+    otros = [c for c in despues.index if c not in (anio, siguiente)]
+    assert np.array_equal(despues[otros].to_numpy(), antes[otros].to_numpy(), equal_nan=True)
+    _comparar(resultado, b, r, f)
+
+def test_entradas_sin_cambios_reutilizan_el_resultado(estados_emisores):
+    b, r, f = estados_emisores[0]
+    analizador = analyzer.AnalizadorIncremental()
+    assert analizador.actualizar(b, r, f) is analizador.actualizar(b, r, f)
+
+def test_tendencias_se_reutilizan_hasta_que_cambian_las_entradas(estados_emisores):
+    b, r, f = (df.copy() for df in estados_emisores[2])
+    analizador = analyzer.AnalizadorIncremental()
+    _, ratios, flujo = analizador.actualizar(b, r, f)
+    tendencias = analizador.tendencias()
+    analizador.actualizar(b, r, f)
+    assert analizador.tendencias() is tendencias
+
+    r = r.copy()
+    r.iat[0, 0] += 1000
+    _, ratios, flujo = analizador.actualizar(b, r, f)
+    completas = calcular_tendencias_estados({
+        "Ratios": ratios[0], "Ratios Flujo": flujo[1], "Balance": b, "Resultados": r, "Flujo Efectivo": f,
+    })
+    for incremental, completo in zip(analizador.tendencias(), completas):
+        assert iguales(incremental, completo)
@@ -0,0 +1,103 @@
+"""Modo panel (muchos emisores a la vez) frente al cálculo emisor por emisor."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyzer
+from registro_ratios import MOTIVO_SIN_ANIO
+
+@pytest.fixture(scope='module')
+def estados_panel(estados_emisores):
+    """Variantes de los emisores base con celdas en cero, años, cuentas o estados faltantes."""
+    rng = np.random.default_rng(3)
+    estados = {}
+    for k in range(80):
+        b, r, f = (df.copy() for df in estados_emisores[k % len(estados_emisores)])
+        if k >= len(estados_emisores):
+            for df in (b, r):
+                mascara = rng.random(df.shape) < 0.1
+                valores = df.to_numpy()
+                valores[mascara] = 0
+                df.iloc[:, :] = valores
+            if k % 3 == 0:
+                b = b.drop(columns=[c for c in b.columns if rng.random() < 0.3])
+            if k % 4 == 1:
+                r = r.drop(columns=[c for c in r.columns if rng.random() < 0.3])
+            if k % 5 == 2:
+                b = b.drop(index=[i for i in b.index if rng.random() < 0.3])
+            if k % 11 == 3:
+                r = r.iloc[:0]
+            if k % 6 == 5:
+                f = f.drop(columns=[c for c in f.columns if rng.random() < 0.4])
+            if k % 7 == 4:
+                f = f.iloc[:0]
+        estados[f"E{k:03d}"] = (b, r, f)
+    return estados
+
+def test_ratios_panel_igual_a_por_emisor(estados_panel):
+    panel = analyzer.apilar_emisores(estados_panel)
+    df_ratios, df_motivos = analyzer.calcular_ratios_panel(*panel)
+    for emisor, estados in estados_panel.items():
+        ratios, motivos, _, anios = analyzer.calcular_ratios(*estados)
+        otros = [c for c in df_ratios.columns if c not in anios]
+        if anios:
+            assert np.array_equal(df_ratios.loc[emisor, anios].to_numpy(), ratios.to_numpy(), equal_nan=True), emisor
+            assert np.array_equal(df_motivos.loc[emisor, anios].to_numpy(), motivos.to_numpy()), emisor
+        # Los años que el emisor no reporta quedan en NaN con su motivo
+        assert df_ratios.loc[emisor, otros].isna().all().all(), emisor
+        assert (df_motivos.loc[emisor, otros] == MOTIVO_SIN_ANIO).all().all(), emisor
+
+def test_analisis_vh_panel_igual_a_por_emisor(estados_panel):
+    panel = analyzer.calcular_analisis_vh_panel(*analyzer.apilar_emisores(estados_panel))
+    for emisor, estados in estados_panel.items():
+        for j, (de_panel, propio) in enumerate(zip(panel, analyzer.calcular_analisis_vh(*estados))):
+            if propio.empty:
+                continue
+            sub = de_panel.loc[emisor]
+            assert np.array_equal(sub.loc[propio.index, propio.columns].to_numpy(), propio.to_numpy(),
+                                  equal_nan=True), (emisor, j)
+            if j % 2 == 1:
+                # Horizontal: los pares de otros emisores quedan en NaN para este
+                otros = [c for c in sub.columns if c not in propio.columns]
+                assert sub[otros].isna().all().all(), (emisor, j)
+
+def test_horizontal_panel_con_anio_faltante(estados_emisores):
+    b, r, f = estados_emisores[0]
+    faltante, anterior, siguiente = b.columns[4], b.columns[3], b.columns[5]
+    b_sin_anio = b.drop(columns=faltante)
+    estados = {"A": (b, r, f), "B": (b_sin_anio, r, f)}
+    horizontal = analyzer.calcular_analisis_vh_panel(*analyzer.apilar_emisores(estados))[1]
+    propio_a = analyzer.calcular_analisis_vh(b, r, f)[1]
+    propio_b = analyzer.calcular_analisis_vh(b_sin_anio, r, f)[1]
+
+    # El emisor sin el año compara contra su año reportado anterior, en todos sus pares
+    assert f"{anterior}-{siguiente}" in propio_b.columns
+    for emisor, propio in (("A", propio_a), ("B", propio_b)):
+        for par in propio.columns:
+            assert np.array_equal(horizontal.loc[emisor, par].to_numpy(), propio[par].to_numpy(),
+                                  equal_nan=True), (emisor, par)
+    # Y no tiene los pares del año que no reportó; A no tiene el par que salta el año
+    assert horizontal.loc["B", [f"{anterior}-{faltante}", f"{faltante}-{siguiente}"]].isna().all().all()
+    assert horizontal.loc["A", f"{anterior}-{siguiente}"].isna().all()
+    # Las columnas siguen el orden de los años
+    assert list(horizontal.columns).index(f"{anterior}-{faltante}") < list(horizontal.columns).index(f"{anterior}-{siguiente}")
+
+def test_estadisticas_sector():
+    nan = np.nan
+    indice = pd.MultiIndex.from_product([["A", "B", "C"], ["ROA", "ROE"]], names=['Emisor', 'Ratio'])
+    df_ratios = pd.DataFrame([
+        [0.1, 0.3], [1.0, 2.0],   # A
+        [0.2, nan], [nan, nan],   # B: sin ROE y sin ROA en 2021
+        [0.4, 0.5], [3.0, 2.0],   # C
+    ], index=indice, columns=[2020, 2021])
+    medianas, percentiles = analyzer.estadisticas_sector(df_ratios)
+
+    # Mediana de los emisores con dato; los NaN no cuentan
+    assert list(medianas.index) == ["ROA", "ROE"]
+    np.testing.assert_allclose(medianas.to_numpy(), [[0.2, 0.4], [2.0, 2.0]])
+    # Percentil = rango / emisores con dato (empates promediados); NaN para el emisor sin dato
+    np.testing.assert_allclose(percentiles.loc[indice].to_numpy(), [
+        [1 / 3, 0.5], [0.5, 0.75],
+        [2 / 3, nan], [nan, nan],
+        [1.0, 1.0], [1.0, 0.75],
+    ])
@@ -1,14 +1,25 @@
 import unicodedata
 import re
+from functools import lru_cache
+import numpy as np
+
+_RE_ESPACIOS = re.compile(r'\s+')
+_RE_NOTA = re.compile(r'\s*\(\d+\)\s*$')
+# Máximo de etiquetas distintas memorizadas (las cuentas se repiten entre años y archivos)
+MAX_CUENTAS_MEMO = 8192
+
+@lru_cache(maxsize=MAX_CUENTAS_MEMO)
+def _normalizar_texto(s):
+    s2 = unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII')
+    s2 = _RE_ESPACIOS.sub(' ', s2).strip().upper()
+    s2 = _RE_NOTA.sub('', s2)
+    return s2
 
 def normalize_name(s):
     """Normaliza textos: quita tildes, mayúsculas, compacta espacios y elimina notas (9)"""
     if not isinstance(s, str):
         return s
-    s2 = unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII')
-    s2 = re.sub(r'\s+', ' ', s2).strip().upper()
-    s2 = re.sub(r'\s*\(\d+\)\s*$', '', s2)
-    return s2
+    return _normalizar_texto(s)
 
 def limpiar_valor(valor):
     """Limpia y convierte strings numéricos a float. Maneja paréntesis como negativos."""
@@ -26,76 +37,181 @@ def limpiar_valor(valor):
     except:
         return 0.0
 
+_RE_NEGATIVO = re.compile(r'(?:^|(?<=\x00))\(([^\x00]*)\)(?=\x00|$)')
+_RE_VACIO = re.compile(r'(?:^|(?<=\x00))(?=\x00|$)')
+
+def limpiar_valores(valores):
+    """Versión por lotes de limpiar_valor: convierte una lista de strings a un array float64.
+
+    La limpieza (separadores de miles, \\xa0, espacios, paréntesis como negativos y celdas
+    vacías) se hace sobre un único buffer con los valores unidos, y la conversión es un solo
+    cast a float64. Solo los valores que no son numéricos tras limpiar pasan por limpiar_valor.
+    """
+    valores = list(valores)
+    if not valores:
+        return np.zeros(0, dtype=np.float64)
+    if not all(isinstance(v, str) for v in valores):
+        return np.array([limpiar_valor(v) for v in valores], dtype=np.float64)
+    buffer = '\x00'.join(valores).replace(',', '').replace('\xa0', '').replace(' ', '')
+    if '(' in buffer:
+        buffer = _RE_NEGATIVO.sub(r'-\1', buffer)
+    partes = _RE_VACIO.sub('0', buffer).split('\x00')
+    if len(partes) != len(valores):
+        return np.array([limpiar_valor(v) for v in valores], dtype=np.float64)
+    try:
+        return np.array(partes, dtype=object).astype(np.float64)
+    except ValueError:
+        resultado = np.empty(len(partes), dtype=np.float64)
+        for i, parte in enumerate(partes):
+            try:
+                resultado[i] = float(parte)
+            except ValueError:
+                resultado[i] = limpiar_valor(valores[i])
+        return resultado
+
+# Nomenclatura antigua (pre-2010) → moderna
+MAPEO_ANTIGUO = {
+    # Balance - Activos
+    "CAJA Y BANCOS": "EFECTIVO Y EQUIVALENTES AL EFECTIVO",
+    "VALORES NEGOCIABLES": "OTROS ACTIVOS FINANCIEROS",
+    "EXISTENCIAS": "INVENTARIOS",
+    "GASTOS PAGADOS POR ANTICIPADO": "ANTICIPOS",
+    "INVERSIONES PERMANENTES": "INVERSIONES EN SUBSIDIARIAS NEGOCIOS CONJUNTOS Y ASOCIADAS",
+    "INMUEBLES MAQUINARIA Y EQUIPO NETO DE DEPRECIACION ACUMULADA": "PROPIEDADES PLANTA Y EQUIPO",
+    "INMUEBLES MAQUINARIA Y EQUIPO": "PROPIEDADES PLANTA Y EQUIPO",
+    "ACTIVO INTANGIBLE NETO DE DEPRECIACION ACUMULADA": "ACTIVOS INTANGIBLES DISTINTOS DE LA PLUSVALIA",
+    "ACTIVOS INTANGIBLES": "ACTIVOS INTANGIBLES DISTINTOS DE LA PLUSVALIA",
+    "OTROS ACTIVOS": "OTROS ACTIVOS NO FINANCIEROS",
+    "IMPUESTO A LA RENTA Y PARTICIPACIONES DIFERIDOS ACTIVO": "ACTIVOS POR IMPUESTOS DIFERIDOS",
+    # Balance - Pasivos
+    "SOBREGIROS Y PAGARES BANCARIOS": "OTROS PASIVOS FINANCIEROS",
+    "PARTE CORRIENTE DE LAS DEUDAS A LARGO PLAZO": "OTROS PASIVOS FINANCIEROS",
+    "DEUDAS A LARGO PLAZO": "OTROS PASIVOS FINANCIEROS",
+    "INGRESOS DIFERIDOS": "INGRESOS DIFERIDOS",
+    "IMPUESTO A LA RENTA Y PARTICIPACIONES DIFERIDOS PASIVO": "PASIVOS POR IMPUESTOS DIFERIDOS",
+    # Balance - Patrimonio
+    "CAPITAL": "CAPITAL EMITIDO",
+    "CAPITAL ADICIONAL": "PRIMAS DE EMISION",
+    "EXCEDENTE DE REVALUACION": "SUPERAVIT DE REVALUACION",
+    "RESERVAS LEGALES": "OTRAS RESERVAS DE CAPITAL",
+    "OTRAS RESERVAS": "OTRAS RESERVAS DE PATRIMONIO",
+    "RESULTADOS ACUMULADOS": "RESULTADOS ACUMULADOS",
+    # Estado de Resultados
+    "VENTAS NETAS INGRESOS OPERACIONALES": "INGRESOS DE ACTIVIDADES ORDINARIAS",
+    "VENTAS NETAS": "INGRESOS DE ACTIVIDADES ORDINARIAS",
+    "OTROS INGRESOS OPERACIONALES": "OTROS INGRESOS OPERATIVOS",
+    "TOTAL DE INGRESOS BRUTOS": "INGRESOS DE ACTIVIDADES ORDINARIAS",
+    "COSTO DE VENTAS": "COSTO DE VENTAS",
+    "UTILIDAD BRUTA": "GANANCIA PERDIDA BRUTA",
+    "GASTOS DE ADMINISTRACION": "GASTOS DE ADMINISTRACION",
+    "GASTOS DE VENTAS": "GASTOS DE VENTAS Y DISTRIBUCION",
+    "UTILIDAD OPERATIVA": "GANANCIA PERDIDA OPERATIVA",
+    "INGRESOS FINANCIEROS": "INGRESOS FINANCIEROS",
+    "GASTOS FINANCIEROS": "GASTOS FINANCIEROS",
+    "OTROS INGRESOS": "OTROS INGRESOS OPERATIVOS",
+    "OTROS GASTOS": "OTROS GASTOS OPERATIVOS",
+    "RESULTADO POR EXPOSICION A LA INFLACION": "DIFERENCIAS DE CAMBIO NETO",
+    "RESULTADOS ANTES DE PARTIDAS EXTRAORDINARIAS PARTICIPACIONES Y DEL IMPUESTO A LA RENTA": "GANANCIA PERDIDA ANTES DE IMPUESTOS",
+    "PARTICIPACIONES": "OTROS INGRESOS GASTOS DE LAS SUBSIDIARIAS ASOCIADAS Y NEGOCIOS CONJUNTOS",
+    "IMPUESTO A LA RENTA": "INGRESO GASTO POR IMPUESTO",
+    "RESULTADO ANTES DE PARTIDAS EXTRAORDINARIAS": "GANANCIA PERDIDA NETA DE OPERACIONES CONTINUADAS",
+    "INGRESOS EXTRAORDINARIOS": "OTROS INGRESOS OPERATIVOS",
+    "GASTOS EXTRAORDINARIOS": "OTROS GASTOS OPERATIVOS",
+    "RESULTADO ANTES DE INTERES MINORITARIO": "GANANCIA PERDIDA NETA DEL EJERCICIO",
+    "INTERES MINORITARIO": "PARTICIPACION NO CONTROLADORA",
+    "UTILIDAD PERDIDA NETA DEL EJERCICIO": "GANANCIA PERDIDA NETA DEL EJERCICIO",
+    "UTILIDAD NETA DEL EJERCICIO": "GANANCIA PERDIDA NETA DEL EJERCICIO",
+    "UTILIDAD PERDIDA NETA ATRIBUIBLE A LOS ACCIONISTAS": "GANANCIA PERDIDA NETA DEL EJERCICIO"
+}
+
+# Reglas de búsqueda flexible pre-2010, en orden: (palabras requeridas, cuenta moderna)
+REGLAS_FLEXIBLES_ANTIGUAS = (
+    (("VENTAS", "NETAS"), "INGRESOS DE ACTIVIDADES ORDINARIAS"),
+    (("UTILIDAD", "NETA", "EJERCICIO"), "GANANCIA PERDIDA NETA DEL EJERCICIO"),
+    (("EXISTENCIAS",), "INVENTARIOS"),
+)
+
+def _mapear_antigua(cuenta):
+    """Aplica a una cuenta normalizada el mapeo exacto y luego las reglas flexibles pre-2010."""
+    destino = MAPEO_ANTIGUO.get(cuenta)
+    if destino is not None:
+        return destino
+    for palabras, destino in REGLAS_FLEXIBLES_ANTIGUAS:
+        if all(p in cuenta for p in palabras):
+            return destino
+    return cuenta
+
+@lru_cache(maxsize=MAX_CUENTAS_MEMO)
+def _mapear_cuenta_memo(cuenta_original, antigua):
+    cuenta = normalize_name(cuenta_original)
+    return _mapear_antigua(cuenta) if antigua else cuenta
+
 def mapear_cuenta_normalizada(cuenta_original, anio):
     """Mapea nombres de cuentas antiguas (pre-2010) a nomenclatura moderna."""
-    cuenta = normalize_name(cuenta_original)
-    mapeo_antiguo = {
-        # Balance - Activos
-        "CAJA Y BANCOS": "EFECTIVO Y EQUIVALENTES AL EFECTIVO",
-        "VALORES NEGOCIABLES": "OTROS ACTIVOS FINANCIEROS",
-        "EXISTENCIAS": "INVENTARIOS",
-        "GASTOS PAGADOS POR ANTICIPADO": "ANTICIPOS",
-        "INVERSIONES PERMANENTES": "INVERSIONES EN SUBSIDIARIAS NEGOCIOS CONJUNTOS Y ASOCIADAS",
-        "INMUEBLES MAQUINARIA Y EQUIPO NETO DE DEPRECIACION ACUMULADA": "PROPIEDADES PLANTA Y EQUIPO",
-        "INMUEBLES MAQUINARIA Y EQUIPO": "PROPIEDADES PLANTA Y EQUIPO",
-        "ACTIVO INTANGIBLE NETO DE DEPRECIACION ACUMULADA": "ACTIVOS INTANGIBLES DISTINTOS DE LA PLUSVALIA",
-        "ACTIVOS INTANGIBLES": "ACTIVOS INTANGIBLES DISTINTOS DE LA PLUSVALIA",
-        "OTROS ACTIVOS": "OTROS ACTIVOS NO FINANCIEROS",
-        "IMPUESTO A LA RENTA Y PARTICIPACIONES DIFERIDOS ACTIVO": "ACTIVOS POR IMPUESTOS DIFERIDOS",
-        # Balance - Pasivos
-        "SOBREGIROS Y PAGARES BANCARIOS": "OTROS PASIVOS FINANCIEROS",
-        "PARTE CORRIENTE DE LAS DEUDAS A LARGO PLAZO": "OTROS PASIVOS FINANCIEROS",
-        "DEUDAS A LARGO PLAZO": "OTROS PASIVOS FINANCIEROS",
-        "INGRESOS DIFERIDOS": "INGRESOS DIFERIDOS",
-        "IMPUESTO A LA RENTA Y PARTICIPACIONES DIFERIDOS PASIVO": "PASIVOS POR IMPUESTOS DIFERIDOS",
-        # Balance - Patrimonio
-        "CAPITAL": "CAPITAL EMITIDO",
-        "CAPITAL ADICIONAL": "PRIMAS DE EMISION",
-        "EXCEDENTE DE REVALUACION": "SUPERAVIT DE REVALUACION",
-        "RESERVAS LEGALES": "OTRAS RESERVAS DE CAPITAL",
-        "OTRAS RESERVAS": "OTRAS RESERVAS DE PATRIMONIO",
-        "RESULTADOS ACUMULADOS": "RESULTADOS ACUMULADOS",
-        # Estado de Resultados
-        "VENTAS NETAS INGRESOS OPERACIONALES": "INGRESOS DE ACTIVIDADES ORDINARIAS",
-        "VENTAS NETAS": "INGRESOS DE ACTIVIDADES ORDINARIAS",
-        "OTROS INGRESOS OPERACIONALES": "OTROS INGRESOS OPERATIVOS",
-        "TOTAL DE INGRESOS BRUTOS": "INGRESOS DE ACTIVIDADES ORDINARIAS",
-        "COSTO DE VENTAS": "COSTO DE VENTAS",
-        "UTILIDAD BRUTA": "GANANCIA PERDIDA BRUTA",
-        "GASTOS DE ADMINISTRACION": "GASTOS DE ADMINISTRACION",
-        "GASTOS DE VENTAS": "GASTOS DE VENTAS Y DISTRIBUCION",
-        "UTILIDAD OPERATIVA": "GANANCIA PERDIDA OPERATIVA",
-        "INGRESOS FINANCIEROS": "INGRESOS FINANCIEROS",
-        "GASTOS FINANCIEROS": "GASTOS FINANCIEROS",
-        "OTROS INGRESOS": "OTROS INGRESOS OPERATIVOS",
-        "OTROS GASTOS": "OTROS GASTOS OPERATIVOS",
-        "RESULTADO POR EXPOSICION A LA INFLACION": "DIFERENCIAS DE CAMBIO NETO",
-        "RESULTADOS ANTES DE PARTIDAS EXTRAORDINARIAS PARTICIPACIONES Y DEL IMPUESTO A LA RENTA": "GANANCIA PERDIDA ANTES DE IMPUESTOS",
-        "PARTICIPACIONES": "OTROS INGRESOS GASTOS DE LAS SUBSIDIARIAS ASOCIADAS Y NEGOCIOS CONJUNTOS",
-        "IMPUESTO A LA RENTA": "INGRESO GASTO POR IMPUESTO",
-        "RESULTADO ANTES DE PARTIDAS EXTRAORDINARIAS": "GANANCIA PERDIDA NETA DE OPERACIONES CONTINUADAS",
-        "INGRESOS EXTRAORDINARIOS": "OTROS INGRESOS OPERATIVOS",
-        "GASTOS EXTRAORDINARIOS": "OTROS GASTOS OPERATIVOS",
-        "RESULTADO ANTES DE INTERES MINORITARIO": "GANANCIA PERDIDA NETA DEL EJERCICIO",
-        "INTERES MINORITARIO": "PARTICIPACION NO CONTROLADORA",
-        "UTILIDAD PERDIDA NETA DEL EJERCICIO": "GANANCIA PERDIDA NETA DEL EJERCICIO",
-        "UTILIDAD NETA DEL EJERCICIO": "GANANCIA PERDIDA NETA DEL EJERCICIO",
-        "UTILIDAD PERDIDA NETA ATRIBUIBLE A LOS ACCIONISTAS": "GANANCIA PERDIDA NETA DEL EJERCICIO"
-    }
-    if anio < 2010:
-        if cuenta in mapeo_antiguo:
-            return mapeo_antiguo[cuenta]
-        # Búsqueda flexible
-        if "VENTAS" in cuenta and "NETAS" in cuenta:
-            return "INGRESOS DE ACTIVIDADES ORDINARIAS"
-        if "UTILIDAD" in cuenta and "NETA" in cuenta and "EJERCICIO" in cuenta:
-            return "GANANCIA PERDIDA NETA DEL EJERCICIO"
-        if "EXISTENCIAS" in cuenta:
-            return "INVENTARIOS"
-    return cuenta
+    if not isinstance(cuenta_original, str):
+        cuenta = normalize_name(cuenta_original)
+        return _mapear_antigua(cuenta) if anio < 2010 else cuenta
+    return _mapear_cuenta_memo(cuenta_original, anio < 2010)
+
+class IndiceCuentas:
+    """Índice invertido token → filas sobre las cuentas de un DataFrame, para búsquedas por palabras clave.
+
+    Se construye una vez por DataFrame. Cada palabra clave se resuelve a las posiciones de las
+    filas que la contienen (memorizado), así que las búsquedas por conjunción o disyunción de
+    palabras son intersecciones o uniones de conjuntos. Conserva la semántica de subcadena y la
+    prioridad de buscar_cuenta_flexible/buscar_cuenta_parcial: gana la primera fila que coincide.
+    """
+
+    def __init__(self, etiquetas):
+        self.etiquetas = list(etiquetas)
+        self._mayusculas = [str(e).upper() for e in self.etiquetas]
+        self._tokens = {}
+        for pos, etiqueta in enumerate(self._mayusculas):
+            for token in etiqueta.split():
+                self._tokens.setdefault(token, set()).add(pos)
+        self._memo = {}
+
+    def posiciones(self, keyword):
+        """Posiciones de las filas cuya etiqueta contiene la palabra clave (sin distinguir mayúsculas)."""
+        kw = keyword.upper()
+        encontradas = self._memo.get(kw)
+        if encontradas is None:
+            if kw and not any(c.isspace() for c in kw):
+                # Una subcadena sin espacios solo puede estar dentro de un token
+                encontradas = set()
+                for token, filas in self._tokens.items():
+                    if kw in token:
+                        encontradas |= filas
+            else:
+                encontradas = {pos for pos, etiqueta in enumerate(self._mayusculas) if kw in etiqueta}
+            self._memo[kw] = encontradas
+        return encontradas
+
+    def flexible(self, keywords_list):
+        """Primera fila que contiene todas las palabras de algún grupo, probando los grupos en orden."""
+        for keywords in keywords_list:
+            if not keywords:
+                return self.etiquetas[0] if self.etiquetas else None
+            conjuntos = sorted((self.posiciones(kw) for kw in keywords), key=len)
+            coincidencias = conjuntos[0].intersection(*conjuntos[1:])
+            if coincidencias:
+                return self.etiquetas[min(coincidencias)]
+        return None
+
+    def parcial(self, keywords):
+        """Primera fila que contiene al menos una de las palabras clave."""
+        coincidencias = set().union(*(self.posiciones(kw) for kw in keywords))
+        if coincidencias:
+            return self.etiquetas[min(coincidencias)]
+        return None
 
 def buscar_cuenta_flexible(df, keywords_list):
-    """Busca una cuenta que coincida con cualquiera de las listas de keywords."""
+    """Busca una cuenta que coincida con cualquiera de las listas de keywords.
+
+    Acepta un DataFrame o un IndiceCuentas ya construido (para búsquedas repetidas).
+    """
+    if isinstance(df, IndiceCuentas):
+        return df.flexible(keywords_list)
     for keywords in keywords_list:
         for idx in df.index:
             if all(kw.upper() in idx.upper() for kw in keywords):
@@ -103,8 +219,13 @@ def buscar_cuenta_flexible(df, keywords_list):
     return None
 
 def buscar_cuenta_parcial(df, keywords):
-    """Búsqueda con coincidencia parcial (al menos una palabra clave)."""
+    """Búsqueda con coincidencia parcial (al menos una palabra clave).
+
+    Acepta un DataFrame o un IndiceCuentas ya construido (para búsquedas repetidas).
+    """
+    if isinstance(df, IndiceCuentas):
+        return df.parcial(keywords)
     for idx in df.index:
         if any(kw.upper() in idx.upper() for kw in keywords):
             return idx
-    return None
\ No newline at end of file
+    return None